@@ -1,8 +1,11 @@
 from myproject import app, mongo_db
-from myproject.firstmeal import generatemeal, gender, cuisine, onClickGenerateMeal, feedbacklst
+from myproject.firstmeal import generatemeal, generateweek, gender, cuisine, onClickGenerateMeal, feedbacklst, planrecords
 from flask import render_template, redirect, request, url_for, flash, abort, session, send_from_directory, jsonify
 from datetime import datetime
 from myproject.models import User
+from myproject.fitness import submit_plan_feedback
+from myproject.catalog import CATALOG_COLLECTIONS
+from myproject.sessions import rotate_session
 import os
 from pymongo.errors import DuplicateKeyError
 
@@ -60,8 +63,11 @@ def add_review(recipe_id):
     user = User.find_by_id(uid)
     rating = int(request.form.get('rating'))
     comment = request.form.get('comment')
+    collection = request.form.get('collection')
+    if collection not in CATALOG_COLLECTIONS:
+        collection = None
     
-    user.add_recipe_review(recipe_id, rating, comment)
+    user.add_recipe_review(recipe_id, rating, comment, collection)
     return jsonify({'success': True})
 
 @app.route('/workout-plans', methods=['GET', 'POST'])
@@ -184,7 +190,9 @@ def menu():
     weight = int(user.weight)
     exercise = float(user.exercise)
     usergender = gender()
-    usercuisine = cuisine()
+    # Optional ?cuisine= preference, kept for the feedback round
+    usercuisine = cuisine(request.args.get('cuisine', session.get('cuisine')))
+    session['cuisine'] = usercuisine
     hasCancer = 'N'
     hasDiabetes = 'N'
     if user.health_issues == 'diabetes':
@@ -192,8 +200,11 @@ def menu():
     if user.health_issues in ['heart_disease', 'high_cholesterol']:
         hasCancer = 'Y'
 
-    meals, breakfastlst = onClickGenerateMeal(uid,age,height,weight,usergender,exercise,hasCancer,hasDiabetes,usercuisine, breakfastlstarg)
-    session['meals'] = meals
+    if user.plan_period == 'weekly':
+        meals, breakfastlst = generateweek(age,height,weight,exercise,usergender,hasCancer,hasDiabetes,usercuisine)
+    else:
+        meals, breakfastlst = onClickGenerateMeal(uid,age,height,weight,usergender,exercise,hasCancer,hasDiabetes,usercuisine, breakfastlstarg)
+    # Only the recipe IDs are kept; records are rebuilt from the catalog when needed
     session['breakfastlst'] = breakfastlst
     return render_template('menu.html', meals=meals)
 
@@ -202,7 +213,7 @@ def menu():
 def feedback():
     if request.method == 'GET':
         form = FeedbackForm()
-        meals = session.get('meals', [])
+        meals = planrecords(session.get('breakfastlst', []))
         return render_template('feedback.html', meals=meals, form=form)
     
     uid = session.get('userid')
@@ -215,7 +226,7 @@ def feedback():
     weight = int(user.weight)
     exercise = float(user.exercise)
     usergender = gender()
-    usercuisine = cuisine()
+    usercuisine = cuisine(session.get('cuisine'))
     hasCancer = 'N'
     hasDiabetes = 'N'
     if user.health_issues == 'diabetes':
@@ -227,8 +238,18 @@ def feedback():
     # session['breakfastlst'] = breakfastlst
     # return render_template('menu.html', meals=meals)
     breakfastlstargs = session['breakfastlst']
+    # The overall rating is stored once for the plan; only meals rated one by
+    # one feed collaborative filtering
+    rating = request.form.get('rating', 0, type=int)
+    meal_ratings = {}
+    for position in range(len(breakfastlstargs)):
+        meal_rating = request.form.get(f'meal_rating_{position}', 0, type=int)
+        if 1 <= meal_rating <= 5:
+            meal_ratings[position] = meal_rating
+    if rating > 0 or meal_ratings:
+        submit_plan_feedback(uid, breakfastlstargs, rating if rating > 0 else None, meal_ratings,
+                             request.form.get('comments'))
     meals, breakfastlst = feedbacklst(uid,age,height,weight,usergender,exercise,hasCancer,hasDiabetes,usercuisine, breakfastlstargs)
-    session['meals'] = meals
     session['breakfastlst'] = breakfastlst
     return redirect(url_for('menu'))
 
@@ -236,10 +257,10 @@ def feedback():
 @app.route('/logout')
 @login_required
 def logout():
-    session.pop('breakfastlst',None)
-    session.pop('meals',None)
-
     logout_user()
+    # Nothing of the user's session survives logout, not even its ID
+    session.clear()
+    rotate_session(session)
     flash('You logged out!')
     return redirect(url_for('home'))
 
@@ -257,7 +278,8 @@ def login():
         # https://stackoverflow.com/questions/2209755/python-operation-vs-is-not
 
         if  user is not None and user.check_password(form.password.data):
-            #Log in the user
+            #Log in the user, under a new session ID so a planted one can't be reused
+            rotate_session(session)
             session['userid'] = str(user._id)
             login_user(user)
             flash('Logged in successfully.')
@@ -301,4 +323,6 @@ def register():
     return render_template('register.html', form=form)
 
 if __name__ == '__main__':
+    from myproject.indexes import ensure_indexes
+    ensure_indexes(mongo_db)
     app.run(debug=True)
\ No newline at end of file
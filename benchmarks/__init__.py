@@ -0,0 +1,6 @@
+"""
+Benchmarks for meal planning, similarity and fitness analytics.
+
+Run ``python -m benchmarks.run`` from the repository root; see
+``benchmarks/run.py`` for options.
+"""
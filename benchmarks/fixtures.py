@@ -0,0 +1,125 @@
+"""
+Scaled datasets for the benchmarks.
+
+Catalogs come from ``myproject.synthetic.RecipeModel`` fitted to the
+bundled CSVs and are prepared exactly like an import.
+Workout histories are spread over many users with logs at random times
+over the last two years. The benchmarked user is the first one and owns
+a tenth of the logs (all of them for small sizes), so their history grows
+with the requested size; every other user has about ``LOGS_PER_USER``. Everything is written to ``myproject.mongo_db``, which the
+runner points at a scratch database.
+"""
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson import ObjectId
+
+from myproject.catalog import bump_catalog_version
+from myproject.features import recipe_features
+from myproject.synthetic import RecipeModel
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+CATALOG_SOURCES = {
+    'breakfast': os.path.join(BASE_DIR, 'Breakfastsql.csv'),
+    'lunchdinner': os.path.join(BASE_DIR, 'LunchDinnersql.csv'),
+}
+LOGS_PER_USER = 500
+BENCH_USER_SHARE = 0.1
+HISTORY_DAYS = 730
+INSERT_BATCH = 10000
+EXERCISES = ['Running', 'Cycling', 'Swimming', 'Jump Rope', 'Elliptical', 'Push-ups', 'Pull-ups',
+             'Squats', 'Lunges', 'Planks', 'Yoga', 'Stretching', 'Pilates']
+
+_models = {}
+
+
+def _model(name):
+    model = _models.get(name)
+    if model is None:
+        model = _models[name] = RecipeModel.from_csv(CATALOG_SOURCES[name])
+    return model
+
+
+def _insert(collection, documents):
+    for start in range(0, len(documents), INSERT_BATCH):
+        collection.insert_many(documents[start:start + INSERT_BATCH], ordered=False)
+
+
+def load_catalog(db, size, seed=0):
+    """
+    Replace both catalogs with ``size`` synthetic recipes in total, split
+    like the CSVs, and bump the catalog version. Returns {collection: rows}.
+    """
+    shares = {name: len(_model(name).rows) for name in CATALOG_SOURCES}
+    total = sum(shares.values())
+    sizes = {}
+    start_id = 1
+    for offset, name in enumerate(CATALOG_SOURCES):
+        sizes[name] = max(1, round(size * shares[name] / total))
+        db[name].drop()
+        for records in _model(name).chunks(sizes[name], seed=seed + offset, start_id=start_id):
+            _insert(db[name], [recipe_features(record) for record in records])
+        start_id += sizes[name]
+    bump_catalog_version(db)
+    return sizes
+
+
+def load_history(db, total_logs, seed=0):
+    """
+    Replace users, workout logs, weight history and goals with a population
+    holding ``total_logs`` workout logs; return the benchmarked user's ID.
+    Goals start at the beginning of the history and are out of reach, so
+    checking them never closes them.
+    """
+    from myproject.fitness import fitness_tracker
+
+    rng = np.random.default_rng(seed)
+    for name in ('users', 'workout_logs', 'daily_activity', 'activity_streaks',
+                 'fitness_goals', 'weight_history'):
+        db[name].drop()
+
+    now = datetime.utcnow()
+    start = now - timedelta(days=HISTORY_DAYS)
+    bench_logs = max(min(total_logs, LOGS_PER_USER), int(total_logs * BENCH_USER_SHARE))
+    user_count = 1 + (total_logs - bench_logs + LOGS_PER_USER - 1) // LOGS_PER_USER
+    user_ids = [ObjectId() for _ in range(user_count)]
+    _insert(db['users'], [{
+        '_id': user_id, 'email': f'bench{i}@example.com', 'username': f'bench{i}',
+        'weight': '80', 'age': '30', 'height': '175', 'exercise': '1.55',
+    } for i, user_id in enumerate(user_ids)])
+
+    owners = np.zeros(total_logs, dtype=np.int64)
+    owners[bench_logs:] = 1 + np.arange(total_logs - bench_logs) // LOGS_PER_USER
+    # Times are drawn per log, so every user's history covers the whole range;
+    # logs are then written oldest first, interleaving users like live traffic
+    offsets = rng.uniform(0, HISTORY_DAYS * 86400, size=total_logs)
+    order = np.argsort(offsets)
+    exercises = rng.integers(len(EXERCISES), size=total_logs)
+    durations = rng.integers(10, 91, size=total_logs)
+    logs = []
+    for owner, offset, exercise, duration in zip(owners[order], offsets[order], exercises[order], durations[order]):
+        name = EXERCISES[exercise]
+        logs.append({
+            'user_id': user_ids[owner],
+            'exercise': name,
+            'duration': int(duration),
+            'intensity': 'moderate',
+            'calories_burned': fitness_tracker.calorie_burn_rates[name] * int(duration),
+            'notes': None,
+            'date': start + timedelta(seconds=float(offset)),
+        })
+    _insert(db['workout_logs'], logs)
+    fitness_tracker.rebuild_daily_activity()
+
+    user_id = user_ids[0]
+    _insert(db['weight_history'], [
+        {'user_id': user_id, 'weight': 90 - 10 * day / HISTORY_DAYS, 'date': start + timedelta(days=day)}
+        for day in range(0, HISTORY_DAYS, 3)
+    ])
+    _insert(db['fitness_goals'], [{
+        'user_id': user_id, 'goal_type': goal_type, 'target_value': target,
+        'start_date': start, 'deadline': now + timedelta(days=365),
+        'completed': False, 'progress': 0.0,
+    } for goal_type, target in (('workout_frequency', 1e9), ('calories_burned', 1e12), ('weight_loss', 40.0))])
+    return str(user_id)
@@ -0,0 +1,110 @@
+"""
+Timing, peak-memory and result-file helpers for the benchmark suite.
+"""
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def measure(fn, repeat=20, warmup=1):
+    """
+    Time ``fn()`` and return its statistics.
+
+    The first call is reported separately as ``cold_ms`` (it may build caches
+    and indexes); ``warmup`` further calls are discarded, then ``repeat`` calls
+    are timed. Peak memory is measured with tracemalloc over one extra call,
+    so tracing does not distort the timings.
+    """
+    started = time.perf_counter()
+    fn()
+    cold = time.perf_counter() - started
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    ms = np.asarray(timings) * 1000.0
+    stats = {
+        'runs': repeat,
+        'cold_ms': cold * 1000.0,
+        'mean_ms': float(ms.mean()),
+        'min_ms': float(ms.min()),
+        'max_ms': float(ms.max()),
+        'peak_kb': peak / 1024.0,
+    }
+    for p in PERCENTILES:
+        stats[f'p{p}_ms'] = float(np.percentile(ms, p))
+    return stats
+
+
+def git_commit():
+    """Short hash of HEAD (with '-dirty' for uncommitted changes), or 'unknown'"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{commit}-dirty" if dirty else commit
+
+
+def new_report(**settings):
+    return {
+        'commit': git_commit(),
+        'created': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'settings': settings,
+        'results': [],
+    }
+
+
+def save_report(report, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as fh:
+        json.dump(report, fh, indent=2)
+
+
+def load_report(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def _key(result):
+    return (result['case'], result.get('catalog_size'), result.get('history_size'))
+
+
+def compare(baseline, report, metric='p50_ms', threshold=1.2):
+    """
+    Rows of (case, sizes, baseline value, new value, ratio, regressed) for
+    results present in both reports; ``regressed`` when ratio > threshold.
+    """
+    before = {_key(result): result for result in baseline['results'] if metric in result}
+    rows = []
+    for result in report['results']:
+        old = before.get(_key(result))
+        if old is None or metric not in result:
+            continue
+        ratio = result[metric] / old[metric] if old[metric] else float('inf')
+        rows.append((result['case'], _key(result)[1:], old[metric], result[metric], ratio, ratio > threshold))
+    return rows
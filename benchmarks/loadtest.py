@@ -0,0 +1,374 @@
+"""
+Load-test the Flask routes with concurrent synthetic users
+
+    python -m benchmarks.loadtest [--concurrency 1 8 32] [--duration 30]
+                                  [--users 200] [--recipes N] [--think-ms 0]
+                                  [--mix menu=30,recipes=15,...] [--url URL]
+                                  [--output results.json]
+
+By default a local app is started in a child process on the backend from
+DB_BACKEND (in-memory unless set; MONGO_DB_NAME defaults to the scratch
+``diet_planner_bench``), seeded with the bundled catalog (or ``--recipes``
+synthetic ones) and ``--users`` synthetic users with weight histories and
+ratings. Pass ``--url`` to drive an app that is already running on data from
+``generate_data.py`` (same ``--seed``) instead.
+
+Each virtual user logs in through the real login form (CSRF token and
+session cookie), then runs a session of actions drawn from the mix and logs
+out, over and over. For every concurrency level the driver reports
+throughput, p50/p95/p99 latency and error rate per route; results are saved
+to ``benchmarks/results/loadtest-<commit>.json``.
+"""
+import argparse
+import http.cookiejar
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+os.environ.setdefault('DB_BACKEND', 'memory')
+os.environ.setdefault('MONGO_DB_NAME', 'diet_planner_bench')
+
+from benchmarks.harness import git_commit, new_report, save_report  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+CONCURRENCY = [1, 8, 32]
+# Relative weight of each action within a session
+MIX = {
+    'menu': 30,
+    'feedback': 10,
+    'weight': 15,
+    'log_weight': 5,
+    'recipes': 15,
+    'chat': 10,
+    'ask_chat': 5,
+}
+ACTIONS_PER_SESSION = (5, 15)
+CHAT_PROMPTS = ['how do I manage diabetes', 'protein for weight loss', 'exercise tips', 'heart healthy diet']
+READY = 'LOADTEST READY'
+
+_CSRF_RE = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Time each route on its own; redirects are checked, not followed
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class VirtualUser:
+    """One browser: a cookie jar plus the user's credentials"""
+
+    def __init__(self, base_url, email, password, record, think_ms=0, rng=None):
+        self.base_url = base_url.rstrip('/')
+        self.email = email
+        self.password = password
+        self.record = record
+        self.think_ms = think_ms
+        self.rng = rng or random.Random()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect)
+        self.has_plan = False
+
+    def request(self, route, path, data=None, expect_redirect=None):
+        """Make one request and record (route, seconds, error); return the body or None"""
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        started = time.perf_counter()
+        error = None
+        text = None
+        try:
+            with self.opener.open(self.base_url + path, data=body, timeout=60) as response:
+                text = response.read().decode('utf-8', 'replace')
+                if expect_redirect:
+                    error = f'expected redirect, got {response.status}'
+        except urllib.error.HTTPError as e:
+            e.read()
+            location = e.headers.get('Location', '')
+            if e.code in (301, 302, 303) and expect_redirect and expect_redirect in location:
+                text = ''
+            elif e.code in (301, 302, 303) and '/login' in location:
+                error = 'redirected to login'
+            else:
+                error = f'HTTP {e.code}'
+        except (urllib.error.URLError, OSError) as e:
+            error = type(e).__name__
+        self.record(route, time.perf_counter() - started, error)
+        return text
+
+    def think(self):
+        if self.think_ms:
+            time.sleep(self.rng.expovariate(1000.0 / self.think_ms))
+
+    def login(self):
+        page = self.request('GET /login', '/login')
+        match = _CSRF_RE.search(page or '')
+        if not match:
+            return False
+        self.think()
+        result = self.request('POST /login', '/login', {
+            'csrf_token': match.group(1), 'email': self.email, 'password': self.password,
+        }, expect_redirect='/')
+        return result is not None
+
+    def logout(self):
+        self.request('GET /logout', '/logout', expect_redirect='/')
+        self.has_plan = False
+
+    def act(self, action):
+        if action == 'menu' or (action == 'feedback' and not self.has_plan):
+            self.has_plan = self.request('GET /menu', '/menu') is not None
+        elif action == 'feedback':
+            page = self.request('GET /feedback', '/feedback')
+            match = _CSRF_RE.search(page or '')
+            if match:
+                self.think()
+                self.request('POST /feedback', '/feedback', {
+                    'csrf_token': match.group(1), 'rating': self.rng.randint(1, 5), 'comments': '',
+                    'meal_rating_0': self.rng.randint(1, 5),
+                }, expect_redirect='/menu')
+        elif action == 'weight':
+            self.request('GET /weight-tracker', '/weight-tracker')
+        elif action == 'log_weight':
+            self.request('POST /weight-tracker', '/weight-tracker',
+                         {'weight': round(self.rng.uniform(50, 100), 1)})
+        elif action == 'recipes':
+            self.request('GET /recipes', '/recipes')
+        elif action == 'chat':
+            self.request('GET /chat', '/chat')
+        elif action == 'ask_chat':
+            self.request('POST /chat', '/chat', {'prompt': self.rng.choice(CHAT_PROMPTS)})
+
+    def session(self, mix):
+        if not self.login():
+            return
+        actions, weights = zip(*mix.items())
+        for action in self.rng.choices(actions, weights, k=self.rng.randint(*ACTIONS_PER_SESSION)):
+            self.think()
+            self.act(action)
+        self.logout()
+
+
+class Recorder:
+    """Thread-safe per-route latency and error collection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def __call__(self, route, seconds, error):
+        with self._lock:
+            self.latencies.setdefault(route, []).append(seconds)
+            if error:
+                self.errors.setdefault(route, {}).setdefault(error, 0)
+                self.errors[route][error] += 1
+
+    def summary(self, elapsed):
+        routes = {}
+        for route, values in sorted(self.latencies.items()):
+            ms = np.asarray(values) * 1000.0
+            errors = sum(self.errors.get(route, {}).values())
+            routes[route] = {
+                'requests': len(values),
+                'throughput_rps': len(values) / elapsed,
+                'error_rate': errors / len(values),
+                'errors': self.errors.get(route, {}),
+                'mean_ms': float(ms.mean()),
+                'p50_ms': float(np.percentile(ms, 50)),
+                'p95_ms': float(np.percentile(ms, 95)),
+                'p99_ms': float(np.percentile(ms, 99)),
+                'max_ms': float(ms.max()),
+            }
+        return routes
+
+
+def run_level(base_url, emails, password, concurrency, duration, mix, think_ms, seed):
+    """Drive ``concurrency`` virtual users for ``duration`` seconds; return the summary"""
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+
+    def worker(index):
+        rng = random.Random(seed * 100003 + index)
+        while time.monotonic() < deadline:
+            user = VirtualUser(base_url, rng.choice(emails), password, recorder, think_ms, rng)
+            user.session(mix)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    routes = recorder.summary(elapsed)
+    total = sum(route['requests'] for route in routes.values())
+    failed = sum(route['error_rate'] * route['requests'] for route in routes.values())
+    return {
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'requests': total,
+        'throughput_rps': total / elapsed if elapsed else 0.0,
+        'error_rate': failed / total if total else 0.0,
+        'routes': routes,
+    }
+
+
+# -- local server ------------------------------------------------------------
+
+def _setup(args):
+    """Seed the (scratch) database the served app uses; return the user emails"""
+    from myproject import mongo_db
+    from myproject.features import recipe_features
+    from myproject.importer import import_catalogs, import_records
+    from myproject.catalog import CATALOG_COLLECTIONS, bump_catalog_version
+    from myproject.indexes import ensure_indexes
+    from myproject.synthetic import Population, RecipeModel, load
+
+    ensure_indexes(mongo_db)
+    sources = {'breakfast': 'Breakfastsql.csv', 'lunchdinner': 'LunchDinnersql.csv'}
+    if args.recipes:
+        models = {name: RecipeModel.from_csv(path) for name, path in sources.items()}
+        total = sum(len(model.rows) for model in models.values())
+        start_id = 1
+        for offset, (name, model) in enumerate(models.items()):
+            count = max(1, round(args.recipes * len(model.rows) / total))
+            import_records(mongo_db, name, model.chunks(count, seed=args.seed + offset, start_id=start_id),
+                           prepare=recipe_features)
+            start_id += count
+        bump_catalog_version(mongo_db)
+    elif not all(mongo_db[name].estimated_document_count() for name in CATALOG_COLLECTIONS):
+        import_catalogs(mongo_db, sources, prepare=recipe_features)
+
+    # Replace the accounts (and their data) left by an earlier run
+    population = Population(args.users, seed=args.seed)
+    previous = [user['_id'] for user in mongo_db['users'].find({'email': {'$in': population.emails()}}, {'_id': 1})]
+    if previous:
+        for name in ('weight_history', 'meal_feedback', 'daily_activity', 'activity_streaks'):
+            mongo_db[name].delete_many({'user_id': {'$in': previous}})
+        mongo_db['users'].delete_many({'_id': {'$in': previous}})
+    recipes = [(name, recipe_id) for name in CATALOG_COLLECTIONS for recipe_id in mongo_db[name].distinct('ID')]
+    load(mongo_db['users'], population.users())
+    load(mongo_db['weight_history'], population.weight_history(args.users * 20))
+    load(mongo_db['users'], population.trend_updates())
+    load(mongo_db['meal_feedback'], population.meal_feedback(args.users * 10, recipes))
+    return population.emails()
+
+
+def serve(args):
+    """Seed the database and serve the app until killed (child process mode)"""
+    import logging
+    from werkzeug.serving import make_server
+
+    # One log line per request would cost more than some of the routes
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    _setup(args)
+    from app import app
+    server = make_server('127.0.0.1', args.port, app, threaded=True)
+    print(READY, flush=True)
+    server.serve_forever()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args):
+    """Start ``serve`` in a child process and wait until it accepts requests"""
+    port = _free_port()
+    command = [sys.executable, '-m', 'benchmarks.loadtest', '--serve', '--port', str(port),
+               '--users', str(args.users), '--recipes', str(args.recipes), '--seed', str(args.seed)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if line.strip() == READY:
+            break
+    else:
+        raise RuntimeError(f"app server exited with code {process.wait()}")
+    # Keep draining the child's output so it never blocks on a full pipe
+    threading.Thread(target=lambda: [None for _ in process.stdout], daemon=True).start()
+    return process, f'http://127.0.0.1:{port}'
+
+
+def _parse_mix(text):
+    mix = dict(MIX)
+    for item in filter(None, (text or '').split(',')):
+        action, _, weight = item.partition('=')
+        if action not in MIX:
+            raise argparse.ArgumentTypeError(f"unknown action '{action}' (choose from {', '.join(MIX)})")
+        mix[action] = float(weight)
+    return {action: weight for action, weight in mix.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='*', default=CONCURRENCY,
+                        help='virtual users per level (default: %(default)s)')
+    parser.add_argument('--duration', type=float, default=30, help='seconds per level (default: 30)')
+    parser.add_argument('--users', type=int, default=200, help='synthetic accounts (default: 200)')
+    parser.add_argument('--recipes', type=int, default=0, help='synthetic catalog size (default: bundled CSVs)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--think-ms', type=float, default=0, help='mean pause between actions (default: 0)')
+    parser.add_argument('--mix', type=_parse_mix, default=dict(MIX),
+                        help='action weights, e.g. menu=50,chat=0 (actions: %s)' % ', '.join(MIX))
+    parser.add_argument('--url', help='drive an already running app instead of starting one')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/loadtest-<commit>.json)')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return 0
+
+    from myproject.synthetic import SYNTHETIC_PASSWORD, Population
+
+    print("=" * 50)
+    print(f"Load Test @ {git_commit()}")
+    print("=" * 50)
+
+    process = None
+    if args.url:
+        base_url = args.url
+    else:
+        print(f"\nStarting app ({os.environ['DB_BACKEND']} backend, {args.users} users)...")
+        process, base_url = start_server(args)
+    emails = Population(args.users, seed=args.seed).emails()
+
+    report = new_report(url=base_url, backend=None if args.url else os.environ['DB_BACKEND'],
+                        users=args.users, duration=args.duration, think_ms=args.think_ms, mix=args.mix)
+    report['levels'] = report.pop('results')
+    try:
+        for concurrency in args.concurrency:
+            level = run_level(base_url, emails, SYNTHETIC_PASSWORD, concurrency, args.duration,
+                              args.mix, args.think_ms, args.seed)
+            report['levels'].append(level)
+            print(f"\n{concurrency} concurrent users: {level['throughput_rps']:.1f} req/s, "
+                  f"{level['error_rate']:.1%} errors")
+            print(f"   {'route':<22}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+            for route, stats in level['routes'].items():
+                print(f"   {route:<22}{stats['throughput_rps']:>8.1f}{stats['p50_ms']:>9.1f}"
+                      f"{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['error_rate']:>8.1%}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"loadtest-{report['commit']}.json")
+    save_report(report, output)
+    print(f"\n✓ Results saved to {output}")
+    print("\n" + "=" * 50)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
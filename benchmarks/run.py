@@ -0,0 +1,155 @@
+"""
+Benchmark meal planning, similarity and fitness analytics at several data sizes
+
+    python -m benchmarks.run [--catalog-sizes 2000 20000 200000]
+                             [--history-sizes 100 10000 1000000]
+                             [--repeat 20] [--output results.json]
+                             [--compare baseline.json]
+
+Runs against the in-memory backend by default (set DB_BACKEND=mongo to use
+MONGO_URI); either way it works in the scratch database ``MONGO_DB_NAME``
+(default ``diet_planner_bench``), which it overwrites. Results are written
+to ``benchmarks/results/<commit>.json`` so runs from different commits can
+be compared with ``--compare``.
+"""
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+# Must be set before myproject is imported
+os.environ.setdefault('DB_BACKEND', 'memory')
+os.environ.setdefault('MONGO_DB_NAME', 'diet_planner_bench')
+os.environ['CATALOG_SNAPSHOT'] = '0'
+os.environ.setdefault('NEIGHBOUR_INDEX_DIR', tempfile.mkdtemp(prefix='bench-index-'))
+
+from benchmarks.harness import compare, load_report, measure, new_report, save_report  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+CATALOG_SIZES = [2000, 20000, 200000]
+HISTORY_SIZES = [100, 10000, 1000000]
+
+# (age, height, weight, exercise, sex, hascancer, hasdiabetes, cuisine)
+PROFILES = [
+    (25, 175, 70, 1.55, 'M', 'N', 'N', 'indian'),
+    (41, 162, 81, 1.2, 'F', 'N', 'Y', 'indian'),
+    (58, 170, 77, 1.375, 'M', 'Y', 'N', 'south indian'),
+    (33, 158, 55, 1.725, 'F', 'Y', 'Y', 'indian'),
+]
+
+
+def _catalog_cases(args):
+    from myproject import meal_catalog
+    from myproject.firstmeal import feedbacklst, generatemeal, onClickGenerateMeal
+    from benchmarks.similarity import cosinemat, get_recommendations
+
+    profiles = itertools.cycle(PROFILES)
+    plans = itertools.cycle([generatemeal(*PROFILES[0])[1], generatemeal(*PROFILES[1])[1]])
+
+    def plan_args():
+        age, height, weight, exercise, sex, cancer, diabetes, cuisine = next(profiles)
+        return ('bench', age, height, weight, sex, exercise, cancer, diabetes, cuisine)
+
+    yield 'generatemeal', lambda: generatemeal(*next(profiles))
+    yield 'onClickGenerateMeal[new]', lambda: onClickGenerateMeal(*plan_args(), [])
+    yield 'onClickGenerateMeal[swap]', lambda: onClickGenerateMeal(*plan_args(), next(plans))
+    yield 'feedbacklst', lambda: feedbacklst(*plan_args(), next(plans))
+
+    # The dense n x n matrix is the cost being measured; skip sizes it can't hold
+    frame = meal_catalog.frame('lunchdinner')
+    dense_mb = len(frame) ** 2 * 8 / 2 ** 20
+    if dense_mb > args.max_dense_mb:
+        reason = f"needs a {dense_mb:,.0f} MB dense matrix (--max-dense-mb {args.max_dense_mb})"
+        yield 'cosinemat', reason
+        yield 'get_recommendations', reason
+        return
+    yield 'cosinemat', lambda: cosinemat(frame)
+    matrix = cosinemat(frame)
+    ids = itertools.cycle(frame['ID'].sample(n=min(len(frame), 100), random_state=0).tolist())
+    yield 'get_recommendations', lambda: get_recommendations(next(ids), matrix, -1, frame)
+
+
+def _history_cases(user_id):
+    from myproject.fitness import fitness_tracker
+
+    yield 'get_workout_analytics', lambda: fitness_tracker.get_workout_analytics(user_id)
+    yield 'get_workout_analytics[365d]', lambda: fitness_tracker.get_workout_analytics(user_id, days=365)
+    yield '_check_goal_achievements', lambda: fitness_tracker._check_goal_achievements(user_id)
+
+
+def _run_cases(report, cases, repeat, **sizes):
+    for case, fn in cases:
+        result = {'case': case, **sizes}
+        if isinstance(fn, str):
+            result['skipped'] = fn
+            print(f"   - {case}: skipped, {fn}")
+        else:
+            result.update(measure(fn, repeat=repeat))
+            print(f"   ✓ {case}: p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms, "
+                  f"p99 {result['p99_ms']:.2f} ms, peak {result['peak_kb']:,.0f} KB")
+        report['results'].append(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--catalog-sizes', type=int, nargs='*', default=CATALOG_SIZES,
+                        help='total recipes per catalog run (default: %(default)s)')
+    parser.add_argument('--history-sizes', type=int, nargs='*', default=HISTORY_SIZES,
+                        help='total workout logs per history run (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=20, help='timed calls per case (default: 20)')
+    parser.add_argument('--max-dense-mb', type=float, default=1024,
+                        help='skip cosinemat/get_recommendations above this matrix size (default: 1024)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare against an earlier results file')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='p50 slowdown ratio reported as a regression (default: 1.2)')
+    args = parser.parse_args()
+
+    from myproject import meal_catalog, mongo_db
+    from benchmarks.fixtures import load_catalog, load_history
+
+    meal_catalog.check_interval = None
+    report = new_report(backend=os.environ['DB_BACKEND'], repeat=args.repeat, seed=args.seed,
+                        max_dense_mb=args.max_dense_mb)
+
+    print("=" * 50)
+    print(f"Benchmarks @ {report['commit']} ({report['settings']['backend']} backend)")
+    print("=" * 50)
+
+    for size in args.catalog_sizes:
+        started = time.perf_counter()
+        sizes = load_catalog(mongo_db, size, seed=args.seed)
+        meal_catalog.invalidate()
+        meal_catalog.table('breakfast')
+        print(f"\nCatalog of {size:,} recipes {sizes} loaded in {time.perf_counter() - started:.1f}s")
+        _run_cases(report, _catalog_cases(args), args.repeat, catalog_size=size)
+
+    for size in args.history_sizes:
+        started = time.perf_counter()
+        user_id = load_history(mongo_db, size, seed=args.seed)
+        print(f"\nHistory of {size:,} workout logs loaded in {time.perf_counter() - started:.1f}s")
+        _run_cases(report, _history_cases(user_id), args.repeat, history_size=size)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    save_report(report, output)
+    print(f"\n✓ Results saved to {output}")
+
+    regressions = 0
+    if args.compare:
+        baseline = load_report(args.compare)
+        print(f"\nComparison with {baseline['commit']} (p50):")
+        for case, sizes, old, new, ratio, regressed in compare(baseline, report, threshold=args.threshold):
+            size = sizes[0] if sizes[0] is not None else sizes[1]
+            marker = '✗' if regressed else '✓'
+            print(f"   {marker} {case} @ {size:,}: {old:.2f} -> {new:.2f} ms ({ratio:.2f}x)")
+            regressions += regressed
+
+    print("\n" + "=" * 50)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+The dense cosine-similarity path the app used before the neighbour index.
+
+Kept only as a benchmark baseline for ``myproject.neighbours``: ``cosinemat``
+builds the full n x n matrix over the ``soup`` column and
+``get_recommendations`` reads one recipe's row of it.
+"""
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+
+def get_recommendations(ID, cosine_sim, idx, df):
+    # Get the index of the item that matches the title
+    indices_from_food_id = pd.Series(df.index, index=df['ID'])
+    if idx == -1 and ID != "":
+        idx = indices_from_food_id[ID]
+
+    # Get the pairwsie similarity scores of all dishes with that dish
+    sim_scores = list(enumerate(cosine_sim[idx]))
+
+    # Sort the dishes based on the similarity scores
+    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
+
+    # Get the scores of the 10 most similar dishes
+    sim_scores = sim_scores[1:25]
+
+    # Get the food indices
+    food_indices = [i[0] for i in sim_scores]
+
+    # Return the top 10 most similar dishes
+    return food_indices[1]
+
+
+def cosinemat(df):
+    count = CountVectorizer(stop_words='english')
+    count_matrix = count.fit_transform(df['soup'])
+
+    # Compute the Cosine Similarity matrix based on the count_matrix
+    return cosine_similarity(count_matrix, count_matrix)
@@ -0,0 +1,24 @@
+"""
+Build the top-K similar-meal index for both recipe catalogs
+"""
+import time
+from myproject import meal_catalog
+from myproject.catalog import CATALOG_COLLECTIONS
+from myproject.neighbours import build_neighbour_index, index_path
+
+print("=" * 50)
+print("Building Similar-Meal Index")
+print("=" * 50)
+
+meal_catalog.invalidate()
+for name in CATALOG_COLLECTIONS:
+    table = meal_catalog.table(name)
+    started = time.perf_counter()
+    index = build_neighbour_index(table.frame, version=table.version)
+    path = index_path(name)
+    index.save(path)
+    elapsed = time.perf_counter() - started
+    print(f"\n{name}: {len(index)} recipes, k={index.k}, catalog version {index.version}")
+    print(f"   ✓ Saved {path} in {elapsed:.2f}s")
+
+print("\n" + "=" * 50)
@@ -0,0 +1,49 @@
+"""
+Create the MongoDB indexes from the registry and check the hot queries use them
+
+    python ensure_indexes.py [--check-only] [--migrate-timeseries]
+"""
+import argparse
+import sys
+
+from myproject import mongo_db
+from myproject.indexes import TIMESERIES, ensure_indexes, migrate_to_timeseries, verify_indexes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--check-only', action='store_true', help='only run the explain() checks')
+    parser.add_argument('--migrate-timeseries', action='store_true',
+                        help='move existing plain collections into time-series collections')
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("MongoDB Indexes")
+    print("=" * 50)
+
+    ok = True
+    if args.migrate_timeseries:
+        for name in TIMESERIES:
+            copied = migrate_to_timeseries(mongo_db, name)
+            print(f"   ✓ {name}: {copied} documents moved to a time-series collection")
+
+    if not args.check_only:
+        for collection, result in ensure_indexes(mongo_db).items():
+            if isinstance(result, str):
+                ok = False
+                print(f"   ✗ {collection}: {result}")
+            else:
+                print(f"   ✓ {collection}: {', '.join(result)}")
+
+    failures = verify_indexes(mongo_db)
+    for name, stages in failures:
+        print(f"   ✗ {name} uses a collection scan ({' > '.join(stages)})")
+    if not failures:
+        print("\n✓ All hot queries use an index")
+
+    print("\n" + "=" * 50)
+    return 0 if ok and not failures else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""
+Export the recipe catalog to a memory-mappable binary snapshot
+
+    python export_snapshot.py [--force]
+"""
+import argparse
+import os
+import shutil
+import time
+
+from myproject import mongo_db, meal_catalog
+from myproject.catalog import get_catalog_version
+from myproject.snapshot import CATALOG_SNAPSHOT_DIR, snapshot_path, write_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--force', action='store_true', help='rewrite the snapshot even if it exists')
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("Exporting Catalog Snapshot")
+    print("=" * 50)
+
+    version = get_catalog_version(mongo_db)
+    if version == 0:
+        print("\n✗ The catalog has no version stamp; run import_data.py first")
+        return
+    path = snapshot_path(version)
+    if args.force:
+        shutil.rmtree(path, ignore_errors=True)
+
+    started = time.perf_counter()
+    tables = meal_catalog.load_from_db(version)
+    write_snapshot(tables, version)
+    elapsed = time.perf_counter() - started
+
+    size = sum(os.path.getsize(os.path.join(path, entry)) for entry in os.listdir(path))
+    for name, table in tables.items():
+        print(f"\n{name}: {len(table)} recipes")
+    print(f"\n✓ Wrote {path} ({size / 1e6:.1f} MB, catalog version {version}) in {elapsed:.2f}s")
+    print(f"Snapshots directory: {CATALOG_SNAPSHOT_DIR}")
+
+    print("\n" + "=" * 50)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Generate seeded synthetic recipes, users and activity histories
+
+    python generate_data.py [--recipes N] [--users N] [--workouts N] [--weights N]
+                            [--reviews N] [--feedback N] [--seed N] [--replace]
+                            [--csv-dir DIR]
+
+Recipes replace both catalogs (split like the bundled CSVs, through the same
+staging import as import_data.py). Users and activity are added to the
+existing collections; --replace drops users, workout, weight, review and
+feedback data first. Synthetic users log in with the password printed at the
+end. Writes to MONGO_URI/MONGO_DB_NAME, or the in-memory backend with
+DB_BACKEND=memory (useful only for timing the generator).
+"""
+import argparse
+import csv
+import os
+
+from myproject import mongo_db
+from myproject.catalog import CATALOG_COLLECTIONS, bump_catalog_version
+from myproject.features import recipe_features
+from myproject.importer import import_records
+from myproject.indexes import ensure_indexes
+from myproject.synthetic import CHUNK_SIZE, SYNTHETIC_PASSWORD, Population, RecipeModel, csv_row, load
+
+SOURCES = {
+    'breakfast': 'Breakfastsql.csv',
+    'lunchdinner': 'LunchDinnersql.csv',
+}
+ACTIVITY_COLLECTIONS = ('users', 'workout_logs', 'daily_activity', 'activity_streaks', 'weight_history',
+                        'recipe_reviews', 'meal_feedback', 'fitness_goals')
+
+
+def _report(name, rows, seconds):
+    rate = rows / seconds * 60 if seconds > 0 else 0.0
+    print(f"   {name}: {rows:,} rows, {rate:,.0f} rows/min", end='\r', flush=True)
+
+
+def _done(name, rows, seconds):
+    rate = rows / seconds * 60 if seconds > 0 else 0.0
+    print(f"   ✓ {name}: {rows:,} rows in {seconds:.1f}s ({rate:,.0f} rows/min)" + " " * 10)
+
+
+def _write_csv(path, chunks):
+    rows = 0
+    with open(path, 'w', newline='') as fh:
+        writer = None
+        for records in chunks:
+            for record in records:
+                row = csv_row(record)
+                if writer is None:
+                    writer = csv.DictWriter(fh, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+            rows += len(records)
+    return rows
+
+
+def generate_catalog(args):
+    models = {name: RecipeModel.from_csv(path) for name, path in SOURCES.items()}
+    total = sum(len(model.rows) for model in models.values())
+    start_id = 1
+    for offset, (name, model) in enumerate(models.items()):
+        count = max(1, round(args.recipes * len(model.rows) / total))
+        # IDs are unique across both catalogs, so even ratings without a collection resolve
+        chunks = model.chunks(count, seed=args.seed + offset, start_id=start_id, chunk_size=args.chunk_size)
+        if args.csv_dir:
+            path = os.path.join(args.csv_dir, f"{name}.csv")
+            print(f"   ✓ {name}: {_write_csv(path, chunks):,} rows written to {path}")
+        else:
+            result = import_records(mongo_db, name, chunks, prepare=recipe_features, report=_report)
+            _done(name, result['rows'], result['seconds'])
+        start_id += count
+    if not args.csv_dir:
+        print(f"   Catalog version: {bump_catalog_version(mongo_db)}")
+
+
+def generate_activity(args):
+    recipes = []
+    for name in CATALOG_COLLECTIONS:
+        recipes.extend((name, recipe_id) for recipe_id in mongo_db[name].distinct('ID'))
+    if (args.reviews or args.feedback) and not recipes:
+        print("   ✗ No recipes to review; import or generate a catalog first")
+        return
+
+    population = Population(args.users, seed=args.seed)
+    steps = [
+        ('users', 'users', population.users(args.chunk_size)),
+        ('workout_logs', 'workout_logs', population.workout_logs(args.workouts, args.chunk_size)),
+        ('weight_history', 'weight_history', population.weight_history(args.weights, args.chunk_size)),
+        ('weight trends', 'users', population.trend_updates(args.chunk_size)),
+    ]
+    if recipes:
+        steps += [
+            ('recipe_reviews', 'recipe_reviews',
+             population.recipe_reviews(args.reviews, recipes, args.chunk_size)),
+            ('meal_feedback', 'meal_feedback',
+             population.meal_feedback(args.feedback, recipes, args.chunk_size)),
+        ]
+    for label, name, chunks in steps:
+        rows, seconds = load(mongo_db[name], chunks, report=_report)
+        _done(label, rows, seconds)
+
+    # Rollups and streaks come from the logs, as after a direct import
+    from myproject.fitness import fitness_tracker
+    print(f"   ✓ daily_activity: {fitness_tracker.rebuild_daily_activity():,} rollups rebuilt")
+    print(f"\nSynthetic users: {population.prefix}-0@example.com ... "
+          f"{population.prefix}-{args.users - 1}@example.com, password '{SYNTHETIC_PASSWORD}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=0, help='total recipes to generate (0 keeps the catalog)')
+    parser.add_argument('--users', type=int, default=0)
+    parser.add_argument('--workouts', type=int, default=0, help='workout logs shared across the users')
+    parser.add_argument('--weights', type=int, default=0, help='weight entries shared across the users')
+    parser.add_argument('--reviews', type=int, default=0, help='recipe reviews shared across the users')
+    parser.add_argument('--feedback', type=int, default=0, help='meal feedback entries shared across the users')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='documents per bulk insert')
+    parser.add_argument('--replace', action='store_true', help='drop existing users and activity first')
+    parser.add_argument('--csv-dir', help='write the recipes as CSVs here instead of importing them')
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("Generating Synthetic Data")
+    print("=" * 50)
+
+    ensure_indexes(mongo_db)
+    if args.recipes:
+        print("\nCatalog:")
+        generate_catalog(args)
+
+    if args.users:
+        if args.replace:
+            for name in ACTIVITY_COLLECTIONS:
+                mongo_db[name].drop()
+            ensure_indexes(mongo_db)
+        print("\nUsers and activity:")
+        generate_activity(args)
+
+    print("\n" + "=" * 50)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Precompute meal plans for every user (e.g. overnight for tomorrow)
+
+Streams the users collection in batches, computes BMR/TDEE for a whole batch
+with NumPy, fans plan generation out over a process pool that shares the
+loaded catalog, and writes the results to the meal_plans collection with
+unordered bulk writes.
+
+    python generate_plans.py [--date YYYY-MM-DD] [--workers N] [--batch-size N] [--cuisine NAME]
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+from pymongo import UpdateOne
+
+from myproject import mongo_db, meal_catalog
+from myproject.constraints import conditions_from_flags
+from myproject.firstmeal import cuisine
+from myproject.planner import SHORT_SHARE, best_plans, best_days
+
+meal_plans = mongo_db['meal_plans']
+
+USER_FIELDS = {'age': 1, 'height': 1, 'weight': 1, 'exercise': 1, 'gender': 1,
+               'health_issues': 1, 'plan_period': 1}
+
+
+def _number(value, default):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def batch_calories(users):
+    """Daily calorie targets (BMR x activity) for a batch of user documents"""
+    age = np.array([_number(u.get('age'), 30) for u in users])
+    height = np.array([_number(u.get('height'), 170) for u in users])
+    weight = np.array([_number(u.get('weight'), 70) for u in users])
+    exercise = np.array([_number(u.get('exercise'), 1.2) for u in users])
+    male = np.array([str(u.get('gender', 'male')).lower() in ('male', 'm') for u in users])
+
+    # Same Harris-Benedict constants as firstmeal.dailycalorie
+    bmr = np.where(
+        male,
+        13.397 * weight + 4.799 * height - 5.677 * age + 88.362,
+        9.247 * weight + 3.0988 * height - 4.330 * age + 447.593,
+    )
+    return bmr * exercise
+
+
+def _flags(health_issues):
+    hascancer = 'Y' if health_issues in ['heart_disease', 'high_cholesterol'] else 'N'
+    hasdiabetes = 'Y' if health_issues == 'diabetes' else 'N'
+    return hascancer, hasdiabetes
+
+
+def _init_worker():
+    # Workers never poll Mongo; with fork they inherit the parent's loaded
+    # catalog, otherwise they load it once here.
+    meal_catalog.check_interval = None
+    meal_catalog.constraints('breakfast')
+    meal_catalog.constraints('lunchdinner')
+
+
+def plan_batch(profiles):
+    """Plan meals for (user_id, calorie, health_issues, plan_period, cuisine) tuples"""
+    breakfastrules = meal_catalog.constraints('breakfast')
+    lunchrules = meal_catalog.constraints('lunchdinner')
+    results = []
+    for user_id, calorie, health_issues, plan_period, usercuisine in profiles:
+        conditions = conditions_from_flags(*_flags(health_issues))
+        if plan_period == 'weekly':
+            plans = best_days(breakfastrules, lunchrules, calorie, 7, conditions, usercuisine)
+        else:
+            plans = best_plans(breakfastrules, lunchrules, calorie, conditions, usercuisine, count=1)
+        results.append((user_id, calorie, plan_period, plans))
+    return results
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _write(results, plan_date):
+    """Upsert the plans; return (plans written, plans with a day short of its calorie target)"""
+    requests = []
+    short = 0
+    for user_id, calorie, plan_period, plans in results:
+        if not plans:
+            continue
+        short += any(plan['short'] for plan in plans)
+        requests.append(UpdateOne(
+            {'user_id': user_id, 'date': plan_date},
+            {'$set': {
+                'plan_period': plan_period or 'daily',
+                'calorie_target': float(calorie),
+                'meal_ids': [recipe_id for plan in plans for recipe_id in plan['ids']],
+                'days': plans,
+                'generated_at': datetime.utcnow(),
+            }},
+            upsert=True
+        ))
+    if requests:
+        meal_plans.bulk_write(requests, ordered=False)
+    return len(requests), short
+
+
+def _process(pool, users, plan_date, chunk_size, usercuisine):
+    calories = batch_calories(users)
+    profiles = [(user['_id'], float(calorie), user.get('health_issues', 'none'), user.get('plan_period'), usercuisine)
+                for user, calorie in zip(users, calories)]
+    written = short = 0
+    for results in pool.map(plan_batch, _chunks(profiles, chunk_size)):
+        batch_written, batch_short = _write(results, plan_date)
+        written += batch_written
+        short += batch_short
+    return written, short
+
+
+def main():
+    tomorrow = (datetime.utcnow() + timedelta(days=1)).strftime('%Y-%m-%d')
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--date', default=tomorrow, help='plan date (default: tomorrow, UTC)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=1000, help='users per cursor batch')
+    parser.add_argument('--chunk-size', type=int, default=100, help='users per worker task')
+    parser.add_argument('--cuisine', help='preferred cuisine label (default: indian)')
+    args = parser.parse_args()
+    plan_date = datetime.strptime(args.date, '%Y-%m-%d')
+
+    print("=" * 50)
+    print(f"Generating Meal Plans for {args.date}")
+    print("=" * 50)
+
+    # Load and compile the catalog once before forking so workers share it
+    _init_worker()
+    meal_catalog.check_interval = None
+    print(f"Catalog version {meal_catalog.version}, {args.workers} workers")
+    usercuisine = cuisine(args.cuisine)
+    if args.cuisine and usercuisine != ' '.join(args.cuisine.lower().split()):
+        print(f"✗ No recipes tagged '{args.cuisine}', using '{usercuisine}'")
+
+    try:
+        context = multiprocessing.get_context('fork')
+    except ValueError:
+        context = None
+
+    started = time.perf_counter()
+    users_done = plans_written = plans_short = 0
+    cursor = mongo_db['users'].find({}, USER_FIELDS, batch_size=args.batch_size)
+
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context,
+                             initializer=_init_worker) as pool:
+        batch = []
+        for user in cursor:
+            batch.append(user)
+            if len(batch) < args.batch_size:
+                continue
+            written, short = _process(pool, batch, plan_date, args.chunk_size, usercuisine)
+            plans_written += written
+            plans_short += short
+            users_done += len(batch)
+            batch = []
+            elapsed = time.perf_counter() - started
+            print(f"   {users_done} users, {users_done / elapsed:.1f} users/sec")
+        if batch:
+            written, short = _process(pool, batch, plan_date, args.chunk_size, usercuisine)
+            plans_written += written
+            plans_short += short
+            users_done += len(batch)
+
+    elapsed = time.perf_counter() - started
+    rate = users_done / elapsed if elapsed > 0 else 0.0
+    print(f"\n✓ Planned {users_done} users ({plans_written} plans written) in {elapsed:.1f}s")
+    print(f"Throughput: {rate:.1f} users/sec")
+    if plans_short:
+        print(f"✗ {plans_short} plans have days below {SHORT_SHARE:.0%} of their calorie target "
+              f"(flagged 'short' in meal_plans.days)")
+
+
+if __name__ == '__main__':
+    main()
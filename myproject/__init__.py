@@ -1,37 +1,77 @@
 import os
+import threading
 from flask import Flask
 from flask_login import LoginManager
 from pymongo import MongoClient
 from dotenv import load_dotenv
 
 
-# Create a login manager object
-login_manager = LoginManager()
-
 load_dotenv()
 
 # Often people will also separate these into a separate config.py file
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-app = Flask(__name__, static_folder='templates', static_url_path='')
-
 # Load configuration
 class Config(object):
     SECRET_KEY = os.environ.get('SECRET_KEY', 'mysecretkey')
 
-app.config.from_object(Config)
-
-# We can now pass in our app to the login manager
-login_manager.init_app(app)
-
-# Tell users what view to go to when they need to login.
-login_manager.login_view = "login"
-
 # MongoDB (Compass/local) connection
 MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017')
 MONGO_DB_NAME = os.environ.get('MONGO_DB_NAME', 'diet_planner')
-mongo_client: MongoClient = MongoClient(MONGO_URI)
-mongo_db = mongo_client[MONGO_DB_NAME]
 
-# Create collections for users
-users_collection = mongo_db['users']
\ No newline at end of file
+# The Flask app, the database handles and the catalog cache are created the
+# first time one of them is imported, so tools that only need the importer,
+# features or indexes modules don't start an app or open a connection.
+_SHARED = ('app', 'login_manager', 'mongo_client', 'mongo_db', 'users_collection', 'meal_catalog')
+_setup_lock = threading.RLock()
+
+
+def _setup():
+    global app, login_manager, mongo_client, mongo_db, users_collection, meal_catalog
+
+    # Create a login manager object
+    login_manager = LoginManager()
+
+    app = Flask(__name__, static_folder='templates', static_url_path='')
+    app.config.from_object(Config)
+
+    # We can now pass in our app to the login manager
+    login_manager.init_app(app)
+
+    # Tell users what view to go to when they need to login.
+    login_manager.login_view = "login"
+
+    # Request timing and a Prometheus /metrics endpoint, only when METRICS=1
+    from myproject import metrics
+    metrics.init_app(app)
+
+    # Set DB_BACKEND=memory to run against an in-process store instead (no
+    # server needed; data is lost on exit) for profiling and local experiments.
+    if os.environ.get('DB_BACKEND', 'mongo') == 'memory':
+        from myproject.memorydb import MemoryClient
+        mongo_client = MemoryClient()
+    else:
+        mongo_client = MongoClient(MONGO_URI, event_listeners=metrics.mongo_listeners())
+    mongo_db = mongo_client[MONGO_DB_NAME]
+
+    # Create collections for users
+    users_collection = mongo_db['users']
+
+    # Shared recipe catalog cache, loaded lazily on first use
+    from myproject.catalog import MealCatalog
+    meal_catalog = MealCatalog(mongo_db)
+
+    # Server-side sessions: the cookie only carries a session ID.
+    # Set SESSION_BACKEND=cookie to fall back to Flask's signed-cookie sessions.
+    if os.environ.get('SESSION_BACKEND', 'mongo') == 'mongo':
+        from myproject.sessions import MongoSessionInterface
+        app.session_interface = MongoSessionInterface(mongo_db['sessions'])
+
+
+def __getattr__(name):
+    if name not in _SHARED:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _setup_lock:
+        if name not in globals():
+            _setup()
+    return globals()[name]
@@ -0,0 +1,268 @@
+"""
+Shared in-process cache of the recipe catalog.
+
+The breakfast and lunch/dinner collections are loaded once per process and
+kept as typed DataFrames plus ID -> row lookups. Importers bump a version
+stamp in the ``catalog_meta`` collection; the cache polls that stamp at most
+every ``check_interval`` seconds and reloads when it changes. Loads come from
+the memory-mapped snapshot for the current version when there is one (see
+``myproject.snapshot``), otherwise from MongoDB, after which the snapshot is
+written for the next process.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from myproject import snapshot
+from myproject.metrics import CATALOG_CACHE, CATALOG_DERIVED, span
+
+CATALOG_COLLECTIONS = ('breakfast', 'lunchdinner')
+
+# Columns that are numeric in the CSVs; some exports store them as strings
+# such as '0 mg', so they are coerced once at load time.
+NUMERIC_COLUMNS = ['ID', 'Calories', 'Proteins', 'Carbohydrates', 'Fiber', 'Fats',
+                   'Cholesterol', 'Sodium', 'Time', 'AggregatedRating', 'ReviewCount']
+
+# Fields that are only used for matching and never shown with a meal
+RECORD_EXCLUDE = ('_id', 'soup', 'Keywords', 'tokens')
+
+CATALOG_META = 'catalog_meta'
+CATALOG_META_ID = 'catalog'
+
+
+def plan_collection(position):
+    """Catalog holding the recipe at ``position`` of a plan (breakfast, lunch, dinner per day)"""
+    return 'breakfast' if position % 3 == 0 else 'lunchdinner'
+
+
+def get_catalog_version(db):
+    """Return the current catalog version stamp (0 if never stamped)"""
+    meta = db[CATALOG_META].find_one({'_id': CATALOG_META_ID}, {'version': 1})
+    if not meta:
+        return 0
+    return meta.get('version', 0)
+
+
+def bump_catalog_version(db):
+    """Mark the catalog as changed so every process reloads it"""
+    db[CATALOG_META].update_one(
+        {'_id': CATALOG_META_ID},
+        {'$inc': {'version': 1}, '$set': {'updated_at': datetime.utcnow()}},
+        upsert=True
+    )
+    return get_catalog_version(db)
+
+
+def _to_number(series):
+    """Coerce a column to numbers, stripping unit suffixes like ' mg'"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    extracted = series.astype(str).str.extract(r'([-+]?\d*\.?\d+)', expand=False)
+    return pd.to_numeric(extracted, errors='coerce')
+
+
+class CatalogTable:
+    """Immutable view of one catalog collection"""
+
+    def __init__(self, name, documents, version=0, frame=None):
+        self.name = name
+        self.documents = documents
+        self.version = version
+
+        # A ready-typed frame is passed in when loading from a snapshot
+        if frame is None:
+            frame = pd.DataFrame(documents)
+            if '_id' in frame.columns:
+                frame = frame.drop(columns=['_id'])
+            for column in NUMERIC_COLUMNS:
+                if column in frame.columns:
+                    frame[column] = _to_number(frame[column])
+            if 'ID' in frame.columns:
+                frame = frame[frame['ID'].notna()].reset_index(drop=True)
+                frame['ID'] = frame['ID'].astype('int64')
+            if 'soup' in frame.columns:
+                frame['soup'] = frame['soup'].fillna('').astype(str)
+        self.frame = frame
+
+        # ID -> row position in ``frame`` and ID -> display record
+        self.row_by_id = {}
+        self.record_by_id = {}
+        if 'ID' in frame.columns:
+            self.row_by_id = {int(recipe_id): row for row, recipe_id in enumerate(frame['ID'])}
+        for doc in documents:
+            recipe_id = doc.get('ID')
+            if recipe_id is None:
+                continue
+            try:
+                recipe_id = int(recipe_id)
+            except (TypeError, ValueError):
+                continue
+            self.record_by_id[recipe_id] = {k: v for k, v in doc.items() if k not in RECORD_EXCLUDE}
+
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frame)
+
+    def derived(self, key, builder):
+        """Return a structure computed from this table, building it once"""
+        value = self._derived.get(key)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(key)
+                if value is None:
+                    CATALOG_DERIVED.inc(key, 'miss')
+                    with span(f'catalog.derive.{key}'):
+                        value = builder(self)
+                    self._derived[key] = value
+                    return value
+        CATALOG_DERIVED.inc(key, 'hit')
+        return value
+
+
+def _build_tag_index(table):
+    from myproject.tagindex import TagIndex
+    frame = table.frame
+    # Cuisine labels extracted at import time, when every row has them
+    cuisines = None
+    if 'cuisines' in frame.columns and frame['cuisines'].map(lambda value: isinstance(value, list)).all():
+        cuisines = frame['cuisines'].tolist()
+    return TagIndex(frame['soup'], cuisines)
+
+
+class MealCatalog:
+    """Thread-safe, version-stamped cache of both recipe collections"""
+
+    def __init__(self, db, check_interval=None):
+        self.db = db
+        if check_interval is None:
+            check_interval = float(os.environ.get('CATALOG_CHECK_INTERVAL', 30))
+        # Set to None to never poll Mongo again once loaded (batch workers)
+        self.check_interval = check_interval
+        # Set to None to always load from Mongo and never write snapshots
+        self.snapshot_dir = (None if os.environ.get('CATALOG_SNAPSHOT', '1') == '0'
+                             else snapshot.CATALOG_SNAPSHOT_DIR)
+        self._lock = threading.RLock()
+        self._tables = None
+        self._version = None
+        self._checked_at = 0.0
+
+    @property
+    def version(self):
+        self._current()
+        return self._version
+
+    def _current(self):
+        tables = self._tables
+        if tables is not None and not self._needs_check():
+            CATALOG_CACHE.inc('hit')
+            return tables
+        with self._lock:
+            result = 'hit'
+            if self._tables is None:
+                self._load()
+                result = 'miss'
+            elif self._needs_check():
+                self._checked_at = time.monotonic()
+                if get_catalog_version(self.db) != self._version:
+                    self._load()
+                    result = 'miss'
+            CATALOG_CACHE.inc(result)
+            return self._tables
+
+    def _needs_check(self):
+        if self.check_interval is None:
+            return False
+        return time.monotonic() - self._checked_at >= self.check_interval
+
+    def _load(self):
+        version = get_catalog_version(self.db)
+        # Unstamped catalogs (version 0) may change without notice, so they
+        # are never snapshotted
+        use_snapshot = bool(self.snapshot_dir) and version != 0
+        tables = None
+        if use_snapshot:
+            with span('catalog.load_snapshot'):
+                tables = snapshot.load_snapshot(version, self.snapshot_dir)
+        if tables is None:
+            tables = self.load_from_db(version)
+            if use_snapshot:
+                try:
+                    snapshot.write_snapshot(tables, version, self.snapshot_dir)
+                except OSError as e:
+                    print(f"Error writing catalog snapshot: {e}")
+        self._tables = tables
+        self._version = version
+        self._checked_at = time.monotonic()
+
+    def load_from_db(self, version):
+        """Read every catalog collection from Mongo, bypassing snapshots"""
+        tables = {}
+        for name in CATALOG_COLLECTIONS:
+            with span('catalog.read'):
+                documents = list(self.db[name].find({}))
+            with span('catalog.frame'):
+                tables[name] = CatalogTable(name, documents, version)
+        return tables
+
+    def invalidate(self):
+        """Drop the cached tables; the next read reloads from Mongo"""
+        with self._lock:
+            self._tables = None
+            self._version = None
+
+    def table(self, name):
+        return self._current()[name]
+
+    def frame(self, name):
+        """Typed DataFrame for a collection (shared, do not modify in place)"""
+        return self.table(name).frame
+
+    def documents(self, name):
+        """Raw Mongo documents for a collection (shared, do not modify)"""
+        return self.table(name).documents
+
+    def neighbours(self, name):
+        """Top-K similar-recipe index for a collection, built or loaded once per version"""
+        from myproject.neighbours import load_or_build_neighbour_index
+        return self.table(name).derived('neighbours', load_or_build_neighbour_index)
+
+    def tags(self, name):
+        """Inverted tag/name/cuisine index over a collection's soup column"""
+        return self.table(name).derived('tags', _build_tag_index)
+
+    def constraints(self, name):
+        """Health/diet rules compiled to boolean masks for a collection"""
+        from myproject.constraints import ConstraintEngine
+        # One table for both, so a reload in between can't pair a new frame with old tags
+        table = self.table(name)
+        tag_index = table.derived('tags', _build_tag_index)
+        return table.derived(
+            'constraints', lambda table: ConstraintEngine(table.frame, tag_index=tag_index))
+
+    def collection_of(self, recipe_id):
+        """The one catalog holding a recipe ID, or None if unknown or in both"""
+        tables = self._current()
+        names = [name for name in CATALOG_COLLECTIONS if int(recipe_id) in tables[name].row_by_id]
+        return names[0] if len(names) == 1 else None
+
+    def record(self, name, recipe_id):
+        """Display record for one recipe ID, or None"""
+        record = self.table(name).record_by_id.get(int(recipe_id))
+        if record is None:
+            return None
+        return dict(record)
+
+    def records(self, name, ids):
+        """Display records for several recipe IDs, in order, skipping unknown IDs"""
+        table = self.table(name)
+        records = []
+        for recipe_id in ids:
+            record = table.record_by_id.get(int(recipe_id))
+            if record is not None:
+                records.append(dict(record))
+        return records
@@ -0,0 +1,216 @@
+"""
+Collaborative filtering over recipe reviews and meal feedback.
+
+Ratings from ``recipe_reviews`` (recipe_id) and ``meal_feedback`` (meal_id)
+form a sparse user x recipe matrix. Recipes are keyed by (collection, ID),
+because the breakfast and lunch/dinner catalogs reuse IDs; ratings stored
+without a collection are kept only when the ID is in a single catalog.
+The matrix is mean-centred and factorised with a
+truncated SVD; new ratings are folded in by re-solving only that user's
+factor vector (a small ridge regression). The first use trains the model
+in the calling thread; after that a stale model (older than ``max_age``
+seconds) is retrained by one background thread while requests keep using
+the old factors, and ratings folded in meanwhile are replayed onto the new
+ones. Scoring a user's candidates is a
+single matrix-vector product, and ``blend_scores`` mixes the predictions
+with the content-based similarity from the neighbour index.
+"""
+import threading
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.linalg import svds
+
+from myproject import meal_catalog, mongo_db
+
+# Weight of the collaborative prediction when blended with content similarity
+CF_WEIGHT = 0.3
+RATING_MIN = 1.0
+RATING_MAX = 5.0
+
+
+def _recipe_key(collection, recipe_id, catalog=None):
+    """(collection, int ID) for a rated recipe, or None if it can't be told apart"""
+    try:
+        recipe_id = int(recipe_id)
+    except (TypeError, ValueError):
+        return None
+    if collection is None:
+        # Ratings stored before the collection was recorded
+        collection = catalog.collection_of(recipe_id) if catalog is not None else None
+        if collection is None:
+            return None
+    return collection, recipe_id
+
+
+class CollaborativeModel:
+    """Truncated-SVD recommender with incremental fold-in of new ratings"""
+
+    def __init__(self, db, catalog=None, factors=16, regularization=0.5, max_age=3600):
+        self.db = db
+        self.catalog = catalog
+        self.factors = factors
+        self.regularization = regularization
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self.trained_at = None
+        self.global_mean = (RATING_MIN + RATING_MAX) / 2
+        self.item_index = {}
+        self.item_factors = np.zeros((0, factors))
+        self.user_factors = {}
+        self.user_ratings = {}
+        self._retraining = False
+        # Ratings folded in while a fit is running, replayed onto its result
+        self._pending = None
+
+    def _ratings_from_db(self):
+        """Yield (user key, (collection, recipe ID), rating) from both rating collections"""
+        sources = [('recipe_reviews', 'recipe_id'), ('meal_feedback', 'meal_id')]
+        for collection, field in sources:
+            cursor = self.db[collection].find(
+                {}, {'user_id': 1, field: 1, 'collection': 1, 'rating': 1, '_id': 0})
+            for doc in cursor.sort('date', 1):
+                key = _recipe_key(doc.get('collection'), doc.get(field), self.catalog)
+                yield doc.get('user_id'), key, doc.get('rating')
+
+    def fit(self, ratings):
+        """Train from scratch on (user key, (collection, recipe ID), rating) triples"""
+        with self._lock:
+            self._pending = []
+        user_ratings = {}
+        for user_id, key, rating in ratings:
+            try:
+                rating = float(rating)
+            except (TypeError, ValueError):
+                continue
+            if user_id is None or key is None:
+                continue
+            # Later ratings of the same recipe replace earlier ones
+            user_ratings.setdefault(str(user_id), {})[tuple(key)] = rating
+
+        users = list(user_ratings)
+        items = sorted({key for rated in user_ratings.values() for key in rated})
+        item_index = {key: column for column, key in enumerate(items)}
+        rows, cols, values = [], [], []
+        for row, user in enumerate(users):
+            for key, rating in user_ratings[user].items():
+                rows.append(row)
+                cols.append(item_index[key])
+                values.append(rating)
+        values = np.asarray(values, dtype=np.float64)
+        global_mean = float(values.mean()) if len(values) else (RATING_MIN + RATING_MAX) / 2
+
+        k = min(self.factors, len(users) - 1, len(items) - 1)
+        user_vectors = np.zeros((len(users), self.factors))
+        item_factors = np.zeros((len(items), self.factors))
+        if k >= 1:
+            matrix = csr_matrix((values - global_mean, (rows, cols)), shape=(len(users), len(items)))
+            u, s, vt = svds(matrix, k=k)
+            root = np.sqrt(s)
+            user_vectors[:, :k] = u * root
+            item_factors[:, :k] = vt.T * root
+
+        with self._lock:
+            self.global_mean = global_mean
+            self.item_index = item_index
+            self.item_factors = item_factors
+            self.user_ratings = user_ratings
+            self.user_factors = {user: user_vectors[row] for row, user in enumerate(users)}
+            self.trained_at = time.monotonic()
+            pending, self._pending = self._pending or [], None
+            for user, rated in pending:
+                self._fold(user, rated)
+        return self
+
+    def _retrain(self):
+        try:
+            self.fit(self._ratings_from_db())
+        except Exception as e:
+            print(f"Error training collaborative model: {e}")
+            with self._lock:
+                # Keep the old factors and wait a full max_age before trying again
+                self._pending = None
+                self.trained_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._retraining = False
+
+    def _ensure_trained(self):
+        trained_at = self.trained_at
+        if trained_at is not None and time.monotonic() - trained_at < self.max_age:
+            return
+        with self._lock:
+            if self.trained_at is None:
+                # Nothing to serve yet: the first caller trains, the others wait for it
+                self._retrain()
+                return
+            if self._retraining or time.monotonic() - self.trained_at < self.max_age:
+                return
+            self._retraining = True
+        threading.Thread(target=self._retrain, name='cf-retrain', daemon=True).start()
+
+    def _solve_user(self, rated):
+        """Ridge fold-in: the user vector that best explains their known ratings"""
+        columns = [self.item_index[r] for r in rated if r in self.item_index]
+        if not columns:
+            return None
+        values = np.array([rated[r] for r in rated if r in self.item_index]) - self.global_mean
+        q = self.item_factors[columns]
+        gram = q.T @ q + self.regularization * np.eye(q.shape[1])
+        return np.linalg.solve(gram, q.T @ values)
+
+    def fold_in(self, user_id, collection, recipe_id, rating):
+        """Add one new rating of a catalog recipe without retraining the item factors"""
+        self.fold_in_many(user_id, [(collection, recipe_id, rating)])
+
+    def fold_in_many(self, user_id, ratings):
+        """Add a user's (collection, recipe ID, rating) triples with a single re-solve"""
+        keyed = {}
+        for collection, recipe_id, rating in ratings:
+            key = _recipe_key(collection, recipe_id, self.catalog)
+            if key is not None:
+                keyed[key] = float(rating)
+        if user_id is None or not keyed:
+            return
+        self._ensure_trained()
+        with self._lock:
+            self._fold(str(user_id), keyed)
+
+    def _fold(self, user, ratings):
+        """Merge a user's new ratings and re-solve their vector (lock held)"""
+        if self._pending is not None:
+            self._pending.append((user, ratings))
+        rated = self.user_ratings.setdefault(user, {})
+        rated.update(ratings)
+        vector = self._solve_user(rated)
+        if vector is not None:
+            self.user_factors[user] = vector
+
+    def has_user(self, user_id):
+        self._ensure_trained()
+        return str(user_id) in self.user_factors
+
+    def score(self, user_id, collection, recipe_ids):
+        """Predicted ratings of ``collection`` recipes for a user (the global mean if unknown)"""
+        self._ensure_trained()
+        recipe_ids = np.asarray(recipe_ids)
+        predictions = np.full(len(recipe_ids), self.global_mean)
+        vector = self.user_factors.get(str(user_id))
+        if vector is None or len(recipe_ids) == 0:
+            return predictions
+        columns = np.array([self.item_index.get((collection, int(r)), -1) for r in recipe_ids])
+        known = columns >= 0
+        if known.any():
+            predictions[known] += self.item_factors[columns[known]] @ vector
+        return np.clip(predictions, RATING_MIN, RATING_MAX)
+
+
+def blend_scores(content_scores, predictions, weight=CF_WEIGHT):
+    """Mix cosine similarity (0..1) with predicted ratings rescaled to 0..1"""
+    content_scores = np.asarray(content_scores, dtype=np.float64)
+    preference = (np.asarray(predictions, dtype=np.float64) - RATING_MIN) / (RATING_MAX - RATING_MIN)
+    return (1 - weight) * content_scores + weight * preference
+
+
+cf_model = CollaborativeModel(mongo_db, meal_catalog)
@@ -0,0 +1,174 @@
+"""
+Declarative health/diet constraints for meal selection.
+
+Rules are plain data: per-condition nutrient bounds, tag requirements and an
+ordered list of relaxation tiers. ``ConstraintEngine`` compiles them once per
+catalog table into NumPy boolean masks over a columnar copy of the catalog,
+so filtering one meal slot is a handful of vector ANDs.
+"""
+import threading
+
+import numpy as np
+
+from myproject.tagindex import TagIndex
+
+# Columns a condition may bound. Bounds are inclusive (min, max); None leaves
+# that side open. Rows with a missing value fail any bound on that column.
+BOUND_COLUMNS = ['Calories', 'Proteins', 'Carbohydrates', 'Fats',
+                 'Sodium', 'Cholesterol', 'Fiber', 'Time']
+
+# Per-condition rules. Tags are matched case-insensitively against the
+# recipe's tags and name through the table's TagIndex; ``require_tags`` must
+# all match and ``exclude_tags`` must not match.
+CONDITION_RULES = {
+    # Applied for cancer, heart disease and high cholesterol profiles
+    'cancer': {
+        'bounds': {'Fiber': (None, 15)},
+        'require_tags': [],
+        'exclude_tags': ['high fiber'],
+    },
+    'diabetes': {
+        'bounds': {},
+        'require_tags': ['diabet'],
+        'exclude_tags': [],
+    },
+}
+
+# Tried in order until one yields at least one meal. ``calorie_window`` is the
+# (below, above) slack around the slot's calorie target, None for no limit;
+# windows are skipped when no calorie target is given (the plan solver
+# handles calories itself).
+# The cuisine preference only applies when no health condition is active.
+RELAXATION_TIERS = [
+    {'calorie_window': (-200, 50), 'conditions': True, 'cuisine': True},
+    {'calorie_window': (-400, 200), 'conditions': False, 'cuisine': False},
+    {'calorie_window': None, 'conditions': False, 'cuisine': False},
+]
+
+
+def conditions_from_flags(hascancer, hasdiabetes):
+    """Map the 'Y'/'N' flags used by firstmeal to condition rule names"""
+    conditions = []
+    if hascancer == 'Y':
+        conditions.append('cancer')
+    if hasdiabetes == 'Y':
+        conditions.append('diabetes')
+    return conditions
+
+
+class ConstraintEngine:
+    """Condition rules compiled to boolean masks over one catalog table"""
+
+    def __init__(self, frame, rules=None, tiers=None, tag_index=None):
+        self.rules = CONDITION_RULES if rules is None else rules
+        self.tiers = RELAXATION_TIERS if tiers is None else tiers
+        self.size = len(frame)
+        self.ids = frame['ID'].to_numpy(dtype=np.int64)
+        self.columns = {}
+        for column in BOUND_COLUMNS:
+            if column in frame.columns:
+                self.columns[column] = frame[column].to_numpy(dtype=np.float64)
+        self.tag_index = tag_index if tag_index is not None else TagIndex(frame['soup'].fillna(''))
+        self._tag_masks = {}
+        self._lock = threading.Lock()
+        self._all = np.ones(self.size, dtype=bool)
+        self._condition_masks = {name: self._compile(rule) for name, rule in self.rules.items()}
+
+    def tag_mask(self, tag):
+        """Rows whose tags or name contain ``tag`` (case-insensitive), cached per tag"""
+        tag = tag.lower()
+        mask = self._tag_masks.get(tag)
+        if mask is None:
+            mask = self.tag_index.mask(self.tag_index.bits(tag))
+            with self._lock:
+                self._tag_masks[tag] = mask
+        return mask
+
+    def bound_mask(self, column, low=None, high=None):
+        values = self.columns.get(column)
+        if values is None:
+            return self._all
+        mask = ~np.isnan(values)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        return mask
+
+    def _compile(self, rule):
+        mask = self._all.copy()
+        for column, (low, high) in rule.get('bounds', {}).items():
+            mask &= self.bound_mask(column, low, high)
+        for tag in rule.get('require_tags', []):
+            mask &= self.tag_mask(tag)
+        for tag in rule.get('exclude_tags', []):
+            mask &= ~self.tag_mask(tag)
+        return mask
+
+    def condition_mask(self, conditions):
+        mask = self._all
+        for name in conditions:
+            mask = mask & self._condition_masks[name]
+        return mask
+
+    def cuisine_mask(self, cuisine):
+        if not cuisine:
+            return self._all
+        return self.tag_mask(cuisine)
+
+    def tier_mask(self, tier, calorie, conditions=(), cuisine=None):
+        mask = self._all
+        if tier['conditions'] and conditions:
+            mask = mask & self.condition_mask(conditions)
+        if tier['cuisine'] and not conditions:
+            mask = mask & self.cuisine_mask(cuisine)
+        window = tier['calorie_window']
+        if window is not None and calorie is not None:
+            mask = mask & self.bound_mask('Calories', calorie + window[0], calorie + window[1])
+        return mask
+
+    def candidates(self, calorie, conditions=(), cuisine=None):
+        """Return (row positions, tier number) for the first tier with any match"""
+        for number, tier in enumerate(self.tiers):
+            rows = np.flatnonzero(self.tier_mask(tier, calorie, conditions, cuisine))
+            if len(rows):
+                return rows, number
+        return np.arange(self.size), len(self.tiers)
+
+    def planning_rows(self, conditions=(), cuisine=None, minimum=1):
+        """
+        Return (row positions, tier number) for the plan solver.
+
+        Tiers are relaxed in order like ``candidates``, but the health
+        conditions are never dropped: the first tier with at least
+        ``minimum`` rows wins, otherwise the largest condition-safe set.
+        """
+        best, best_tier = np.empty(0, dtype=np.int64), len(self.tiers) - 1
+        for number, tier in enumerate(self.tiers):
+            rows = np.flatnonzero(self.tier_mask(dict(tier, conditions=True), None, conditions, cuisine))
+            if len(rows) >= minimum:
+                return rows, number
+            if len(rows) > len(best):
+                best, best_tier = rows, number
+        return best, best_tier
+
+    def sample_distinct(self, calorie, count, conditions=(), cuisine=None):
+        """
+        Draw ``count`` different recipe IDs, preferring the strictest tier.
+
+        Rows are taken from each relaxation tier in turn until enough distinct
+        recipes are found; IDs only repeat if the whole table is too small.
+        """
+        chosen = np.empty(0, dtype=np.int64)
+        for tier in self.tiers:
+            need = count - len(chosen)
+            if need <= 0:
+                break
+            rows = np.flatnonzero(self.tier_mask(tier, calorie, conditions, cuisine))
+            rows = np.setdiff1d(rows, chosen, assume_unique=True)
+            if len(rows):
+                take = np.random.choice(rows, min(need, len(rows)), replace=False)
+                chosen = np.concatenate([chosen, take])
+        if 0 < len(chosen) < count:
+            chosen = np.concatenate([chosen, np.random.choice(chosen, count - len(chosen))])
+        return self.ids[chosen]
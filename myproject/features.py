@@ -0,0 +1,98 @@
+"""
+Import-time feature extraction for catalog recipes.
+
+The CSVs store ``Ingredients`` as a Python list literal and ``Steps`` as an
+unquoted ``[step one., step two., ...]`` string. ``recipe_features`` parses
+them once into arrays and adds the derived fields request paths need, so
+nothing re-parses text per request:
+
+* ``ingredient_names``: ingredients without quantities, units or prep notes
+* ``tags`` and ``cuisines``: the soup's tag phrases and cuisine labels
+* ``tokens``: the soup as bag-of-words tokens, as the neighbour index uses them
+"""
+import ast
+import re
+
+from sklearn.feature_extraction.text import CountVectorizer
+
+from myproject.tagindex import cuisine_labels, parse_soup
+
+# Steps end with a full stop (or ':'/'!'/'?') followed by the ', ' separator
+_STEP_SEP_RE = re.compile(r"(?<=[.!?:]),\s+")
+_PARENS_RE = re.compile(r"\([^)]*\)")
+_QUANTITY_RE = re.compile(r"^[\d\s/.,\-½¼¾⅓⅔]+")
+_UNITS = {
+    'cup', 'cups', 'tbsp', 'tbsps', 'tsp', 'tsps', 'teaspoon', 'teaspoons', 'tablespoon',
+    'tablespoons', 'g', 'gm', 'gms', 'gram', 'grams', 'kg', 'ml', 'litre', 'litres', 'liter',
+    'mm', 'inch', 'pinch', 'a', 'an', 'of', 'few', 'little', 'handful', 'nos', 'no', 'pieces',
+    'piece', 'sprig', 'sprigs', 'cloves', 'clove', 'bunch', 'packet', 'can', 'medium', 'large',
+    'small',
+}
+_PREP_WORDS = {
+    'chopped', 'finely', 'roughly', 'grated', 'sliced', 'thinly', 'diced', 'cubed', 'boiled',
+    'peeled', 'crushed', 'minced', 'deseeded', 'soaked', 'drained', 'fresh', 'freshly',
+    'ground', 'powdered', 'torn', 'shredded', 'cut', 'into', 'and', 'lightly', 'coarsely',
+}
+# Trailing notes like "salt to taste" or "oil for cooking"
+_NOTE_RE = re.compile(r"\s+(to taste|for .*|as required|as needed|optional)$")
+
+_analyzer = CountVectorizer(stop_words='english').build_analyzer()
+
+
+def parse_ingredients(value):
+    """Ingredient lines from the CSV's list literal (or an existing list)"""
+    if isinstance(value, list):
+        return value
+    if not isinstance(value, str) or not value.strip():
+        return []
+    try:
+        parsed = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        parsed = value.strip('[]').split(',')
+    if isinstance(parsed, str):
+        parsed = [parsed]
+    return [' '.join(str(item).split()) for item in parsed if str(item).strip()]
+
+
+def parse_steps(value):
+    """Method steps from the CSV's ``[step., step., ...]`` string (or a list)"""
+    if isinstance(value, list):
+        return value
+    if not isinstance(value, str) or not value.strip():
+        return []
+    text = value.strip()
+    if text.startswith('[') and text.endswith(']'):
+        text = text[1:-1]
+    return [' '.join(step.split()) for step in _STEP_SEP_RE.split(text) if step.strip()]
+
+
+def ingredient_name(line):
+    """Normalized ingredient name: '1/4 cup finely chopped onions' -> 'onions'"""
+    text = _PARENS_RE.sub(' ', line.lower())
+    text = _QUANTITY_RE.sub('', text.strip())
+    text = _NOTE_RE.sub('', text.split(',')[0].strip())
+    words = [word for word in re.findall(r"[a-z][a-z'\-]*", text)
+             if word not in _UNITS and word not in _PREP_WORDS]
+    return ' '.join(words)
+
+
+def recipe_features(record):
+    """Return ``record`` with parsed Ingredients/Steps and derived feature fields"""
+    record = dict(record)
+    ingredients = parse_ingredients(record.get('Ingredients'))
+    record['Ingredients'] = ingredients
+    record['Steps'] = parse_steps(record.get('Steps'))
+
+    names = []
+    for line in ingredients:
+        name = ingredient_name(line)
+        if name and name not in names:
+            names.append(name)
+    record['ingredient_names'] = names
+
+    soup = record.get('soup') if isinstance(record.get('soup'), str) else ''
+    tags, _ = parse_soup(soup)
+    record['tags'] = tags
+    record['cuisines'] = cuisine_labels(tags)
+    record['tokens'] = _analyzer(soup)
+    return record
@@ -1,83 +1,44 @@
-import pandas as pd
 import numpy as np
-import scipy.stats
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from myproject.models import User
-from myproject import mongo_db
-from collections import defaultdict
-
-# MongoDB doesn't need this function - data is already in dict format
-
-
-def meal(cuisine,meal,calorie,hascancer,hasdiabetes,df2):
-    # Make a copy to avoid modifying original
-    df_filtered = df2.copy()
-    
-    # Filter for cancer patients
-    if hascancer=='Y':
-        df_filtered = df_filtered[
-            (df_filtered['Fiber'] <= 15) & 
-            (~df_filtered['soup'].str.contains('high fiber', case=False, na=False))
-        ]
-    
-    # Filter for diabetes patients
-    if hasdiabetes=='Y':
-        df_filtered = df_filtered[
-            df_filtered['soup'].str.contains('diabet', case=False, na=False)
-        ]
+from myproject import meal_catalog
+from myproject.catalog import plan_collection
+from myproject.constraints import conditions_from_flags
+from myproject.planner import best_plans, best_days
+from myproject.collaborative import cf_model, blend_scores
+from myproject.metrics import span, timed
+
+# Recipe data comes from the shared meal_catalog cache, not straight from MongoDB
+
+
+@timed('meal')
+def meal(cuisine,meal,calorie,hascancer,hasdiabetes,rules):
+    # rules is the ConstraintEngine compiled for this catalog table
+    conditions = conditions_from_flags(hascancer, hasdiabetes)
+    with span('meal.candidates'):
+        rows, tier = rules.candidates(calorie, conditions, cuisine)
     
-    # Filter by cuisine if no health conditions
-    if hascancer!='Y' and hasdiabetes !='Y':
-        df_filtered = df_filtered[
-            df_filtered['soup'].str.contains(cuisine, case=False, na=False)
-        ]
-    
-    # Filter by calorie range
-    df_filtered = df_filtered[
-        (df_filtered['Calories'] >= calorie - 200) & 
-        (df_filtered['Calories'] <= calorie + 50)
-    ]
-    
-    # If no results after filtering, relax constraints
-    if len(df_filtered) == 0:
+    # If no results after filtering, constraints were relaxed
+    if tier > 0:
         print(f"Warning: No meals found with strict filters. Relaxing constraints...")
-        df_filtered = df2.copy()
-        
-        # Try with just calorie constraint (wider range)
-        df_filtered = df_filtered[
-            (df_filtered['Calories'] >= calorie - 400) & 
-            (df_filtered['Calories'] <= calorie + 200)
-        ]
-        
-        # If still empty, just use all meals
-        if len(df_filtered) == 0:
-            print(f"Warning: Using all available meals")
-            df_filtered = df2.copy()
+    if tier >= len(rules.tiers) - 1:
+        print(f"Warning: Using all available meals")
     
     lst = []
     if meal == 'breakfast':
-        lst.append(int(df_filtered.sample()['ID'].values[0]))
+        lst.append(int(rules.ids[np.random.choice(rows)]))
         return lst
     else:
-        # Get first meal
-        lst.append(int(df_filtered.sample()['ID'].values[0]))
-        
-        # Get second meal (different from first)
-        if len(df_filtered) > 1:
-            remaining = df_filtered[df_filtered['ID'] != lst[0]]
-            if len(remaining) > 0:
-                lst.append(int(remaining.sample()['ID'].values[0]))
-            else:
-                # If only one option, use it twice
-                lst.append(lst[0])
+        # Get two different meals if possible
+        if len(rows) > 1:
+            picks = np.random.choice(rows, 2, replace=False)
+            lst.extend(int(rules.ids[row]) for row in picks)
         else:
             # If only one option, use it twice
+            lst.append(int(rules.ids[rows[0]]))
             lst.append(lst[0])
         
         return lst
 
-def generatemeal(age,height,weight,exercise,sex,hascancer,hasdiabetes,cuisine):
+def dailycalorie(age,height,weight,exercise,sex):
     BMR=0
     if sex=='M':
       BMR = 13.397*weight + 4.799*height - 5.677*age + 88.362  
@@ -89,145 +50,121 @@ def generatemeal(age,height,weight,exercise,sex,hascancer,hasdiabetes,cuisine):
 # Moderately active (moderate exercise/sports 3-5 days/week) : Calorie-Calculation = BMR x 1.55
 # Very active (hard exercise/sports 6-7 days a week) : Calorie-Calculation = BMR x 1.725
 # If you are extra active (very hard exercise/sports & a physical job) : Calorie-Calculation = BMR x 1.9
-    calorie=BMR*exercise
+    return BMR*exercise
+
+def missingrecord(recipe_id):
+    """Stand-in for a recipe no longer in the catalog, so plan positions stay aligned"""
+    return {'ID': int(recipe_id), 'Name': 'Recipe no longer available', 'Ingredients': '',
+            'Steps': '', 'missing': True}
+
+def planrecords(lst):
+    """Display records for a plan laid out as breakfast, lunch, dinner per day"""
+    lstDoc = []
+    for i, recipe_id in enumerate(lst):
+        record = meal_catalog.record(plan_collection(i), recipe_id)
+        lstDoc.append(record if record is not None else missingrecord(recipe_id))
+    return lstDoc
+
+@timed('generatemeal')
+def generatemeal(age,height,weight,exercise,sex,hascancer,hasdiabetes,cuisine):
+    calorie=dailycalorie(age,height,weight,exercise,sex)
+    conditions = conditions_from_flags(hascancer, hasdiabetes)
     
-    # Data loaded from MongoDB collections
+    # Data loaded from the shared catalog cache
+    with span('generatemeal.rules'):
+        breakfastrules = meal_catalog.constraints('breakfast')
+        lunchrules = meal_catalog.constraints('lunchdinner')
     
-    # Load Breakfast from MongoDB collection 'breakfast'
-    dfb = pd.DataFrame(list(mongo_db['breakfast'].find({}, {"_id": 0})))
-    # dfb=pd.read_csv('Breakfast.csv')  
-    dfb2=dfb.copy()
-    breakfastlst=meal(cuisine,'breakfast',1/7*calorie,hascancer,hasdiabetes,dfb)
+    # Pick one of the few best-scoring days so menus still vary
+    with span('generatemeal.best_plans'):
+        plans = best_plans(breakfastrules, lunchrules, calorie, conditions, cuisine)
+    if plans:
+        breakfastlst = list(plans[np.random.randint(len(plans))]['ids'])
+    else:
+        breakfastlst=meal(cuisine,'breakfast',1/7*calorie,hascancer,hasdiabetes,breakfastrules)
+        lunchlst=meal(cuisine,'lunch',2/10*calorie,hascancer,hasdiabetes,lunchrules)
+        breakfastlst.extend(lunchlst)
     
-    # dfl=pd.read_csv('LunchDinner.csv')
-    # Load LunchDinner from MongoDB collection 'lunchdinner'
-    dfl = pd.DataFrame(list(mongo_db['lunchdinner'].find({}, {"_id": 0})))
-    # dfl=pd.read_csv('LunchDinner.csv')
-    dfl2=dfl.copy()
-
-    lunchlst=meal(cuisine,'lunch',2/10*calorie,hascancer,hasdiabetes,dfl)
-    breakfastlst.extend(lunchlst)
+    with span('generatemeal.records'):
+        lstDoc = planrecords(breakfastlst)
+    return lstDoc, breakfastlst
+
+@timed('generateweek')
+def generateweek(age,height,weight,exercise,sex,hascancer,hasdiabetes,cuisine,days=7):
+    """Plan several days at once with no recipe repeated across the plan"""
+    calorie=dailycalorie(age,height,weight,exercise,sex)
+    conditions = conditions_from_flags(hascancer, hasdiabetes)
     
-    dfb2.drop(columns=['soup'], inplace=True)
-    dfl2.drop(columns=['soup'], inplace=True)
+    breakfastrules = meal_catalog.constraints('breakfast')
+    lunchrules = meal_catalog.constraints('lunchdinner')
     
-    dfm = dfb2.loc[dfb2['ID'] == breakfastlst[0]]
+    # One scoring pass for the whole week, then non-overlapping days evened out
+    # across the week (days short of the calorie target are logged)
+    plans = best_days(breakfastrules, lunchrules, calorie, days, conditions, cuisine)
+    if len(plans) == days:
+        weeklst = [recipe_id for plan in plans for recipe_id in plan['ids']]
+        return planrecords(weeklst), weeklst
     
-    for i in range(1,len(breakfastlst)):
-        dfm = pd.concat([dfm, dfl2.loc[dfl2['ID'] == breakfastlst[i]]], ignore_index=True)
-    lstDoc = dfm.to_dict('records')
-    return lstDoc, breakfastlst
-#     return breakfastlst
-
-def get_recommendations(ID, cosine_sim, idx,df):
-    # Get the index of the item that matches the title
-    indices_from_food_id = pd.Series(df.index, index=df['ID'])
-    if idx == -1 and ID != "":
-        idx = indices_from_food_id[ID]
-
-    # Get the pairwsie similarity scores of all dishes with that dish
-    sim_scores = list(enumerate(cosine_sim[idx]))
-
-    # Sort the dishes based on the similarity scores
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
+    # Too few recipes to fill the week from scored plans; draw them in one batch
+    breakfastids = breakfastrules.sample_distinct(1/7*calorie, days, conditions, cuisine)
+    lunchids = lunchrules.sample_distinct(2/10*calorie, 2*days, conditions, cuisine)
     
-    # Get the scores of the 10 most similar dishes
-    sim_scores = sim_scores[1:25]
-
-    # Get the food indices
-    food_indices = [i[0] for i in sim_scores]
-
-    # Return the top 10 most similar dishes
-    return food_indices[1]
-
-def cosinemat(df):
-    count = CountVectorizer(stop_words='english')
+    weeklst = []
+    for day in range(days):
+        weeklst.extend([int(breakfastids[day]), int(lunchids[2*day]), int(lunchids[2*day+1])])
+    
+    lstDoc = planrecords(weeklst)
+    return lstDoc, weeklst
+#     return breakfastlst
 
-    # df1['soup']
-    count_matrix = count.fit_transform(df['soup'])
+@timed('similarmeals')
+def similarmeals(lst, userID=None):
+    """Swap each meal of a plan for a similar one using the precomputed neighbour index"""
+    indexes = {name: meal_catalog.neighbours(name) for name in ('breakfast', 'lunchdinner')}
+    # Users with ratings get swaps ranked by similarity blended with their predicted rating
+    personalised = userID is not None and cf_model.has_user(userID)
+
+    newlst = []
+    chosen = {name: [] for name in indexes}
+    for i, recipe_id in enumerate(lst):
+        collection = plan_collection(i)
+        index = indexes[collection]
+        # Skip recipes already in the new plan so swaps don't introduce repeats
+        if personalised:
+            ids, scores = index.neighbours_of(recipe_id)
+            keep = ~np.isin(ids, chosen[collection])
+            ids, scores = ids[keep], scores[keep]
+            similar = None
+            if len(ids):
+                blended = blend_scores(scores, cf_model.score(userID, collection, ids))
+                similar = int(ids[np.argmax(blended)])
+        else:
+            similar = index.similar(recipe_id, exclude=chosen[collection])
+        newlst.append(similar if similar is not None else recipe_id)
+        chosen[collection].append(newlst[-1])
 
-    # Compute the Cosine Similarity matrix based on the count_matrix
-    cosine_sim = cosine_similarity(count_matrix, count_matrix)
-    
-    #indices_from_title = pd.Series(df.index, index=df['Name'])
-    indices_from_food_id = pd.Series(df.index, index=df['ID'])
-    return cosine_sim    
+    lstDoc = planrecords(newlst)
+    return lstDoc, newlst
 
+@timed('onClickGenerateMeal')
 def onClickGenerateMeal(userID,age,height,weight,sex,exercise,hascancer,hasdiabetes,cuisine,lst):
      # Retrieve previously suggested meal from MongoDB 
     if not lst:
         lstDoc, breakfastlst = generatemeal(age,height,weight,exercise,sex,hascancer,hasdiabetes,cuisine)
         return lstDoc, breakfastlst
     else:
-        breakfastid=lst[0]
-        lunchid=lst[1]
-        dinnerid=lst[2]
-        
-        dfb = pd.DataFrame(list(mongo_db['breakfast'].find({}, {"_id": 0})))
-        dfb2 = dfb.copy()
-        cosine_sim=cosinemat(dfb)
-
-        newlst = []
-        brkid = get_recommendations(breakfastid,cosine_sim,-1,dfb)
-        newlst.append(brkid)
-        
-        dfl = pd.DataFrame(list(mongo_db['lunchdinner'].find({}, {"_id": 0})))
-        dfl2 = dfl.copy()
-
-        cosine_sim=cosinemat(dfl)
-        lid = get_recommendations(lunchid,cosine_sim,-1,dfl)
-        newlst.append(lid)
-        did = get_recommendations(dinnerid,cosine_sim,-1,dfl)
-        newlst.append(did)
-        
-        dfb2.drop(columns=['soup'], inplace=True)
-        dfl2.drop(columns=['soup'], inplace=True)
-        
-        dfm = dfb2.loc[dfb2['ID'] == newlst[0]]
-        
-        for i in range(1,len(newlst)):
-            dfm = pd.concat([dfm, dfl2.loc[dfl2['ID'] == newlst[i]]], ignore_index=True)
-        lstDoc = dfm.to_dict('records')
-        return lstDoc, newlst
+        return similarmeals(lst, userID)
 
 
 
+@timed('feedbacklst')
 def feedbacklst(userID,age,height,weight,sex,exercise,hascancer,hasdiabetes,cuisine,lst):
     
     if not lst:
         lstDoc, breakfastlst = generatemeal(age,height,weight,exercise,sex,hascancer,hasdiabetes,cuisine)
         return lstDoc, breakfastlst
     else:
-        breakfastid=lst[0]
-        lunchid=lst[1]
-        dinnerid=lst[2]
-        
-        dfb = pd.DataFrame(list(mongo_db['breakfast'].find({}, {"_id": 0})))
-        dfb2 = dfb.copy()
-        cosine_sim=cosinemat(dfb)
-
-        newlst = []
-        brkid = get_recommendations(breakfastid,cosine_sim,-1,dfb)
-        newlst.append(brkid)
-        
-        dfl = pd.DataFrame(list(mongo_db['lunchdinner'].find({}, {"_id": 0})))
-        dfl2 = dfl.copy()
-
-        cosine_sim=cosinemat(dfl)
-        lid = get_recommendations(lunchid,cosine_sim,-1,dfl)
-        newlst.append(lid)
-        did = get_recommendations(dinnerid,cosine_sim,-1,dfl)
-        newlst.append(did)
-        
-        dfb2.drop(columns=['soup'], inplace=True)
-        dfl2.drop(columns=['soup'], inplace=True)
-        
-        dfm = dfb2.loc[dfb2['ID'] == newlst[0]]
-        
-        for i in range(1,len(newlst)):
-            dfm = pd.concat([dfm, dfl2.loc[dfl2['ID'] == newlst[i]]], ignore_index=True)
-        lstDoc = dfm.to_dict('records')
-        return lstDoc, newlst
+        return similarmeals(lst, userID)
 
 
 
@@ -245,7 +182,11 @@ def gender():
     """Get user gender - should be passed from user profile"""
     return 'M'
 
-def cuisine():
-    """Get user cuisine preference - should be passed from user profile"""
-    # Return a more generic cuisine that's likely in the database
-    return 'indian'
\ No newline at end of file
+def cuisine(preference=None):
+    """Get user cuisine preference, resolved against the catalog's cuisine labels"""
+    # Fall back to a generic cuisine that's known to be in the database
+    if preference:
+        preference = ' '.join(preference.lower().split())
+        if meal_catalog.tags('lunchdinner').has_cuisine(preference):
+            return preference
+    return 'indian'
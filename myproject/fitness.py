@@ -1,15 +1,23 @@
-from myproject import mongo_db
+from myproject import mongo_db, meal_catalog
 from flask import session
 import pandas as pd
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 import random
+import re
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import StandardScaler
 import joblib
 import os
 import pickle
 from bson import ObjectId
+from pymongo import UpdateOne, ReplaceOne
+from pymongo.errors import DuplicateKeyError
+from myproject.catalog import plan_collection
+from myproject.collaborative import cf_model
+from myproject.trend import summarize
+from myproject.metrics import timed
+from myproject.indexes import INDEXES
 
 # Collections
 users_collection = mongo_db['users']
@@ -17,21 +25,33 @@ meal_preferences = mongo_db['meal_preferences']
 fitness_goals = mongo_db['fitness_goals']
 workout_logs = mongo_db['workout_logs']
 meal_feedback = mongo_db['meal_feedback']
+weight_history = mongo_db['weight_history']
+# Per-user, per-day workout totals and running streaks, maintained by log_workout
+daily_activity = mongo_db['daily_activity']
+activity_streaks = mongo_db['activity_streaks']
+
+# Attempts at the conditional streak update before giving up on a busy user
+STREAK_RETRIES = 5
 
 class AIRecommendationEngine:
     """AI-powered meal recommendation engine using collaborative filtering and content-based filtering"""
     
     def __init__(self):
-        self.breakfast_data = self._load_meal_data('breakfast')
-        self.lunch_dinner_data = self._load_meal_data('lunchdinner')
         self.user_preferences = {}
         self.seasonal_ingredients = self._get_seasonal_ingredients()
+    
+    @property
+    def breakfast_data(self):
+        return self._load_meal_data('breakfast')
+    
+    @property
+    def lunch_dinner_data(self):
+        return self._load_meal_data('lunchdinner')
         
     def _load_meal_data(self, collection_name):
-        """Load meal data from MongoDB collection"""
+        """Load meal data from the shared catalog cache (documents are shared, copy before modifying)"""
         try:
-            data = list(mongo_db[collection_name].find({}))
-            return data
+            return meal_catalog.documents(collection_name)
         except Exception as e:
             print(f"Error loading meal data: {e}")
             return []
@@ -191,8 +211,11 @@ class AIRecommendationEngine:
         }
         
         meal_substitutions = {}
-        for ingredient in meal.get('ingredients', '').lower().split(','):
-            ingredient = ingredient.strip()
+        # Normalized names are extracted at import time; older catalogs fall back to splitting text
+        ingredients = meal.get('ingredient_names')
+        if ingredients is None:
+            ingredients = [ingredient.strip() for ingredient in meal.get('ingredients', '').lower().split(',')]
+        for ingredient in ingredients:
             for key in substitutions:
                 if key in ingredient:
                     meal_substitutions[ingredient] = random.sample(substitutions[key], 1)[0]
@@ -227,7 +250,7 @@ class AIRecommendationEngine:
             
             # Breakfast
             if breakfast_options:
-                breakfast = random.choice(breakfast_options)
+                breakfast = dict(random.choice(breakfast_options))
                 breakfast = self._add_seasonal_ingredients(breakfast)
                 breakfast = self._add_substitution_options(breakfast)
                 breakfast['meal_type'] = 'breakfast'
@@ -235,7 +258,7 @@ class AIRecommendationEngine:
             
             # Lunch
             if lunch_dinner_options:
-                lunch = random.choice(lunch_dinner_options)
+                lunch = dict(random.choice(lunch_dinner_options))
                 lunch = self._add_seasonal_ingredients(lunch)
                 lunch = self._add_substitution_options(lunch)
                 lunch['meal_type'] = 'lunch'
@@ -248,14 +271,14 @@ class AIRecommendationEngine:
                 if not dinner_options:
                     dinner_options = lunch_dinner_options
                 
-                dinner = random.choice(dinner_options)
+                dinner = dict(random.choice(dinner_options))
                 dinner = self._add_seasonal_ingredients(dinner)
                 dinner = self._add_substitution_options(dinner)
                 dinner['meal_type'] = 'dinner'
                 recommended_meals.append(dinner)
             
-            # Store recommendations in session for persistence
-            session['meal_recommendations'] = recommended_meals
+            # Store only references in the session; records are hydrated from the catalog
+            session['meal_recommendations'] = [_meal_ref(meal) for meal in recommended_meals]
             
             return recommended_meals
             
@@ -263,23 +286,98 @@ class AIRecommendationEngine:
             print(f"Error generating meal recommendations: {e}")
             return []
     
-    def update_preferences_from_feedback(self, user_id, meal_id, rating, feedback_text):
-        """Update user preferences based on meal feedback"""
+    def update_preferences_from_feedback(self, user_id, meal_id, rating, feedback_text, collection=None):
+        """Update user preferences based on feedback for one catalog meal"""
         try:
             feedback_data = {
                 'user_id': ObjectId(user_id),
                 'meal_id': meal_id,
+                'collection': collection,
                 'rating': rating,
                 'feedback': feedback_text,
                 'date': datetime.utcnow()
             }
             
             meal_feedback.insert_one(feedback_data)
+            cf_model.fold_in(user_id, collection, meal_id, rating)
             return True
         except Exception as e:
             print(f"Error updating preferences: {e}")
             return False
 
+    def record_plan_feedback(self, user_id, plan, rating, meal_ratings, feedback_text):
+        """
+        Store feedback on a whole plan: the overall rating once, against the
+        plan, and a rating per meal only for the meals the user rated
+        (``meal_ratings`` maps plan positions to ratings). Only the per-meal
+        ratings train the collaborative model.
+        """
+        try:
+            now = datetime.utcnow()
+            documents = []
+            if rating:
+                documents.append({
+                    'user_id': ObjectId(user_id),
+                    'plan': [int(recipe_id) for recipe_id in plan],
+                    'rating': rating,
+                    'feedback': feedback_text,
+                    'date': now
+                })
+            rated = []
+            for position, meal_rating in sorted(meal_ratings.items()):
+                collection = plan_collection(position)
+                rated.append((collection, int(plan[position]), meal_rating))
+                documents.append({
+                    'user_id': ObjectId(user_id),
+                    'meal_id': int(plan[position]),
+                    'collection': collection,
+                    'rating': meal_rating,
+                    'feedback': None,
+                    'date': now
+                })
+            if documents:
+                meal_feedback.insert_many(documents)
+            cf_model.fold_in_many(user_id, rated)
+            return True
+        except Exception as e:
+            print(f"Error recording plan feedback: {e}")
+            return False
+
+
+def _activity_day(date):
+    """UTC midnight of ``date``, the key of its daily_activity rollup"""
+    return datetime(date.year, date.month, date.day)
+
+# Field names can't contain '.' or start with '$', so exercise names are
+# percent-encoded in the rollup's exercises map and decoded when read back
+_NO_EXERCISE = '%00'
+_EXERCISE_ESCAPES = {'%': '%25', '.': '%2E', '$': '%24'}
+_EXERCISE_UNESCAPES = {code: char for char, code in _EXERCISE_ESCAPES.items()}
+
+def _exercise_key(exercise):
+    """Exercise name encoded as a field name in the rollup's exercises map"""
+    if exercise is None:
+        return _NO_EXERCISE
+    return re.sub(r'[%.$]', lambda match: _EXERCISE_ESCAPES[match.group()], str(exercise))
+
+def _exercise_name(key):
+    """The exercise name an exercises-map key was made from"""
+    if key == _NO_EXERCISE:
+        return None
+    return re.sub(r'%(25|2E|24)', lambda match: _EXERCISE_UNESCAPES[match.group()], key)
+
+def _advance_streak(streak, day):
+    """Streak counters after a workout on ``day`` (days arrive in order)"""
+    last_day = streak.get('last_day')
+    current = streak.get('current', 0)
+    if last_day == day:
+        return dict(streak)
+    if last_day is not None and day - last_day == pd.Timedelta(days=1):
+        current += 1
+    else:
+        current = 1
+    return {'current': current, 'longest': max(current, streak.get('longest', 0)), 'last_day': day}
+
 
 class FitnessTracker:
     """Comprehensive fitness tracking with analytics and goal setting"""
@@ -287,6 +385,8 @@ class FitnessTracker:
     def __init__(self):
         self.exercise_data = self._load_exercise_data()
         self.calorie_burn_rates = self._load_calorie_burn_rates()
+        # Users whose rollups are known to cover their whole workout log
+        self._backfilled = set()
     
     def _load_exercise_data(self):
         """Load exercise data with muscle groups and difficulty levels"""
@@ -339,6 +439,7 @@ class FitnessTracker:
         weight_factor = user_weight / 70.0  # Adjust for user weight (baseline is 70kg)
         return base_burn_rate * duration_minutes * weight_factor
     
+    @timed('FitnessTracker.log_workout')
     def log_workout(self, user_id, exercise_name, duration_minutes, intensity, notes=None):
         """Log a workout for a user"""
         try:
@@ -365,6 +466,7 @@ class FitnessTracker:
             
             # Insert into database
             workout_logs.insert_one(workout_data)
+            self._record_activity(workout_data)
             
             # Check if any fitness goals have been achieved
             self._check_goal_achievements(user_id)
@@ -374,6 +476,7 @@ class FitnessTracker:
             print(f"Error logging workout: {e}")
             return False
     
+    @timed('FitnessTracker.get_workout_history')
     def get_workout_history(self, user_id, days=30):
         """Get workout history for a user"""
         try:
@@ -392,13 +495,86 @@ class FitnessTracker:
             print(f"Error getting workout history: {e}")
             return []
     
+    def _record_activity(self, workout):
+        """Fold one logged workout into its day's rollup and the user's streak"""
+        day = _activity_day(workout['date'])
+        result = daily_activity.update_one(
+            {'user_id': workout['user_id'], 'day': day},
+            {'$inc': {
+                'workouts': 1,
+                'minutes': workout.get('duration') or 0,
+                'calories': workout.get('calories_burned') or 0,
+                f"exercises.{_exercise_key(workout.get('exercise'))}": 1
+            }},
+            upsert=True
+        )
+        # Only the first workout of a day can move the streak
+        if result.upserted_id is not None:
+            self._record_streak(workout['user_id'], day)
+    
+    def _record_streak(self, user_id, day):
+        """
+        Advance the user's streak to ``day``.
+        
+        Each write only applies if the streak still holds the values it was
+        computed from (compare-and-set on last_day and current), so workouts
+        logged concurrently can't overwrite each other's update; a lost race
+        re-reads and tries again.
+        """
+        previous = day - timedelta(days=1)
+        for _ in range(STREAK_RETRIES):
+            streak = activity_streaks.find_one({'_id': user_id}) or {}
+            last_day = streak.get('last_day')
+            if last_day is not None and last_day >= day:
+                return
+            if last_day == previous:
+                current = streak.get('current', 0)
+                query = {'_id': user_id, 'last_day': previous, 'current': current}
+                update = {'$inc': {'current': 1}, '$set': {'last_day': day},
+                          '$max': {'longest': current + 1}}
+            else:
+                query = {'_id': user_id, 'last_day': last_day}
+                update = {'$set': {'current': 1, 'last_day': day}, '$max': {'longest': 1}}
+            try:
+                # Upserts only when there is no streak yet; a concurrent insert
+                # makes this one fail on the _id and retry
+                result = activity_streaks.update_one(query, update, upsert=last_day is None)
+            except DuplicateKeyError:
+                continue
+            if result.matched_count or result.upserted_id is not None:
+                return
+        print(f"Error recording workout streak for {user_id}: too many concurrent updates")
+    
+    def _ensure_activity(self, user_id):
+        """
+        Build a user's rollups from workout_logs the first time they're read.
+        
+        Rollups only exist for workouts logged since they were introduced;
+        the rebuild marks the user's streak as backfilled so older histories
+        are folded in once, without waiting for rebuild_activity.py.
+        """
+        key = str(user_id)
+        if key in self._backfilled:
+            return
+        if not activity_streaks.find_one({'_id': ObjectId(user_id), 'backfilled': True}, {'_id': 1}):
+            self.rebuild_daily_activity(key)
+        self._backfilled.add(key)
+    
+    @timed('FitnessTracker.get_workout_analytics')
     def get_workout_analytics(self, user_id, days=30):
         """Get workout analytics for a user"""
         try:
-            # Get workout history
-            history = self.get_workout_history(user_id, days)
+            self._ensure_activity(user_id)
+            end_date = datetime.utcnow()
+            start_date = _activity_day(end_date - pd.Timedelta(days=days))
             
-            if not history:
+            # At most one rollup per day in the window
+            rollups = list(daily_activity.find({
+                'user_id': ObjectId(user_id),
+                'day': {'$gte': start_date, '$lte': end_date}
+            }, {'workouts': 1, 'minutes': 1, 'calories': 1, 'exercises': 1}))
+            
+            if not rollups:
                 return {
                     'total_workouts': 0,
                     'total_duration': 0,
@@ -407,69 +583,119 @@ class FitnessTracker:
                     'streak': 0
                 }
             
-            # Calculate analytics
-            total_workouts = len(history)
-            total_duration = sum(workout.get('duration', 0) for workout in history)
-            total_calories = sum(workout.get('calories_burned', 0) for workout in history)
-            
-            # Exercise breakdown
             exercise_breakdown = {}
-            for workout in history:
-                exercise = workout.get('exercise')
-                if exercise in exercise_breakdown:
-                    exercise_breakdown[exercise] += 1
-                else:
-                    exercise_breakdown[exercise] = 1
-            
-            # Calculate streak
-            streak = self._calculate_workout_streak(history)
+            for rollup in rollups:
+                for key, count in rollup.get('exercises', {}).items():
+                    exercise = _exercise_name(key)
+                    exercise_breakdown[exercise] = exercise_breakdown.get(exercise, 0) + count
             
             return {
-                'total_workouts': total_workouts,
-                'total_duration': total_duration,
-                'total_calories': total_calories,
+                'total_workouts': sum(rollup.get('workouts', 0) for rollup in rollups),
+                'total_duration': sum(rollup.get('minutes', 0) for rollup in rollups),
+                'total_calories': sum(rollup.get('calories', 0) for rollup in rollups),
                 'exercise_breakdown': exercise_breakdown,
-                'streak': streak
+                'streak': self.get_workout_streak(user_id)
             }
         except Exception as e:
             print(f"Error getting workout analytics: {e}")
             return {}
     
-    def _calculate_workout_streak(self, workout_history):
-        """Calculate current workout streak in days"""
-        if not workout_history:
-            return 0
-        
-        # Convert workout dates to days only
-        workout_dates = [workout.get('date').date() for workout in workout_history]
-        unique_dates = sorted(set(workout_dates), reverse=True)
-        
-        if not unique_dates:
-            return 0
+    @timed('FitnessTracker.get_workout_streak')
+    def get_workout_streak(self, user_id, with_longest=False):
+        """Current workout streak in days (and the longest one if asked)"""
+        self._ensure_activity(user_id)
+        streak = activity_streaks.find_one({'_id': ObjectId(user_id)}) or {}
+        current = streak.get('current', 0)
+        last_day = streak.get('last_day')
+        # A streak survives until a whole day passes without a workout
+        if last_day is None or _activity_day(datetime.utcnow()) - last_day > pd.Timedelta(days=1):
+            current = 0
+        if with_longest:
+            return current, streak.get('longest', 0)
+        return current
+    
+    @timed('FitnessTracker.rebuild_daily_activity')
+    def rebuild_daily_activity(self, user_id=None):
+        """
+        Recompute rollups and streaks from workout_logs (for backfills); return rollup count.
         
-        # Calculate streak
-        streak = 1
-        today = datetime.utcnow().date()
+        A full rebuild writes into staging collections and renames them over
+        the live ones, so readers never see them empty or half written;
+        users who log workouts meanwhile are rebuilt again afterwards. A
+        single user's rollups are replaced day by day before that user's
+        stale days are removed.
+        """
+        started = datetime.utcnow()
+        match = {'user_id': ObjectId(user_id)} if user_id else {}
+        pipeline = [
+            {'$match': match},
+            {'$group': {
+                '_id': {
+                    'user_id': '$user_id',
+                    'day': {'$dateTrunc': {'date': '$date', 'unit': 'day'}},
+                    'exercise': '$exercise'
+                },
+                'workouts': {'$sum': 1},
+                'minutes': {'$sum': '$duration'},
+                'calories': {'$sum': '$calories_burned'}
+            }},
+            {'$sort': {'_id.user_id': 1, '_id.day': 1}}
+        ]
+        rollups = {}
+        for group in workout_logs.aggregate(pipeline, allowDiskUse=True):
+            key = (group['_id']['user_id'], group['_id']['day'])
+            rollup = rollups.setdefault(key, {
+                'user_id': key[0], 'day': key[1], 'workouts': 0, 'minutes': 0, 'calories': 0, 'exercises': {}
+            })
+            rollup['workouts'] += group['workouts']
+            rollup['minutes'] += group['minutes']
+            rollup['calories'] += group['calories']
+            exercise = _exercise_key(group['_id']['exercise'])
+            rollup['exercises'][exercise] = rollup['exercises'].get(exercise, 0) + group['workouts']
         
-        # Check if worked out today
-        if unique_dates[0] != today:
-            # Check if worked out yesterday
-            yesterday = today - pd.Timedelta(days=1)
-            if unique_dates[0] != yesterday:
-                return 0  # Streak broken
+        if user_id:
+            rollup_target, streak_target = daily_activity, activity_streaks
+        else:
+            rollup_target = self._staging(daily_activity)
+            streak_target = self._staging(activity_streaks)
         
-        # Count consecutive days
-        for i in range(len(unique_dates) - 1):
-            current_date = unique_dates[i]
-            next_date = unique_dates[i + 1]
-            
-            if (current_date - next_date).days == 1:
-                streak += 1
-            else:
-                break
+        streaks = {}
+        writes = []
+        for (owner, day), rollup in sorted(rollups.items(), key=lambda item: (str(item[0][0]), item[0][1])):
+            writes.append(ReplaceOne({'user_id': owner, 'day': day}, rollup, upsert=True))
+            streaks[owner] = dict(_advance_streak(streaks.get(owner, {}), day), backfilled=True)
+            if len(writes) >= 1000:
+                rollup_target.bulk_write(writes, ordered=False)
+                writes = []
+        if writes:
+            rollup_target.bulk_write(writes, ordered=False)
+        if streaks:
+            streak_target.bulk_write(
+                [ReplaceOne({'_id': owner}, streak, upsert=True) for owner, streak in streaks.items()],
+                ordered=False)
         
-        return streak
+        if user_id:
+            days = [day for owner, day in rollups]
+            daily_activity.delete_many({'user_id': ObjectId(user_id), 'day': {'$nin': days}})
+            if not streaks:
+                activity_streaks.replace_one({'_id': ObjectId(user_id)}, {'backfilled': True}, upsert=True)
+        else:
+            rollup_target.rename(daily_activity.name, dropTarget=True)
+            streak_target.rename(activity_streaks.name, dropTarget=True)
+            # Workouts logged during the rebuild were counted in the replaced collections
+            for owner in workout_logs.distinct('user_id', {'date': {'$gte': started}}):
+                self.rebuild_daily_activity(owner)
+        return len(rollups)
+    
+    def _staging(self, collection):
+        """Empty copy of ``collection`` (same indexes) to build a replacement in"""
+        staging = mongo_db[f'{collection.name}_rebuild']
+        staging.drop()
+        if collection.name in INDEXES:
+            staging.create_indexes(INDEXES[collection.name])
+        return staging
     
+    @timed('FitnessTracker.set_fitness_goal')
     def set_fitness_goal(self, user_id, goal_type, target_value, deadline=None):
         """Set a fitness goal for a user"""
         try:
@@ -496,6 +722,7 @@ class FitnessTracker:
             print(f"Error setting fitness goal: {e}")
             return False
     
+    @timed('FitnessTracker.get_fitness_goals')
     def get_fitness_goals(self, user_id):
         """Get fitness goals for a user"""
         try:
@@ -504,8 +731,16 @@ class FitnessTracker:
             }).sort('deadline', 1))
             
             # Update progress for each goal
-            for goal in goals:
-                goal['progress'] = self._calculate_goal_progress(goal)
+            progress = self._calculate_goals_progress(goals)
+            for goal, value in zip(goals, progress):
+                goal['progress'] = value
+            
+            # Weight goals also get the trend's rate and projected date
+            if any(goal.get('goal_type') == 'weight_loss' for goal in goals):
+                user_data = users_collection.find_one({'_id': ObjectId(user_id)}, {'weight_trend': 1}) or {}
+                for goal in goals:
+                    if goal.get('goal_type') == 'weight_loss':
+                        goal['trend'] = summarize(user_data.get('weight_trend'), goal.get('target_value'))
             
             return goals
         except Exception as e:
@@ -514,91 +749,115 @@ class FitnessTracker:
     
     def _calculate_goal_progress(self, goal):
         """Calculate progress towards a fitness goal"""
+        return self._calculate_goals_progress([goal])[0]
+    
+    @timed('FitnessTracker._calculate_goals_progress')
+    def _calculate_goals_progress(self, goals):
+        """
+        Calculate progress towards several goals of one user at once.
+        
+        Workout goals share one aggregation over the daily_activity rollups
+        that sums, per goal, the workouts and calories from the day that goal
+        started; weight goals share one lookup of the current weight and one
+        $facet of starting weights.
+        """
+        progress = [0.0] * len(goals)
+        if not goals:
+            return progress
         try:
-            goal_type = goal.get('goal_type')
-            target_value = goal.get('target_value')
-            user_id = goal.get('user_id')
-            start_date = goal.get('start_date')
-            
-            if goal_type == 'weight_loss':
-                # Get starting weight and current weight
-                user_data = users_collection.find_one({"_id": user_id})
-                if not user_data:
-                    return 0.0
-                
-                current_weight = float(user_data.get('weight', 0))
-                
-                # Get weight at start date
-                start_weight_record = weight_history.find_one({
-                    'user_id': user_id,
-                    'date': {'$lte': start_date}
-                }, sort=[('date', -1)])
-                
-                if not start_weight_record:
-                    return 0.0
-                
-                start_weight = float(start_weight_record.get('weight', current_weight))
-                weight_to_lose = start_weight - target_value
-                
-                if weight_to_lose <= 0:
-                    return 0.0
-                
-                weight_lost = start_weight - current_weight
-                progress = min(100, (weight_lost / weight_to_lose) * 100)
-                return progress
-            
-            elif goal_type == 'workout_frequency':
-                # Count workouts since start date
-                workout_count = workout_logs.count_documents({
-                    'user_id': user_id,
-                    'date': {'$gte': start_date}
-                })
-                
-                progress = min(100, (workout_count / target_value) * 100)
-                return progress
-            
-            elif goal_type == 'calories_burned':
-                # Sum calories burned since start date
-                workouts = workout_logs.find({
-                    'user_id': user_id,
-                    'date': {'$gte': start_date}
-                })
-                
-                total_calories = sum(workout.get('calories_burned', 0) for workout in workouts)
-                progress = min(100, (total_calories / target_value) * 100)
-                return progress
-            
-            return 0.0
+            user_id = goals[0].get('user_id')
+            workout_goals = [i for i, goal in enumerate(goals)
+                             if goal.get('goal_type') in ('workout_frequency', 'calories_burned')]
+            weight_goals = [i for i, goal in enumerate(goals) if goal.get('goal_type') == 'weight_loss']
+            
+            if workout_goals:
+                self._ensure_activity(user_id)
+                group = {'_id': None}
+                for i in workout_goals:
+                    since = {'$gte': ['$day', _activity_day(goals[i].get('start_date'))]}
+                    if goals[i].get('goal_type') == 'workout_frequency':
+                        group[f'goal{i}'] = {'$sum': {'$cond': [since, '$workouts', 0]}}
+                    else:
+                        group[f'goal{i}'] = {'$sum': {'$cond': [since, '$calories', 0]}}
+                earliest = min(goals[i].get('start_date') for i in workout_goals)
+                totals = next(daily_activity.aggregate([
+                    {'$match': {'user_id': user_id, 'day': {'$gte': _activity_day(earliest)}}},
+                    {'$group': group}
+                ]), {})
+                for i in workout_goals:
+                    target_value = goals[i].get('target_value')
+                    if target_value:
+                        progress[i] = min(100, (totals.get(f'goal{i}', 0) / target_value) * 100)
+            
+            if weight_goals:
+                user_data = users_collection.find_one({"_id": user_id}, {'weight': 1})
+                if user_data:
+                    current_weight = float(user_data.get('weight', 0))
+                    # Latest weight logged on or before each goal's start date
+                    start_weights = next(weight_history.aggregate([
+                        {'$match': {'user_id': user_id}},
+                        {'$facet': {
+                            f'goal{i}': [
+                                {'$match': {'date': {'$lte': goals[i].get('start_date')}}},
+                                {'$sort': {'date': -1}},
+                                {'$limit': 1},
+                                {'$project': {'_id': 0, 'weight': 1}}
+                            ] for i in weight_goals
+                        }}
+                    ]), {})
+                    for i in weight_goals:
+                        records = start_weights.get(f'goal{i}')
+                        if not records:
+                            continue
+                        start_weight = float(records[0].get('weight', current_weight))
+                        weight_to_lose = start_weight - goals[i].get('target_value')
+                        if weight_to_lose <= 0:
+                            continue
+                        weight_lost = start_weight - current_weight
+                        progress[i] = min(100, (weight_lost / weight_to_lose) * 100)
+            
+            return progress
         except Exception as e:
             print(f"Error calculating goal progress: {e}")
-            return 0.0
+            return progress
     
+    @timed('FitnessTracker._check_goal_achievements')
     def _check_goal_achievements(self, user_id):
         """Check if any fitness goals have been achieved"""
         try:
-            goals = fitness_goals.find({
+            goals = list(fitness_goals.find({
                 'user_id': ObjectId(user_id),
-                'completed': False
-            })
+                'completed': False,
+                'expired': {'$ne': True}
+            }, {'goal_type': 1, 'target_value': 1, 'user_id': 1, 'start_date': 1}))
             
-            for goal in goals:
-                progress = self._calculate_goal_progress(goal)
-                
-                # Update progress in database
-                fitness_goals.update_one(
-                    {'_id': goal.get('_id')},
-                    {'$set': {'progress': progress}}
-                )
-                
+            now = datetime.utcnow()
+            updates = []
+            for goal, progress in zip(goals, self._calculate_goals_progress(goals)):
+                changes = {'progress': progress}
                 # Check if goal is completed
                 if progress >= 100:
-                    fitness_goals.update_one(
-                        {'_id': goal.get('_id')},
-                        {'$set': {'completed': True, 'completion_date': datetime.utcnow()}}
-                    )
+                    changes.update({'completed': True, 'completion_date': now})
+                updates.append(UpdateOne({'_id': goal.get('_id')}, {'$set': changes}))
+            
+            # Update progress in database
+            if updates:
+                fitness_goals.bulk_write(updates, ordered=False)
         except Exception as e:
             print(f"Error checking goal achievements: {e}")
     
+    @timed('FitnessTracker.close_expired_goals')
+    def close_expired_goals(self, now=None):
+        """Mark every open goal past its deadline as expired; return how many"""
+        if now is None:
+            now = datetime.utcnow()
+        result = fitness_goals.update_many(
+            {'completed': False, 'expired': {'$ne': True}, 'deadline': {'$lt': now}},
+            {'$set': {'expired': True, 'expired_at': now}}
+        )
+        return result.modified_count
+    
+    @timed('FitnessTracker.generate_workout_plan')
     def generate_workout_plan(self, user_id, fitness_level='beginner', focus_areas=None, days_per_week=3):
         """Generate a personalized workout plan based on user profile"""
         try:
@@ -670,6 +929,28 @@ class FitnessTracker:
             return []
 
 
+def _meal_ref(meal):
+    """Compact session entry for a recommended meal: catalog key plus per-user extras"""
+    return {
+        'collection': 'breakfast' if meal.get('meal_type') == 'breakfast' else 'lunchdinner',
+        'ID': int(meal.get('ID')),
+        'meal_type': meal.get('meal_type'),
+        'seasonal_ingredients': meal.get('seasonal_ingredients', []),
+        'substitution_options': meal.get('substitution_options', {}),
+    }
+
+def _hydrate_meal(ref):
+    """Rebuild a recommended meal from its session reference"""
+    record = meal_catalog.record(ref['collection'], ref['ID'])
+    if record is None:
+        return None
+    meal = dict(record)
+    meal['meal_type'] = ref['meal_type']
+    meal['seasonal_ingredients'] = ref['seasonal_ingredients']
+    meal['substitution_options'] = ref['substitution_options']
+    return meal
+
+
 # Initialize the recommendation engine and fitness tracker
 recommendation_engine = AIRecommendationEngine()
 fitness_tracker = FitnessTracker()
@@ -679,14 +960,22 @@ def get_meal_recommendations(user_id):
     """Get meal recommendations for a user"""
     # Check if recommendations exist in session
     if 'meal_recommendations' in session:
-        return session['meal_recommendations']
+        meals = [_hydrate_meal(ref) for ref in session['meal_recommendations']]
+        meals = [meal for meal in meals if meal is not None]
+        if meals:
+            return meals
     
     # Generate new recommendations
     return recommendation_engine.generate_meal_recommendations(user_id)
 
-def submit_meal_feedback(user_id, meal_id, rating, feedback_text):
-    """Submit feedback for a meal"""
-    return recommendation_engine.update_preferences_from_feedback(user_id, meal_id, rating, feedback_text)
+def submit_meal_feedback(user_id, meal_id, rating, feedback_text, collection=None):
+    """Submit feedback for a meal from the ``collection`` catalog"""
+    return recommendation_engine.update_preferences_from_feedback(
+        user_id, meal_id, rating, feedback_text, collection)
+
+def submit_plan_feedback(user_id, plan, rating, meal_ratings, feedback_text):
+    """Submit an overall rating for a plan plus ratings for some of its meals"""
+    return recommendation_engine.record_plan_feedback(user_id, plan, rating, meal_ratings, feedback_text)
 
 def log_user_workout(user_id, exercise_name, duration_minutes, intensity, notes=None):
     """Log a workout for a user"""
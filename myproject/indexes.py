@@ -0,0 +1,187 @@
+"""
+Declarative index registry for every collection.
+
+``TIMESERIES`` lists collections stored as MongoDB time-series collections
+and ``INDEXES`` the indexes each collection needs; ``ensure_indexes`` creates
+any that are missing (creation is idempotent). ``HOT_QUERIES`` are
+the filters and sorts the app runs on every page, and ``verify_indexes``
+explains each one and reports those whose winning plan is a COLLSCAN.
+"""
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+# Collections created as time-series collections (MongoDB 5.0+)
+TIMESERIES = {
+    'weight_history': {'timeField': 'date', 'metaField': 'user_id', 'granularity': 'hours'},
+}
+
+# Default index names are kept so indexes created elsewhere (for example the
+# sessions TTL index) are recognised as the same index.
+INDEXES = {
+    'users': [
+        IndexModel([('email', ASCENDING)], unique=True),
+        IndexModel([('username', ASCENDING)], unique=True),
+    ],
+    'weight_history': [IndexModel([('user_id', ASCENDING), ('date', DESCENDING)])],
+    'workout_logs': [IndexModel([('user_id', ASCENDING), ('date', DESCENDING)])],
+    'meal_feedback': [IndexModel([('user_id', ASCENDING), ('date', DESCENDING)])],
+    'recipe_reviews': [
+        IndexModel([('user_id', ASCENDING), ('date', DESCENDING)]),
+        IndexModel([('user_id', ASCENDING), ('recipe_id', ASCENDING)]),
+    ],
+    'daily_activity': [IndexModel([('user_id', ASCENDING), ('day', DESCENDING)], unique=True)],
+    'fitness_goals': [IndexModel([('user_id', ASCENDING), ('deadline', ASCENDING)])],
+    'workout_plans': [IndexModel([('user_id', ASCENDING)])],
+    'meal_plans': [IndexModel([('user_id', ASCENDING), ('date', ASCENDING)], unique=True)],
+    'breakfast': [IndexModel([('ID', ASCENDING)])],
+    'lunchdinner': [IndexModel([('ID', ASCENDING)])],
+    'sessions': [IndexModel([('expires_at', ASCENDING)], expireAfterSeconds=0)],
+}
+
+# (name, collection, filter, sort) for the queries behind the hot pages
+_SAMPLE_USER = ObjectId()
+HOT_QUERIES = [
+    ('login by email', 'users', {'email': ''}, None),
+    ('register username check', 'users', {'username': ''}, None),
+    ('weight history', 'weight_history', {'user_id': _SAMPLE_USER}, [('date', -1)]),
+    ('workout history', 'workout_logs', {'user_id': _SAMPLE_USER, 'date': {'$gte': 0}}, [('date', -1)]),
+    ('daily activity', 'daily_activity', {'user_id': _SAMPLE_USER, 'day': {'$gte': 0}}, None),
+    ('meal feedback history', 'meal_feedback', {'user_id': _SAMPLE_USER}, None),
+    ('recipe reviews', 'recipe_reviews', {'user_id': _SAMPLE_USER}, None),
+    ('fitness goals', 'fitness_goals', {'user_id': _SAMPLE_USER}, [('deadline', 1)]),
+    ('workout plans', 'workout_plans', {'user_id': _SAMPLE_USER}, None),
+    ('breakfast by ID', 'breakfast', {'ID': 0}, None),
+    ('lunch/dinner by ID', 'lunchdinner', {'ID': 0}, None),
+]
+
+
+def is_timeseries(db, name):
+    for info in db.list_collections(filter={'name': name}):
+        return info.get('type') == 'timeseries'
+    return False
+
+
+def ensure_collections(db, timeseries=TIMESERIES):
+    """Create missing time-series collections; return the names created"""
+    existing = set(db.list_collection_names())
+    created = []
+    for name, options in timeseries.items():
+        if name not in existing:
+            db.create_collection(name, timeseries=options)
+            created.append(name)
+    return created
+
+
+def migrate_to_timeseries(db, name, batch_size=1000):
+    """
+    Move an existing plain collection into a new time-series collection.
+
+    Documents are copied into a ``<name>_staging`` time-series collection
+    (with the registry's indexes), which is then renamed into place; the old
+    collection is kept as ``<name>_legacy``. Writes can continue meanwhile:
+    the copied ``_id``s are remembered (ObjectIds from several processes
+    are not ordered), so each catch-up pass copies whatever is still
+    missing, and documents written between the two renames land in a new
+    plain ``name`` that is folded into the staging collection before the
+    swap is retried. Returns the number of documents copied (0 if ``name``
+    is already a time-series collection).
+    """
+    existing = db.list_collection_names()
+    if name not in existing or is_timeseries(db, name):
+        return 0
+    legacy = f'{name}_legacy'
+    if legacy in existing:
+        raise OperationFailure(f"{legacy} already exists; remove it before migrating {name} again")
+    staging = db[f'{name}_staging']
+    gap = db[f'{name}_gap']
+    staging.drop()
+    gap.drop()
+    db.create_collection(staging.name, timeseries=TIMESERIES[name])
+    if name in INDEXES:
+        staging.create_indexes(INDEXES[name])
+
+    copied_ids = set()
+    copied = _copy_missing(db[name], staging, copied_ids, batch_size)
+    # Catch up on writes made during the copy, then swap the collections
+    while True:
+        count = _copy_missing(db[name], staging, copied_ids, batch_size)
+        copied += count
+        if not count:
+            break
+    db[name].rename(legacy)
+    while True:
+        try:
+            staging.rename(name)
+            break
+        except OperationFailure:
+            if name not in db.list_collection_names():
+                raise
+            # A write between the renames recreated ``name``; move it aside and copy it over
+            db[name].rename(gap.name)
+            copied += _copy_missing(gap, staging, copied_ids, batch_size)
+            gap.drop()
+    # Writes already in flight when the live collection was renamed
+    return copied + _copy_missing(db[legacy], db[name], copied_ids, batch_size)
+
+
+def _copy_missing(source, target, copied_ids, batch_size):
+    """Copy documents whose ``_id`` is not in ``copied_ids`` (adding them); return the count"""
+    missing = [document['_id'] for document in source.find({}, {'_id': 1})
+               if document['_id'] not in copied_ids]
+    copied = 0
+    for start in range(0, len(missing), batch_size):
+        batch = []
+        for document in source.find({'_id': {'$in': missing[start:start + batch_size]}}):
+            copied_ids.add(document.pop('_id'))
+            batch.append(document)
+        if batch:
+            target.insert_many(batch, ordered=False)
+            copied += len(batch)
+    return copied
+
+
+def ensure_indexes(db, registry=INDEXES):
+    """Create the registry's indexes; return {collection: names or error}"""
+    ensure_collections(db)
+    results = {}
+    for collection, models in registry.items():
+        try:
+            results[collection] = db[collection].create_indexes(models)
+        except OperationFailure as e:
+            # e.g. existing duplicate emails block a unique index
+            results[collection] = f"error: {e}"
+    return results
+
+
+def _stages(plan):
+    """All stage names in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages.extend(_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_stages(value))
+    return stages
+
+
+def explain_stages(collection, query, sort=None):
+    """Stages of the winning plan for ``query`` (and optional ``sort``)"""
+    cursor = collection.find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    planner = cursor.explain().get('queryPlanner', {})
+    return _stages(planner.get('winningPlan', {}))
+
+
+def verify_indexes(db, queries=HOT_QUERIES):
+    """Return [(name, stages)] for hot queries that fall back to a COLLSCAN"""
+    failures = []
+    for name, collection, query, sort in queries:
+        stages = explain_stages(db[collection], query, sort)
+        if 'COLLSCAN' in stages:
+            failures.append((name, stages))
+    return failures
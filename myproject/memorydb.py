@@ -0,0 +1,881 @@
+"""
+In-memory stand-in for the subset of pymongo the app uses.
+
+``MemoryClient()[name]`` behaves like a pymongo ``Database``: collections
+support ``find``/``find_one`` (filter, projection, sort, skip, limit),
+inserts, updates (``$set``, ``$unset``, ``$inc``, ``$push``, ``$addToSet``,
+``$setOnInsert``, upserts), ``replace_one``, deletes, ``count_documents``,
+``bulk_write`` of the pymongo operation classes, unique indexes (raising
+``DuplicateKeyError``), ``rename``/``drop`` and ``aggregate`` with
+``$match``, ``$group``, ``$project``, ``$sort``, ``$skip``, ``$limit``,
+``$unwind``, ``$count`` and ``$facet``. Indexes are hash maps on their
+leading field and on all their fields, so equality lookups on either (and
+unique checks) skip the scan; ``explain()`` reports exactly that, so a
+range-only filter shows up as a COLLSCAN.
+
+It keeps no durability and ignores TTL expiry; it exists so the planner,
+fitness tracker and routes can be profiled and exercised without a server.
+"""
+import math
+import threading
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import IndexModel
+from pymongo.errors import CollectionInvalid, DuplicateKeyError, OperationFailure
+from pymongo.operations import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+_MISSING = object()
+_EPOCH = datetime(2000, 1, 1)
+
+
+# -- documents -------------------------------------------------------------
+
+def _copy(value):
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+def _get(doc, path):
+    value = doc
+    for part in path.split('.'):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _set(doc, path, value):
+    parts = path.split('.')
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset(doc, path):
+    parts = path.split('.')
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+_TYPE_ORDER = {type(None): 0, int: 1, float: 1, bool: 7, str: 2, dict: 3, list: 4, ObjectId: 5, datetime: 8}
+
+
+def _sort_key(value):
+    """Order values across types roughly the way MongoDB does"""
+    if value is _MISSING or value is None:
+        return (0, 0)
+    rank = _TYPE_ORDER.get(type(value), 9)
+    if isinstance(value, ObjectId):
+        return (rank, value.binary)
+    if isinstance(value, (dict, list)):
+        return (rank, repr(value))
+    return (rank, value)
+
+
+def _compare(a, b):
+    ka, kb = _sort_key(a), _sort_key(b)
+    return (ka > kb) - (ka < kb)
+
+
+def _sorted(docs, spec):
+    if isinstance(spec, str):
+        spec = [(spec, 1)]
+    elif isinstance(spec, dict):
+        spec = list(spec.items())
+    docs = list(docs)
+    for key, direction in reversed(list(spec)):
+        docs.sort(key=lambda doc: _sort_key(_get(doc, key)), reverse=direction < 0)
+    return docs
+
+
+# -- queries ---------------------------------------------------------------
+
+def _values(value):
+    """A field's value plus, for arrays, its elements (query matching semantics)"""
+    if isinstance(value, list):
+        return [value] + value
+    return [value]
+
+
+def _match_operator(value, op, arg):
+    if op == '$exists':
+        return (value is not _MISSING) == bool(arg)
+    if op == '$ne':
+        return not _match_operator(value, '$eq', arg)
+    if op == '$nin':
+        return not _match_operator(value, '$in', arg)
+    if op == '$not':
+        return not _match_condition(value, arg)
+    candidates = _values(None if value is _MISSING else value)
+    if op == '$eq':
+        return any(candidate == arg for candidate in candidates)
+    if op == '$in':
+        return any(candidate == item for candidate in candidates for item in arg)
+    if op in ('$gt', '$gte', '$lt', '$lte'):
+        if value is _MISSING:
+            return False
+        for candidate in candidates:
+            if _TYPE_ORDER.get(type(candidate)) != _TYPE_ORDER.get(type(arg)):
+                continue
+            order = _compare(candidate, arg)
+            if ((op == '$gt' and order > 0) or (op == '$gte' and order >= 0)
+                    or (op == '$lt' and order < 0) or (op == '$lte' and order <= 0)):
+                return True
+        return False
+    if op == '$size':
+        return isinstance(value, list) and len(value) == arg
+    if op == '$all':
+        return isinstance(value, list) and all(item in value for item in arg)
+    raise OperationFailure(f"Unsupported query operator {op}")
+
+
+def _match_condition(value, condition):
+    if isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition):
+        return all(_match_operator(value, op, arg) for op, arg in condition.items())
+    return _match_operator(value, '$eq', condition)
+
+
+def matches(doc, query):
+    """True if ``doc`` satisfies the MongoDB ``query``"""
+    for key, condition in (query or {}).items():
+        if key == '$and':
+            if not all(matches(doc, part) for part in condition):
+                return False
+        elif key == '$or':
+            if not any(matches(doc, part) for part in condition):
+                return False
+        elif key == '$nor':
+            if any(matches(doc, part) for part in condition):
+                return False
+        elif not _match_condition(_get(doc, key), condition):
+            return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return _copy(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = projection.get('_id', 1)
+    fields = {key: value for key, value in projection.items() if key != '_id'}
+    # {'_id': 0} alone excludes just the _id
+    if all(not value for value in fields.values()) and (fields or not include_id):
+        result = _copy(doc)
+        for key in fields:
+            _unset(result, key)
+    else:
+        result = {}
+        for key in fields:
+            value = _get(doc, key)
+            if value is not _MISSING:
+                _set(result, key, _copy(value))
+    if include_id and '_id' in doc:
+        result['_id'] = doc['_id']
+    elif not include_id:
+        result.pop('_id', None)
+    return result
+
+
+# -- updates ---------------------------------------------------------------
+
+def _apply_update(doc, update, inserting=False):
+    if isinstance(update, list):
+        raise OperationFailure("Pipeline updates are not supported by the in-memory backend")
+    for op, fields in update.items():
+        for path, value in fields.items():
+            if op == '$set':
+                _set(doc, path, _copy(value))
+            elif op == '$setOnInsert':
+                if inserting:
+                    _set(doc, path, _copy(value))
+            elif op == '$unset':
+                _unset(doc, path)
+            elif op == '$inc':
+                current = _get(doc, path)
+                _set(doc, path, (0 if current is _MISSING else current) + value)
+            elif op in ('$max', '$min'):
+                current = _get(doc, path)
+                if current is _MISSING or (op == '$max' and _compare(value, current) > 0) \
+                        or (op == '$min' and _compare(value, current) < 0):
+                    _set(doc, path, value)
+            elif op in ('$push', '$addToSet'):
+                current = _get(doc, path)
+                items = current if isinstance(current, list) else []
+                new = value['$each'] if isinstance(value, dict) and '$each' in value else [value]
+                for item in new:
+                    if op == '$push' or item not in items:
+                        items.append(_copy(item))
+                _set(doc, path, items)
+            else:
+                raise OperationFailure(f"Unsupported update operator {op}")
+
+
+def _upsert_seed(query):
+    """Fields an upsert copies from its filter (top-level equalities)"""
+    doc = {}
+    for key, condition in query.items():
+        if key.startswith('$'):
+            continue
+        if isinstance(condition, dict) and any(op.startswith('$') for op in condition):
+            if '$eq' in condition:
+                _set(doc, key, _copy(condition['$eq']))
+            continue
+        _set(doc, key, _copy(condition))
+    return doc
+
+
+# -- aggregation -----------------------------------------------------------
+
+def _truncate_date(date, unit, bin_size=1):
+    if unit in ('year', 'month'):
+        months = (date.year - _EPOCH.year) * 12 + date.month - 1
+        step = bin_size * (12 if unit == 'year' else 1)
+        months -= months % step
+        return datetime(_EPOCH.year + months // 12, months % 12 + 1, 1)
+    seconds = {'week': 604800, 'day': 86400, 'hour': 3600, 'minute': 60, 'second': 1}[unit] * bin_size
+    # Weeks start on Sunday; 2000-01-02 was one
+    origin = _EPOCH + timedelta(days=1) if unit == 'week' else _EPOCH
+    elapsed = int((date - origin).total_seconds() // seconds) * seconds
+    return origin + timedelta(seconds=elapsed)
+
+
+def evaluate(expression, doc):
+    """Evaluate an aggregation expression against a document"""
+    if isinstance(expression, str) and expression.startswith('$'):
+        value = _get(doc, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, list):
+        return [evaluate(item, doc) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if len(expression) != 1 or not next(iter(expression)).startswith('$'):
+        return {key: evaluate(value, doc) for key, value in expression.items()}
+
+    op, arg = next(iter(expression.items()))
+    if op == '$literal':
+        return arg
+    if op == '$cond':
+        if isinstance(arg, dict):
+            arg = [arg['if'], arg['then'], arg['else']]
+        return evaluate(arg[1] if evaluate(arg[0], doc) else arg[2], doc)
+    if op == '$ifNull':
+        for item in arg:
+            value = evaluate(item, doc)
+            if value is not None:
+                return value
+        return None
+    args = [evaluate(item, doc) for item in arg] if isinstance(arg, list) else evaluate(arg, doc)
+    if op in ('$eq', '$ne', '$gt', '$gte', '$lt', '$lte'):
+        order = _compare(args[0], args[1])
+        return {'$eq': order == 0, '$ne': order != 0, '$gt': order > 0,
+                '$gte': order >= 0, '$lt': order < 0, '$lte': order <= 0}[op]
+    if op == '$and':
+        return all(args)
+    if op == '$or':
+        return any(args)
+    if op == '$not':
+        return not (args[0] if isinstance(args, list) else args)
+    if op == '$in':
+        return args[0] in (args[1] or [])
+    if op in ('$add', '$multiply'):
+        if any(value is None for value in args):
+            return None
+        result = args[0]
+        for value in args[1:]:
+            result = result + value if op == '$add' else result * value
+        return result
+    if op == '$subtract':
+        if None in args:
+            return None
+        if isinstance(args[0], datetime) and isinstance(args[1], datetime):
+            # Date differences are in milliseconds
+            return int((args[0] - args[1]).total_seconds() * 1000)
+        return args[0] - args[1]
+    if op == '$divide':
+        return None if None in args else args[0] / args[1]
+    if op == '$floor':
+        value = args[0] if isinstance(args, list) else args
+        return None if value is None else math.floor(value)
+    if op in ('$sum', '$avg', '$max', '$min') and isinstance(args, list):
+        return _accumulate(op, args)
+    if op == '$size':
+        return len(args)
+    if op == '$toString':
+        return None if args is None else str(args)
+    if op == '$dateTrunc':
+        date = evaluate(arg['date'], doc)
+        if date is None:
+            return None
+        return _truncate_date(date, arg['unit'], evaluate(arg.get('binSize', 1), doc))
+    if op == '$dateToString':
+        date = evaluate(arg['date'], doc)
+        if date is None:
+            return None
+        return date.strftime(arg.get('format', '%Y-%m-%dT%H:%M:%S.%LZ').replace('%L', '000'))
+    if op == '$arrayToObject':
+        return {item['k']: item['v'] for item in args} if isinstance(args[0], dict) else dict(args)
+    raise OperationFailure(f"Unsupported expression operator {op}")
+
+
+def _accumulate(op, values):
+    numbers = [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+    if op == '$sum':
+        return sum(numbers) if numbers else 0
+    if op == '$avg':
+        return sum(numbers) / len(numbers) if numbers else None
+    present = [value for value in values if value is not None]
+    if not present:
+        return None
+    best = present[0]
+    for value in present[1:]:
+        order = _compare(value, best)
+        if (op == '$max' and order > 0) or (op == '$min' and order < 0):
+            best = value
+    return best
+
+
+def _freeze(value):
+    """Hashable form of a group key"""
+    if isinstance(value, dict):
+        return tuple((name, _freeze(item)) for name, item in value.items())
+    if isinstance(value, list):
+        return ('~',) + tuple(_freeze(item) for item in value)
+    return _sort_key(value)
+
+
+def _group(docs, spec):
+    groups = {}
+    for doc in docs:
+        key = evaluate(spec['_id'], doc)
+        groups.setdefault(_freeze(key), (key, []))[1].append(doc)
+    results = []
+    for key, members in groups.values():
+        result = {'_id': key}
+        for field, accumulator in spec.items():
+            if field == '_id':
+                continue
+            op, expression = next(iter(accumulator.items()))
+            values = [evaluate(expression, doc) for doc in members]
+            if op in ('$sum', '$avg', '$max', '$min'):
+                result[field] = _accumulate(op, values)
+            elif op == '$first':
+                result[field] = values[0] if values else None
+            elif op == '$last':
+                result[field] = values[-1] if values else None
+            elif op == '$push':
+                result[field] = values
+            elif op == '$addToSet':
+                result[field] = [value for i, value in enumerate(values) if value not in values[:i]]
+            else:
+                raise OperationFailure(f"Unsupported accumulator {op}")
+        results.append(result)
+    return results
+
+
+def _project_stage(doc, spec):
+    plain = {key: value for key, value in spec.items()
+             if isinstance(value, (bool, int)) and not isinstance(value, float)}
+    computed = {key: value for key, value in spec.items() if key not in plain}
+    if not computed:
+        return _project(doc, plain)
+    result = _project(doc, {key: value for key, value in plain.items() if value}) if any(
+        value for key, value in plain.items() if key != '_id') else ({'_id': doc['_id']} if '_id' in doc else {})
+    if plain.get('_id', 1) == 0:
+        result.pop('_id', None)
+    for key, expression in computed.items():
+        _set(result, key, evaluate(expression, doc))
+    return result
+
+
+def run_pipeline(docs, pipeline):
+    """Run aggregation ``pipeline`` over an iterable of documents"""
+    docs = list(docs)
+    for stage in pipeline:
+        name, spec = next(iter(stage.items()))
+        if name == '$match':
+            docs = [doc for doc in docs if matches(doc, spec)]
+        elif name == '$group':
+            docs = _group(docs, spec)
+        elif name == '$sort':
+            docs = _sorted(docs, spec)
+        elif name == '$limit':
+            docs = docs[:spec]
+        elif name == '$skip':
+            docs = docs[spec:]
+        elif name == '$project':
+            docs = [_project_stage(doc, spec) for doc in docs]
+        elif name in ('$set', '$addFields'):
+            docs = [dict(doc, **{key: evaluate(value, doc) for key, value in spec.items()}) for doc in docs]
+        elif name == '$unwind':
+            path = (spec if isinstance(spec, str) else spec['path'])[1:]
+            unwound = []
+            for doc in docs:
+                values = _get(doc, path)
+                for value in values if isinstance(values, list) else []:
+                    item = _copy(doc)
+                    _set(item, path, value)
+                    unwound.append(item)
+            docs = unwound
+        elif name == '$count':
+            docs = [{spec: len(docs)}] if docs else []
+        elif name == '$facet':
+            docs = [{key: run_pipeline(docs, sub) for key, sub in spec.items()}]
+        else:
+            raise OperationFailure(f"Unsupported pipeline stage {name}")
+    return docs
+
+
+# -- collections -----------------------------------------------------------
+
+class MemoryCursor:
+    """Lazy find() result supporting sort/skip/limit chaining"""
+
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction=None):
+        self._sort = [(key, direction or 1)] if isinstance(key, str) else list(key)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def _results(self):
+        docs = self._collection._matching(self._query)
+        if self._sort:
+            docs = _sorted(docs, self._sort)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [_project(doc, self._projection) for doc in docs]
+
+    def __iter__(self):
+        return iter(self._results())
+
+    def explain(self):
+        """The plan this store actually runs: an index lookup only for a hashed equality"""
+        lookup = self._collection._lookup(self._query)
+        if lookup == '_id':
+            plan = {'stage': 'IDHACK'}
+        elif lookup is None:
+            plan = {'stage': 'COLLSCAN'}
+        else:
+            plan = {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN', 'indexName': lookup[0]}}
+        if self._sort:
+            plan = {'stage': 'SORT', 'inputStage': plan}
+        return {'queryPlanner': {'winningPlan': plan}}
+
+
+def _hash_key(value):
+    """Hashable stand-in for a scalar index value (missing counts as null)"""
+    if value is _MISSING:
+        return None
+    if isinstance(value, (dict, list)):
+        return ('~', repr(value))
+    return value
+
+
+# Compound index entries for documents with an array in an indexed field;
+# these are candidates for every lookup on that index
+_MULTIKEY = object()
+
+
+def _index_keys(doc, fields):
+    """Keys a document is filed under in an index on ``fields``"""
+    values = [_get(doc, field) for field in fields] if doc is not None else []
+    if not values:
+        return set()
+    if len(fields) == 1:
+        # Single-field indexes file arrays under each element too
+        value = values[0]
+        keys = {(_hash_key(value),)}
+        if isinstance(value, list):
+            keys.update((_hash_key(item),) for item in value)
+        return keys
+    if any(isinstance(value, list) for value in values):
+        return {_MULTIKEY}
+    return {tuple(_hash_key(value) for value in values)}
+
+
+_SCALARS = (str, int, float, bool, ObjectId, datetime, type(None))
+
+
+class MemoryCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.options = {}
+        self._docs = {}
+        self._indexes = {}
+        # Index fields (the leading one alone and all of them) ->
+        # {key tuple: {_id: None}} (dicts keep insertion order)
+        self._postings = {}
+        # Unique index name -> {key tuple: _id}
+        self._unique = {}
+
+    def _lookup(self, query):
+        """
+        How ``query`` is narrowed: '_id', (index name, document IDs) for the
+        most selective hashed equality, or None for a full scan.
+        """
+        if '_id' in query and isinstance(query['_id'], _SCALARS):
+            return '_id'
+        equalities = {}
+        for field, value in query.items():
+            if isinstance(value, dict) and set(value) == {'$eq'}:
+                value = value['$eq']
+            if isinstance(value, _SCALARS):
+                equalities[field] = _hash_key(value)
+        best = None
+        for fields, postings in self._postings.items():
+            if not all(field in equalities for field in fields):
+                continue
+            ids = postings.get(tuple(equalities[field] for field in fields), {})
+            if _MULTIKEY in postings:
+                ids = {**ids, **postings[_MULTIKEY]}
+            if best is None or len(ids) < len(best[1]):
+                best = (self._index_name(fields), ids)
+        return best
+
+    def _index_name(self, fields):
+        """Name of an index whose key is or starts with ``fields``"""
+        for name, info in self._indexes.items():
+            if tuple(info['key'])[:len(fields)] == fields:
+                return name
+        return None
+
+    def _candidates(self, query):
+        """Documents that may match: narrowed by _id or an indexed equality"""
+        lookup = self._lookup(query)
+        if lookup == '_id':
+            doc = self._docs.get(query['_id'])
+            return [doc] if doc is not None else []
+        if lookup is None:
+            return list(self._docs.values())
+        return [self._docs[doc_id] for doc_id in lookup[1]]
+
+    def _matching(self, query):
+        with self._lock:
+            docs = self._candidates(query)
+        return [doc for doc in docs if matches(doc, query)]
+
+    def _unique_key(self, doc, name):
+        return tuple(_hash_key(_get(doc, field)) for field in self._indexes[name]['key'])
+
+    def _check_unique(self, doc, ignore_id=None):
+        for name, entries in self._unique.items():
+            key = self._unique_key(doc, name)
+            owner = entries.get(key)
+            if owner is not None and owner != ignore_id:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} "
+                                        f"index: {name} dup key: {list(key)}")
+
+    def _file(self, doc, old=None):
+        """Update the index structures for ``doc`` replacing ``old``"""
+        doc_id = (doc or old)['_id']
+        for fields, postings in self._postings.items():
+            old_keys = _index_keys(old, fields)
+            new_keys = _index_keys(doc, fields)
+            for key in old_keys - new_keys:
+                ids = postings.get(key)
+                if ids is not None:
+                    ids.pop(doc_id, None)
+                    if not ids:
+                        del postings[key]
+            for key in new_keys - old_keys:
+                postings.setdefault(key, {})[doc_id] = None
+        for name, entries in self._unique.items():
+            if old is not None and entries.get(self._unique_key(old, name)) == doc_id:
+                del entries[self._unique_key(old, name)]
+            if doc is not None:
+                entries[self._unique_key(doc, name)] = doc_id
+
+    def _touch(self):
+        self.database._created.add(self.name)
+
+    # reads
+
+    def find(self, filter=None, projection=None, sort=None, skip=0, limit=0, **kwargs):
+        cursor = MemoryCursor(self, filter, projection)
+        if sort:
+            cursor.sort(sort)
+        return cursor.skip(skip).limit(limit)
+
+    def find_one(self, filter=None, projection=None, sort=None, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {'_id': filter}
+        for doc in self.find(filter, projection, sort=sort, limit=1):
+            return doc
+        return None
+
+    def count_documents(self, filter, **kwargs):
+        return len(self._matching(filter))
+
+    def estimated_document_count(self, **kwargs):
+        return len(self._docs)
+
+    def distinct(self, key, filter=None):
+        values = []
+        for doc in self._matching(filter or {}):
+            value = _get(doc, key)
+            for value in value if isinstance(value, list) else [value]:
+                if value is not _MISSING and value not in values:
+                    values.append(value)
+        return values
+
+    def aggregate(self, pipeline, **kwargs):
+        # A leading $match narrows through the indexes like find() does
+        if pipeline and '$match' in pipeline[0]:
+            docs, pipeline = self._matching(pipeline[0]['$match']), pipeline[1:]
+        else:
+            docs = self._matching({})
+        # Stages pass stored documents through, so results are copied like find()'s
+        return iter([_copy(doc) for doc in run_pipeline(docs, pipeline)])
+
+    # writes
+
+    def insert_one(self, document, **kwargs):
+        with self._lock:
+            document.setdefault('_id', ObjectId())
+            if document['_id'] in self._docs:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_")
+            stored = _copy(document)
+            self._check_unique(stored)
+            self._docs[stored['_id']] = stored
+            self._file(stored)
+            self._touch()
+        return InsertOneResult(document['_id'], True)
+
+    def insert_many(self, documents, ordered=True, **kwargs):
+        ids = [self.insert_one(document).inserted_id for document in documents]
+        return InsertManyResult(ids, True)
+
+    def _update(self, filter, update, upsert, multi, replace=False):
+        with self._lock:
+            targets = self._matching(filter)
+            if not multi:
+                targets = targets[:1]
+            modified = 0
+            for doc in targets:
+                updated = {'_id': doc['_id'], **_copy(update)} if replace else _copy(doc)
+                if not replace:
+                    _apply_update(updated, update)
+                if updated != doc:
+                    self._check_unique(updated, ignore_id=doc['_id'])
+                    self._docs[doc['_id']] = updated
+                    self._file(updated, doc)
+                    modified += 1
+            raw = {'n': len(targets), 'nModified': modified}
+            if not targets and upsert:
+                doc = _upsert_seed(filter)
+                if replace:
+                    doc.update(_copy(update))
+                else:
+                    _apply_update(doc, update, inserting=True)
+                raw['upserted'] = self.insert_one(doc).inserted_id
+                raw['n'] = 1
+            self._touch()
+        return UpdateResult(raw, True)
+
+    def update_one(self, filter, update, upsert=False, **kwargs):
+        return self._update(filter, update, upsert, multi=False)
+
+    def update_many(self, filter, update, upsert=False, **kwargs):
+        return self._update(filter, update, upsert, multi=True)
+
+    def replace_one(self, filter, replacement, upsert=False, **kwargs):
+        return self._update(filter, replacement, upsert, multi=False, replace=True)
+
+    def _delete(self, filter, multi):
+        with self._lock:
+            targets = self._matching(filter)
+            if not multi:
+                targets = targets[:1]
+            for doc in targets:
+                del self._docs[doc['_id']]
+                self._file(None, doc)
+        return DeleteResult({'n': len(targets)}, True)
+
+    def delete_one(self, filter, **kwargs):
+        return self._delete(filter, multi=False)
+
+    def delete_many(self, filter, **kwargs):
+        return self._delete(filter, multi=True)
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        counts = {'nInserted': 0, 'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0,
+                  'upserted': [], 'writeErrors': [], 'writeConcernErrors': []}
+        for position, request in enumerate(requests):
+            if isinstance(request, InsertOne):
+                self.insert_one(request._doc)
+                counts['nInserted'] += 1
+                continue
+            if isinstance(request, (DeleteOne, DeleteMany)):
+                result = self._delete(request._filter, multi=isinstance(request, DeleteMany))
+                counts['nRemoved'] += result.deleted_count
+                continue
+            if isinstance(request, ReplaceOne):
+                result = self.replace_one(request._filter, request._doc, upsert=request._upsert)
+            elif isinstance(request, (UpdateOne, UpdateMany)):
+                result = self._update(request._filter, request._doc, request._upsert,
+                                      multi=isinstance(request, UpdateMany))
+            else:
+                raise OperationFailure(f"Unsupported bulk operation {type(request).__name__}")
+            if result.upserted_id is not None:
+                counts['nUpserted'] += 1
+                counts['upserted'].append({'index': position, '_id': result.upserted_id})
+            else:
+                counts['nMatched'] += result.matched_count
+                counts['nModified'] += result.modified_count
+        return BulkWriteResult(counts, True)
+
+    # indexes and lifecycle
+
+    def create_indexes(self, models, **kwargs):
+        names = []
+        with self._lock:
+            for model in models:
+                document = dict(model.document)
+                name = document['name']
+                self._indexes[name] = document
+                names.append(name)
+                fields = tuple(document['key'])
+                for key_fields in {fields[:1], fields}:
+                    if key_fields not in self._postings:
+                        self._postings[key_fields] = postings = {}
+                        for doc in self._docs.values():
+                            for key in _index_keys(doc, key_fields):
+                                postings.setdefault(key, {})[doc['_id']] = None
+                if document.get('unique') and name not in self._unique:
+                    entries = {}
+                    for doc in self._docs.values():
+                        key = self._unique_key(doc, name)
+                        if key in entries:
+                            del self._indexes[name]
+                            raise DuplicateKeyError(f"E11000 duplicate key error index: {name}")
+                        entries[key] = doc['_id']
+                    self._unique[name] = entries
+            self._touch()
+        return names
+
+    def create_index(self, keys, **kwargs):
+        return self.create_indexes([IndexModel(keys, **kwargs)])[0]
+
+    def index_information(self):
+        info = {'_id_': {'key': [('_id', 1)]}}
+        for name, document in self._indexes.items():
+            info[name] = {'key': list(document['key'].items()),
+                          **{k: v for k, v in document.items() if k not in ('key', 'name')}}
+        return info
+
+    def drop(self, **kwargs):
+        self.database.drop_collection(self.name)
+
+    def rename(self, new_name, dropTarget=False, **kwargs):
+        self.database._rename(self.name, new_name, dropTarget)
+
+
+class MemoryDatabase:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self._collections = {}
+        self._created = set()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = MemoryCollection(self, name)
+            return collection
+
+    def get_collection(self, name, **kwargs):
+        return self[name]
+
+    def list_collection_names(self, **kwargs):
+        return sorted(self._created)
+
+    def list_collections(self, filter=None, **kwargs):
+        for name in self.list_collection_names():
+            info = {'name': name, 'type': 'timeseries' if 'timeseries' in self[name].options else 'collection',
+                    'options': self[name].options}
+            if matches(info, filter or {}):
+                yield info
+
+    def create_collection(self, name, **options):
+        if name in self._created:
+            raise CollectionInvalid(f"collection {name} already exists")
+        collection = self[name]
+        collection.options = options
+        collection._touch()
+        return collection
+
+    def drop_collection(self, name, **kwargs):
+        # Collection objects stay bound to their name, like pymongo handles
+        collection = self[name]
+        with collection._lock:
+            collection._reset()
+        self._created.discard(name)
+
+    def _rename(self, old, new, drop_target):
+        if new in self._created and not drop_target:
+            raise OperationFailure(f"target namespace {new} exists")
+        source, target = self[old], self[new]
+        with source._lock, target._lock:
+            for attribute in ('options', '_docs', '_indexes', '_postings', '_unique'):
+                setattr(target, attribute, getattr(source, attribute))
+            source._reset()
+        self._created.discard(old)
+        self._created.add(new)
+
+
+class MemoryClient:
+    """Drop-in for ``MongoClient`` holding every database in this process"""
+
+    def __init__(self, *args, **kwargs):
+        self._databases = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._databases:
+                self._databases[name] = MemoryDatabase(self, name)
+            return self._databases[name]
+
+    def get_database(self, name, **kwargs):
+        return self[name]
+
+    def close(self):
+        pass
@@ -0,0 +1,258 @@
+"""
+Request timing and named spans, exported in the Prometheus text format.
+
+Set ``METRICS=1`` to turn collection on. The flag is read once at import,
+so turn it on before ``myproject`` is imported. ``init_app`` then times
+every request by route, counts requests by status and tracks how many are
+in flight. It also times template rendering and adds a ``/metrics``
+endpoint for scraping. Code marks the stages worth seeing with
+``span(name)`` or ``@timed(name)``. Together these fill the
+``span_duration_seconds`` histogram. ``mongo_listeners`` times MongoDB
+commands.
+
+With collection off, ``init_app`` registers nothing and ``@timed``
+returns the function unchanged. ``span`` returns a shared no-op context
+manager, and metric updates return straight away.
+"""
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+ENABLED = os.environ.get('METRICS', '0') == '1'
+
+# Upper bounds in seconds; spans range from sub-millisecond lookups to
+# catalog loads and index builds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic count per label set"""
+
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _samples(self):
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+                for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    """Value per label set that can go up and down"""
+
+    kind = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """Bucketed observations with their sum and count, per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        if not ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # Per-bucket counts (plus +Inf), sum
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _number(bound))])} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+SPANS = Histogram('span_duration_seconds', 'Time spent in named code spans', ('span',))
+REQUESTS = Counter('http_requests_total', 'Finished HTTP requests', ('route', 'method', 'status'))
+REQUEST_TIME = Histogram('http_request_duration_seconds', 'HTTP request handling time', ('route', 'method'))
+IN_FLIGHT = Gauge('http_requests_in_flight', 'HTTP requests being handled', ('route',))
+RENDER_TIME = Histogram('template_render_duration_seconds', 'Jinja template rendering time', ('template',))
+MONGO_TIME = Histogram('mongo_command_duration_seconds', 'MongoDB command round trips',
+                       ('command', 'outcome'))
+CATALOG_CACHE = Counter('catalog_cache_requests_total',
+                        'Catalog reads served from the loaded tables (hit) or after a load (miss)',
+                        ('result',))
+CATALOG_DERIVED = Counter('catalog_derived_requests_total',
+                          'Lookups of structures derived from a catalog table, hit or built',
+                          ('structure', 'result'))
+
+
+class _Span:
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        SPANS.observe(time.perf_counter() - self.started, self.name)
+        return False
+
+
+_NO_SPAN = nullcontext()
+
+
+def span(name):
+    """Context manager timing a block into ``span_duration_seconds``"""
+    if not ENABLED:
+        return _NO_SPAN
+    return _Span(name)
+
+
+def timed(name):
+    """Decorator timing every call of a function as the span ``name``"""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def mongo_listeners():
+    """Event listeners for MongoClient that time each command, or [] when off"""
+    if not ENABLED:
+        return []
+    from pymongo import monitoring
+
+    class CommandTimer(monitoring.CommandListener):
+        def started(self, event):
+            pass
+
+        def succeeded(self, event):
+            MONGO_TIME.observe(event.duration_micros / 1e6, event.command_name, 'ok')
+
+        def failed(self, event):
+            MONGO_TIME.observe(event.duration_micros / 1e6, event.command_name, 'error')
+
+    return [CommandTimer()]
+
+
+def init_app(app, endpoint='/metrics'):
+    """Time every request of a Flask app and serve the metrics at ``endpoint``"""
+    if not ENABLED:
+        return
+    from flask import Response, before_render_template, g, request, template_rendered
+
+    def route():
+        # The URL rule, not the path, so IDs in URLs don't explode the label set
+        rule = request.url_rule
+        return rule.rule if rule is not None else '<unmatched>'
+
+    @app.before_request
+    def start_timer():
+        g.metrics_route = route()
+        g.metrics_started = time.perf_counter()
+        IN_FLIGHT.inc(g.metrics_route)
+
+    @app.after_request
+    def record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def stop_timer(exc):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        route_name = g.pop('metrics_route')
+        REQUEST_TIME.observe(time.perf_counter() - started, route_name, request.method)
+        REQUESTS.inc(route_name, request.method, str(g.pop('metrics_status', 500)))
+        IN_FLIGHT.dec(route_name)
+
+    def start_render(sender, template, context, **extra):
+        g.setdefault('metrics_renders', []).append(time.perf_counter())
+
+    def stop_render(sender, template, context, **extra):
+        renders = g.get('metrics_renders')
+        if renders:
+            RENDER_TIME.observe(time.perf_counter() - renders.pop(), template.name or '<string>')
+
+    before_render_template.connect(start_render, app, weak=False)
+    template_rendered.connect(stop_render, app, weak=False)
+    app.add_url_rule(endpoint, 'metrics', lambda: Response(render(), content_type=CONTENT_TYPE))
@@ -1,32 +1,52 @@
-from myproject import login_manager, users_collection, mongo_db
+from myproject import login_manager, users_collection, mongo_db, meal_catalog
 from werkzeug.security import generate_password_hash, check_password_hash
-from flask_login import UserMixin
 from bson import ObjectId
+import math
 from datetime import datetime
+from myproject.collaborative import cf_model
+from myproject.profiles import profile_cache, identity_map
+from myproject.trend import update_trend, summarize
 
 # Collections
 weight_history = mongo_db['weight_history']
 recipe_reviews = mongo_db['recipe_reviews']
 workout_plans = mongo_db['workout_plans']
 
-# By inheriting the UserMixin we get access to a lot of built-in attributes
-# which we will be able to call in our views!
-# is_authenticated()
-# is_active()
-# is_anonymous()
-# get_id()
+# Most points the weight tracker ever receives, however long the history
+WEIGHT_HISTORY_POINTS = 90
+
+# Stored profile fields. The User model keeps them in __slots__ and tracks
+# which ones changed so save() can send a targeted $set.
+USER_FIELDS = ('email', 'username', 'age', 'height', 'weight', 'blood', 'health_issues',
+               'exercise', 'diet_pref', 'plan_period', 'food_type', 'password_hash', 'created_at',
+               'weight_trend')
+
+# Values for fields older user documents may not have
+FIELD_DEFAULTS = {'health_issues': 'none', 'weight_trend': None}
+
+# Field projections per use. 'session' is what pages need on every request;
+# 'auth' adds the password hash for login. Fields left out are fetched on
+# first access.
+PROJECTIONS = {
+    'session': {field: 1 for field in USER_FIELDS if field != 'password_hash'},
+    'auth': {field: 1 for field in USER_FIELDS},
+}
 
 # The user_loader decorator allows flask-login to load the current user
 # and grab their id.
 @login_manager.user_loader
 def load_user(user_id):
-    user_data = users_collection.find_one({"_id": ObjectId(user_id)})
-    if user_data:
-        return User.from_dict(user_data)
-    return None
+    return User.find_by_id(user_id)
+
+class User:
+    # Implements the flask-login user interface itself (is_authenticated,
+    # is_active, is_anonymous, get_id) rather than inheriting UserMixin,
+    # which would give every instance a __dict__.
+    __slots__ = ('_id', '_dirty') + USER_FIELDS
 
-class User(UserMixin):
     def __init__(self, email, username, age, height, weight, blood, health_issues, exercise, diet_pref, plan_period, food_type, password):
+        object.__setattr__(self, '_id', None)
+        object.__setattr__(self, '_dirty', set())
         self.email = email
         self.username = username
         self.age = age
@@ -40,6 +60,54 @@ class User(UserMixin):
         self.food_type = food_type
         self.password_hash = generate_password_hash(password)
         self.created_at = datetime.utcnow()
+        self.weight_trend = None
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in USER_FIELDS:
+            self._dirty.add(name)
+
+    def __getattr__(self, name):
+        # Only reached for unset slots: load fields left out by the projection
+        if name not in USER_FIELDS or self._id is None:
+            raise AttributeError(name)
+        data = users_collection.find_one({'_id': self._id}, {field: 1 for field in USER_FIELDS}) or {}
+        for field in USER_FIELDS:
+            if field in data and field not in self._dirty:
+                object.__setattr__(self, field, data[field])
+        if name in FIELD_DEFAULTS and name not in data:
+            object.__setattr__(self, name, FIELD_DEFAULTS[name])
+        if name == 'created_at' and name not in data:
+            object.__setattr__(self, name, datetime.utcnow())
+        try:
+            return object.__getattribute__(self, name)
+        except AttributeError:
+            raise AttributeError(name) from None
+
+    @property
+    def is_authenticated(self):
+        return self.is_active
+
+    @property
+    def is_active(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    def __eq__(self, other):
+        if isinstance(other, User):
+            return self.get_id() == other.get_id()
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    __hash__ = None
 
     def get_id(self):
         return str(self._id)
@@ -57,26 +125,63 @@ class User(UserMixin):
         }
         weight_history.insert_one(weight_entry)
         self.weight = float(weight)  # Update current weight
+        self.weight_trend = update_trend(self.weight_trend, weight, date)
         self.save()
 
-    def get_weight_history(self):
-        history = weight_history.find(
-            {'user_id': ObjectId(self.get_id())},
-            {'weight': 1, 'date': 1, '_id': 0}
-        ).sort('date', -1)
+    def get_weight_trend(self, target_weight=None):
+        """Smoothed weight, kg/week and the projected date for ``target_weight``"""
+        return summarize(self.weight_trend, target_weight)
+
+    def get_weight_history(self, start=None, end=None, max_points=WEIGHT_HISTORY_POINTS):
+        """
+        Weight entries newest first, averaged into at most ``max_points``
+        buckets of whole days counted from ``start`` (default: the first
+        entry) up to ``end``. Buckets are aligned to ``start`` with date
+        arithmetic: $dateTrunc's bins are aligned to a fixed epoch, so a
+        range could split into ``max_points`` + 1 and lose its oldest bin.
+        """
+        match = {'user_id': ObjectId(self.get_id())}
+        if start is None:
+            first = weight_history.find_one(match, {'date': 1}, sort=[('date', 1)])
+            if not first:
+                return []
+            start = first['date']
+        match['date'] = {'$gte': start}
+        if end is not None:
+            match['date']['$lte'] = end
+        span_days = ((end or datetime.utcnow()) - start).days + 1
+        bin_size = max(1, math.ceil(span_days / max_points))
+        bin_ms = bin_size * 86400 * 1000
+        history = weight_history.aggregate([
+            {'$match': match},
+            {'$group': {
+                # Subtracting two dates gives milliseconds
+                '_id': {'$floor': {'$divide': [{'$subtract': ['$date', start]}, bin_ms]}},
+                'weight': {'$avg': '$weight'},
+                'date': {'$max': '$date'}
+            }},
+            {'$sort': {'date': -1}},
+            {'$limit': max_points},
+            {'$project': {'_id': 0, 'weight': 1, 'date': 1}}
+        ])
         return list(history)
 
     # Recipe Rating and Reviews
-    def add_recipe_review(self, recipe_id, rating, comment):
+    def add_recipe_review(self, recipe_id, rating, comment, collection=None):
+        # Recipe IDs repeat across catalogs; without a collection, use the only one holding it
+        if collection is None:
+            collection = meal_catalog.collection_of(recipe_id)
         review = {
             'user_id': ObjectId(self.get_id()),
             'recipe_id': recipe_id,
+            'collection': collection,
             'rating': rating,
             'comment': comment,
             'helpful_votes': 0,
             'date': datetime.utcnow()
         }
         recipe_reviews.insert_one(review)
+        cf_model.fold_in(self.get_id(), collection, recipe_id, rating)
         self._check_review_achievements()
 
     def get_recipe_reviews(self, recipe_id=None):
@@ -107,54 +212,58 @@ class User(UserMixin):
         return list(workout_plans.find({'user_id': ObjectId(self.get_id())}))
 
     def save(self):
-        user_dict = {
-            'email': self.email,
-            'username': self.username,
-            'age': self.age,
-            'height': self.height,
-            'weight': self.weight,
-            'blood': self.blood,
-            'health_issues': self.health_issues,
-            'exercise': self.exercise,
-            'diet_pref': self.diet_pref,
-            'plan_period': self.plan_period,
-            'food_type': self.food_type,
-            'password_hash': self.password_hash,
-            'created_at': self.created_at
-        }
-        result = users_collection.insert_one(user_dict)
-        self._id = result.inserted_id
+        """Insert a new user, or $set only the fields changed since loading"""
+        if self._id is None:
+            user_dict = {field: getattr(self, field) for field in USER_FIELDS}
+            result = users_collection.insert_one(user_dict)
+            object.__setattr__(self, '_id', result.inserted_id)
+        elif self._dirty:
+            changes = {field: object.__getattribute__(self, field) for field in self._dirty}
+            users_collection.update_one({'_id': self._id}, {'$set': changes})
+        self._dirty.clear()
+        # Drop any cached copy of this profile and keep the request's copy current
+        profile_cache.invalidate(self._id)
+        users = identity_map()
+        if users is not None:
+            users[str(self._id)] = self
         return self
 
     @classmethod
     def from_dict(cls, data):
+        """Build a user from a (possibly projected) users document"""
         user = cls.__new__(cls)
-        user._id = data['_id']
-        user.email = data['email']
-        user.username = data['username']
-        user.age = data['age']
-        user.height = data['height']
-        user.weight = data['weight']
-        user.blood = data['blood']
-        user.health_issues = data.get('health_issues', 'none')
-        user.exercise = data['exercise']
-        user.diet_pref = data['diet_pref']
-        user.plan_period = data['plan_period']
-        user.food_type = data['food_type']
-        user.password_hash = data['password_hash']
-        user.created_at = data.get('created_at', datetime.utcnow())
+        object.__setattr__(user, '_id', data['_id'])
+        object.__setattr__(user, '_dirty', set())
+        for field in USER_FIELDS:
+            if field in data:
+                object.__setattr__(user, field, data[field])
+        # A profile projection without these fields means the document lacks them
+        if 'email' in data:
+            for field, default in FIELD_DEFAULTS.items():
+                if field not in data:
+                    object.__setattr__(user, field, default)
         return user
 
     @classmethod
-    def find_by_email(cls, email):
-        user_data = users_collection.find_one({"email": email})
+    def find_by_email(cls, email, profile='auth'):
+        user_data = users_collection.find_one({"email": email}, PROJECTIONS[profile])
         if user_data:
             return cls.from_dict(user_data)
         return None
 
     @classmethod
     def find_by_id(cls, user_id):
-        user_data = users_collection.find_one({"_id": ObjectId(user_id)})
-        if user_data:
-            return cls.from_dict(user_data)
-        return None
+        key = str(user_id)
+        users = identity_map()
+        if users is not None and key in users:
+            return users[key]
+        user_data = profile_cache.get(key)
+        if user_data is None:
+            user_data = users_collection.find_one({"_id": ObjectId(user_id)}, PROJECTIONS['session'])
+            if not user_data:
+                return None
+            profile_cache.put(key, user_data)
+        user = cls.from_dict(user_data)
+        if users is not None:
+            users[key] = user
+        return user
@@ -0,0 +1,141 @@
+"""
+Persisted top-K "similar meal" index.
+
+For every recipe in a catalog collection we keep the IDs and cosine scores of
+its K most similar recipes (bag-of-words over the ``soup`` column, the same
+features ``benchmarks.similarity.cosinemat`` uses). The arrays are int32/float16, so the
+index costs O(n*K) memory instead of the dense n*n cosine matrix, and a
+similar-meal swap is an O(K) lookup.
+
+Indexes are written to ``NEIGHBOUR_INDEX_DIR`` (one ``<collection>.npz`` per
+catalog) together with the catalog version they were built from, and are
+rebuilt automatically when the catalog changes.
+"""
+import os
+
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+from myproject.metrics import span, timed
+
+NEIGHBOUR_K = 24
+NEIGHBOUR_INDEX_DIR = os.environ.get(
+    'NEIGHBOUR_INDEX_DIR',
+    os.path.join(os.path.abspath(os.path.dirname(__file__)), 'data', 'index')
+)
+
+
+class NeighbourIndex:
+    """Top-K neighbour IDs and scores per recipe ID"""
+
+    def __init__(self, ids, neighbours, scores, version=0):
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.neighbours = np.asarray(neighbours, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float16)
+        self.version = int(version)
+        self._row_by_id = {int(recipe_id): row for row, recipe_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def k(self):
+        return self.neighbours.shape[1] if self.neighbours.ndim == 2 else 0
+
+    def neighbours_of(self, recipe_id):
+        """Return (neighbour IDs, scores) for a recipe, most similar first"""
+        row = self._row_by_id.get(int(recipe_id))
+        if row is None:
+            return self.neighbours[:0, 0], self.scores[:0, 0]
+        valid = self.neighbours[row] >= 0
+        return self.neighbours[row][valid], self.scores[row][valid]
+
+    def similar(self, recipe_id, rank=1, exclude=()):
+        """
+        Return the ID of a similar recipe, or None if the recipe is unknown.
+
+        ``rank`` 0 is the closest other recipe; the default of 1 matches the
+        pick ``benchmarks.similarity.get_recommendations`` has always made.
+        IDs in ``exclude`` are skipped.
+        """
+        ids, _ = self.neighbours_of(recipe_id)
+        if exclude:
+            ids = ids[~np.isin(ids, list(exclude))]
+        if len(ids) == 0:
+            return None
+        return int(ids[min(rank, len(ids) - 1)])
+
+    def save(self, path):
+        """Write the index atomically so readers never see a partial file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as fh:
+            np.savez(fh, ids=self.ids, neighbours=self.neighbours,
+                     scores=self.scores, version=np.int64(self.version))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['ids'], data['neighbours'], data['scores'], int(data['version']))
+
+
+@timed('neighbours.build')
+def build_neighbour_index(frame, k=NEIGHBOUR_K, version=0, block_size=512):
+    """Compute the top-K cosine neighbours of every row of a catalog frame"""
+    ids = frame['ID'].to_numpy(dtype=np.int32)
+    n = len(ids)
+    k = max(0, min(k, n - 1))
+    neighbours = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float16)
+    if n == 0 or k == 0:
+        return NeighbourIndex(ids, neighbours, scores, version)
+
+    with span('neighbours.vectorize'):
+        if 'tokens' in frame.columns and frame['tokens'].map(lambda value: isinstance(value, list)).all():
+            # Tokens extracted from the soup at import time with the same analyzer
+            count = CountVectorizer(analyzer=lambda tokens: tokens)
+            matrix = normalize(count.fit_transform(frame['tokens']))
+        else:
+            count = CountVectorizer(stop_words='english')
+            matrix = normalize(count.fit_transform(frame['soup'].fillna('')))
+        matrix_t = matrix.T.tocsc()
+
+    # Work in row blocks so peak memory is block_size*n, not n*n
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        sims = (matrix[start:stop] @ matrix_t).toarray()
+        sims[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        neighbours[start:stop] = ids[top]
+        scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+
+    return NeighbourIndex(ids, neighbours, scores, version)
+
+
+def index_path(name, directory=None):
+    return os.path.join(directory or NEIGHBOUR_INDEX_DIR, f"{name}.npz")
+
+
+def load_or_build_neighbour_index(table, directory=None):
+    """Load the on-disk index for a catalog table, rebuilding it if stale"""
+    path = index_path(table.name, directory)
+    ids = table.frame['ID'].to_numpy(dtype=np.int32)
+    if os.path.exists(path):
+        try:
+            index = NeighbourIndex.load(path)
+            if index.version == table.version and np.array_equal(index.ids, ids):
+                return index
+        except Exception as e:
+            print(f"Error loading neighbour index {path}: {e}")
+
+    index = build_neighbour_index(table.frame, version=table.version)
+    try:
+        index.save(path)
+    except OSError as e:
+        print(f"Error saving neighbour index {path}: {e}")
+    return index
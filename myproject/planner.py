@@ -0,0 +1,287 @@
+"""
+Calorie- and macro-optimising daily plan solver.
+
+Instead of sampling each meal slot independently, the solver scores whole
+days (breakfast + lunch + dinner) against the user's calorie target and
+macro split and keeps the best few. Catalog macros (``Proteins``,
+``Carbohydrates``, ``Fats``) are percentages of each recipe's energy, so the
+day's macro split is the calorie-weighted mean of its recipes.
+
+The three planned meals cover the same part of the day the original
+per-slot sampler aimed at (``SLOT_SHARES``), since single catalog servings
+are far too small to make up a whole day's energy.
+Each slot's candidates are drawn at random from the ``DIVERSITY * width``
+recipes closest to that slot's share of the target, so plans for similar
+users don't all converge on the same few recipes; all remaining breakfast x
+(lunch, dinner) combinations are then scored with NumPy in chunks, stopping
+early once the time budget is spent so ``/menu`` latency stays bounded.
+Health conditions always hold: when too few recipes pass them, the cuisine
+preference is relaxed tier by tier, never the conditions.
+"""
+import os
+import time
+
+import numpy as np
+
+MACRO_COLUMNS = ['Proteins', 'Carbohydrates', 'Fats']
+
+# Target share of daily energy (%) per macro, by health condition
+MACRO_TARGETS = {
+    'default': {'Proteins': 20, 'Carbohydrates': 50, 'Fats': 30},
+    'diabetes': {'Proteins': 25, 'Carbohydrates': 40, 'Fats': 35},
+    'cancer': {'Proteins': 20, 'Carbohydrates': 55, 'Fats': 25},
+}
+
+# Share of the daily calorie target per slot, as in the original sampler.
+# Median servings are ~130 kcal (breakfast) and ~180 kcal (lunch/dinner), so
+# three of them can't cover a whole day; the rest is left to snacks.
+SLOT_SHARES = {'breakfast': 1 / 7, 'lunch': 2 / 10, 'dinner': 2 / 10}
+PLANNED_SHARE = sum(SLOT_SHARES.values())
+
+CALORIE_WEIGHT = 1.0
+MACRO_WEIGHT = 1.0
+PRUNE_WIDTH = 40
+# Each pool is a random ``width`` of the ``DIVERSITY * width`` best fits
+DIVERSITY = 3
+# Multi-day pools hold at least this many recipes per planned day
+DAY_WIDTH = 6
+# Days below this share of the calorie target are flagged ``short``
+SHORT_SHARE = 0.8
+TIME_BUDGET = float(os.environ.get('PLANNER_TIME_BUDGET', 0.05))
+
+
+def macro_targets(conditions):
+    targets = MACRO_TARGETS['default']
+    for condition in conditions:
+        targets = MACRO_TARGETS.get(condition, targets)
+    return targets
+
+
+class _SlotPool:
+    """Pruned candidate recipes for one slot, as columns"""
+
+    def __init__(self, rules, rows):
+        self.ids = rules.ids[rows]
+        self.calories = np.nan_to_num(rules.columns['Calories'][rows])
+        # Energy (kcal) from each macro
+        self.energy = {}
+        for column in MACRO_COLUMNS:
+            share = np.nan_to_num(rules.columns[column][rows]) / 100.0
+            self.energy[column] = self.calories * share
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _pool(rules, slot_calorie, targets, conditions, cuisine, width, exclude, minimum):
+    """Rows allowed by the rules, pruned to a random sample of those that best fit the slot"""
+    rows, tier = rules.planning_rows(conditions, cuisine, minimum + len(exclude))
+    if exclude:
+        rows = rows[~np.isin(rules.ids[rows], list(exclude))]
+    if tier > 0:
+        print(f"Planner: relaxed to tier {tier} ({len(rows)} recipes) keeping conditions {list(conditions)}")
+
+    calories = np.nan_to_num(rules.columns['Calories'][rows])
+    fit = np.abs(calories - slot_calorie) / max(slot_calorie, 1.0)
+    for column in MACRO_COLUMNS:
+        share = np.nan_to_num(rules.columns[column][rows])
+        fit += np.abs(share - targets[column]) / 100.0
+    if len(rows) > width:
+        shortlist = min(len(rows), DIVERSITY * width)
+        best = np.argpartition(fit, shortlist - 1)[:shortlist]
+        rows = rows[np.random.choice(best, width, replace=False)]
+    return rows
+
+
+def _day_scores(calories, energy, calorie, targets):
+    """Scores of whole days from their total calories and energy per macro (any shape)"""
+    score = CALORIE_WEIGHT * ((calories - calorie) / max(calorie, 1.0)) ** 2
+    safe_total = np.where(calories > 0, calories, 1.0)
+    for column in MACRO_COLUMNS:
+        share = 100.0 * energy[column] / safe_total
+        score = score + MACRO_WEIGHT * ((share - targets[column]) / 100.0) ** 2
+    return score
+
+
+def _score(breakfast, lunchdinner, calorie, targets, time_budget):
+    """Score matrix over breakfast rows x (lunch, dinner) pairs"""
+    started = time.perf_counter()
+    first, second = np.triu_indices(len(lunchdinner), 1)
+    pair_calories = lunchdinner.calories[first] + lunchdinner.calories[second]
+    pair_energy = {column: lunchdinner.energy[column][first] + lunchdinner.energy[column][second]
+                   for column in MACRO_COLUMNS}
+
+    scores = np.full((len(breakfast), len(first)), np.inf)
+    chunk = max(1, 200000 // max(len(first), 1))
+    for start in range(0, len(breakfast), chunk):
+        stop = min(start + chunk, len(breakfast))
+        total = breakfast.calories[start:stop, None] + pair_calories[None, :]
+        energy = {column: breakfast.energy[column][start:stop, None] + pair_energy[column][None, :]
+                  for column in MACRO_COLUMNS}
+        scores[start:stop] = _day_scores(total, energy, calorie, targets)
+        if time.perf_counter() - started > time_budget:
+            break
+    return scores, first, second
+
+
+def _day_totals(breakfast, lunchdinner, day):
+    b, lunch, dinner = day
+    calories = breakfast.calories[b] + lunchdinner.calories[lunch] + lunchdinner.calories[dinner]
+    energy = {column: breakfast.energy[column][b] + lunchdinner.energy[column][lunch]
+              + lunchdinner.energy[column][dinner] for column in MACRO_COLUMNS}
+    return calories, energy
+
+
+def _plan(breakfast, lunchdinner, day, score, target):
+    b, lunch, dinner = day
+    total, energy = _day_totals(breakfast, lunchdinner, day)
+    grams = {}
+    for column, kcal_per_gram in (('Proteins', 4.0), ('Carbohydrates', 4.0), ('Fats', 9.0)):
+        grams[column] = float(energy[column] / kcal_per_gram)
+    return {
+        'ids': [int(breakfast.ids[b]), int(lunchdinner.ids[lunch]), int(lunchdinner.ids[dinner])],
+        'calories': float(total),
+        'target_calories': float(target),
+        'short': bool(total < SHORT_SHARE * target),
+        'protein_g': grams['Proteins'],
+        'carbs_g': grams['Carbohydrates'],
+        'fat_g': grams['Fats'],
+        'score': float(score),
+    }
+
+
+def _prepare(breakfast_rules, lunch_rules, calorie, conditions, cuisine, width, days, exclude):
+    targets = macro_targets(conditions)
+    exclude = set(exclude or ())
+    brows = _pool(breakfast_rules, calorie * SLOT_SHARES['breakfast'], targets,
+                  conditions, cuisine, width, exclude, days)
+    lrows = _pool(lunch_rules, calorie * SLOT_SHARES['lunch'], targets,
+                  conditions, cuisine, width, exclude, 2 * days)
+    return _SlotPool(breakfast_rules, brows), _SlotPool(lunch_rules, lrows), targets
+
+
+def best_plans(breakfast_rules, lunch_rules, calorie, conditions=(), cuisine=None,
+               count=3, width=PRUNE_WIDTH, time_budget=TIME_BUDGET, exclude=()):
+    """Return up to ``count`` best one-day plans, best first"""
+    breakfast, lunchdinner, targets = _prepare(
+        breakfast_rules, lunch_rules, calorie, conditions, cuisine, width, 1, exclude)
+    if len(breakfast) == 0 or len(lunchdinner) < 2:
+        return []
+    target = calorie * PLANNED_SHARE
+    scores, first, second = _score(breakfast, lunchdinner, target, targets, time_budget)
+    flat = scores.ravel()
+    count = min(count, int(np.isfinite(flat).sum()))
+    if count == 0:
+        return []
+    top = np.argpartition(flat, count - 1)[:count]
+    top = top[np.argsort(flat[top])]
+    plans = []
+    for index in top:
+        b, p = np.unravel_index(index, scores.shape)
+        lunch, dinner = first[p], second[p]
+        if np.random.rand() < 0.5:
+            lunch, dinner = dinner, lunch
+        plans.append(_plan(breakfast, lunchdinner, (b, lunch, dinner), flat[index], target))
+    return plans
+
+
+def _rebalance(breakfast, lunchdinner, week, calorie, targets, time_budget):
+    """
+    Lower the week's total score by replacing recipes with unused pool
+    recipes or swapping them between days. Scores are squared errors, so
+    this evens the days out instead of leaving the leftovers to the last ones.
+    """
+    started = time.perf_counter()
+    pools = (breakfast, lunchdinner, lunchdinner)
+
+    def day_score(day):
+        return float(_day_scores(*_day_totals(breakfast, lunchdinner, day), calorie, targets))
+
+    scores = [day_score(day) for day in week]
+    improved = True
+    while improved and time.perf_counter() - started < time_budget:
+        improved = False
+        for n, day in enumerate(week):
+            for slot in range(3):
+                pool = pools[slot]
+                positions = (0,) if slot == 0 else (1, 2)
+                best_delta, best_move = -1e-12, None
+
+                # Replace with a recipe of the pool the week doesn't use yet
+                used = [other[position] for other in week for position in positions]
+                free = np.setdiff1d(np.arange(len(pool)), used)
+                if len(free):
+                    calories, energy = _day_totals(breakfast, lunchdinner, day)
+                    current = day[slot]
+                    calories = calories - pool.calories[current] + pool.calories[free]
+                    energy = {column: energy[column] - pool.energy[column][current] + pool.energy[column][free]
+                              for column in MACRO_COLUMNS}
+                    deltas = _day_scores(calories, energy, calorie, targets) - scores[n]
+                    best = int(np.argmin(deltas))
+                    if deltas[best] < best_delta:
+                        best_delta, best_move = float(deltas[best]), (int(free[best]),)
+
+                # Swap with the same kind of meal on another day
+                for m, other in enumerate(week):
+                    if m == n:
+                        continue
+                    for position in positions:
+                        mine, theirs = list(day), list(other)
+                        mine[slot], theirs[position] = other[position], day[slot]
+                        new_n, new_m = day_score(mine), day_score(theirs)
+                        delta = new_n + new_m - scores[n] - scores[m]
+                        if delta < best_delta:
+                            best_delta, best_move = delta, (m, position, new_n, new_m)
+
+                if best_move is None:
+                    continue
+                improved = True
+                if len(best_move) == 1:
+                    day[slot] = best_move[0]
+                    scores[n] = day_score(day)
+                else:
+                    m, position, new_n, new_m = best_move
+                    day[slot], week[m][position] = week[m][position], day[slot]
+                    scores[n], scores[m] = new_n, new_m
+    return week, scores
+
+
+def best_days(breakfast_rules, lunch_rules, calorie, days, conditions=(), cuisine=None,
+              width=PRUNE_WIDTH, time_budget=TIME_BUDGET):
+    """
+    Return ``days`` one-day plans sharing no recipe, balanced so no day is
+    left with the leftovers; days under SHORT_SHARE of the target are
+    flagged ``short`` and logged.
+    """
+    width = max(width, DAY_WIDTH * days)
+    breakfast, lunchdinner, targets = _prepare(
+        breakfast_rules, lunch_rules, calorie, conditions, cuisine, width, days, ())
+    if len(breakfast) == 0 or len(lunchdinner) < 2:
+        return []
+    target = calorie * PLANNED_SHARE
+    scores, first, second = _score(breakfast, lunchdinner, target, targets, time_budget)
+
+    # Greedy best-first start, then evened out across the days
+    week = []
+    for _ in range(days):
+        index = int(np.argmin(scores))
+        if not np.isfinite(scores.flat[index]):
+            break
+        b, p = np.unravel_index(index, scores.shape)
+        week.append([int(b), int(first[p]), int(second[p])])
+        # Rule out every combination that reuses one of these recipes
+        scores[b, :] = np.inf
+        used = (first == first[p]) | (second == first[p]) | (first == second[p]) | (second == second[p])
+        scores[:, used] = np.inf
+    week, day_scores = _rebalance(breakfast, lunchdinner, week, target, targets, time_budget)
+
+    plans = []
+    for day, score in zip(week, day_scores):
+        if np.random.rand() < 0.5:
+            day[1], day[2] = day[2], day[1]
+        plans.append(_plan(breakfast, lunchdinner, day, score, target))
+    short = [number + 1 for number, plan in enumerate(plans) if plan['short']]
+    if short:
+        print(f"Planner: days {short} fall below {SHORT_SHARE:.0%} of the {target:.0f} kcal target "
+              f"for conditions {list(conditions)}")
+    return plans
@@ -0,0 +1,77 @@
+"""
+User profile caching.
+
+Two layers keep hot pages from re-reading the ``users`` collection:
+
+* an identity map on ``flask.g``, so one request builds each user at most once
+  (``load_user`` and the view's ``User.find_by_id`` share the same object);
+* a bounded LRU cache of profile documents shared across requests, with a TTL.
+
+Writes through ``User`` invalidate the cached profile. The cache is per
+process, so other workers may serve a profile up to ``ttl`` seconds old.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, has_app_context
+
+PROFILE_CACHE_SIZE = int(os.environ.get('PROFILE_CACHE_SIZE', 1024))
+PROFILE_CACHE_TTL = float(os.environ.get('PROFILE_CACHE_TTL', 300))
+
+
+class ProfileCache:
+    """Thread-safe LRU of user documents keyed by user ID, with expiry"""
+
+    def __init__(self, maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        key = str(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, document = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(document)
+
+    def put(self, key, document):
+        if self.maxsize <= 0:
+            return
+        key = str(key)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), dict(document))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(str(key), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def identity_map():
+    """Users already built during this request (None outside a request)"""
+    if not has_app_context():
+        return None
+    if 'user_identity_map' not in g:
+        g.user_identity_map = {}
+    return g.user_identity_map
+
+
+profile_cache = ProfileCache()
@@ -0,0 +1,123 @@
+"""
+Server-side Flask sessions stored in MongoDB.
+
+The cookie only carries a random session ID; the session data lives in the
+``sessions`` collection and expires through a TTL index on ``expires_at``.
+Data is written back only when the session changed (or its expiry is more
+than half used up), so unchanged requests cost one indexed read. Login and
+logout call ``rotate_session`` so the session ID changes whenever the
+user does; the old document is deleted, which prevents session fixation.
+"""
+import secrets
+import threading
+from datetime import datetime, timedelta
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SessionInterface
+
+SESSION_LIFETIME = timedelta(days=7)
+
+
+class MongoSession(SecureCookieSession):
+    """Session dict that remembers its server-side ID"""
+
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        # Set by regenerate(); deleted from the store when the session is saved
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Keep the data under a fresh session ID"""
+        if not self.new and self.previous_sid is None:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+
+
+def rotate_session(session):
+    """Issue a new session ID for the current session (no-op for cookie sessions)"""
+    regenerate = getattr(session, 'regenerate', None)
+    if regenerate is not None:
+        regenerate()
+
+
+class MongoSessionInterface(SessionInterface):
+    """Keep session data in a Mongo collection, only the ID in the cookie"""
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, collection, lifetime=SESSION_LIFETIME):
+        self.collection = collection
+        self.lifetime = lifetime
+        self._indexed = False
+        self._lock = threading.Lock()
+
+    def _ensure_index(self):
+        if self._indexed:
+            return
+        with self._lock:
+            if not self._indexed:
+                self.collection.create_index('expires_at', expireAfterSeconds=0)
+                self._indexed = True
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            doc = self.collection.find_one({'_id': sid, 'expires_at': {'$gt': datetime.utcnow()}})
+            if doc:
+                try:
+                    data = self.serializer.loads(doc['data'])
+                    return MongoSession(data, sid=sid, expires_at=doc['expires_at'])
+                except (KeyError, ValueError):
+                    pass
+        return MongoSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        rotated = session.previous_sid is not None
+        if rotated:
+            self.collection.delete_one({'_id': session.previous_sid})
+            session.previous_sid = None
+
+        # Emptied sessions are removed on both sides
+        if not session:
+            if session.modified and (rotated or not session.new):
+                self.collection.delete_one({'_id': session.sid})
+                response.delete_cookie(name, domain=domain, path=path)
+                response.vary.add('Cookie')
+            return
+
+        now = datetime.utcnow()
+        stale = session.expires_at is None or session.expires_at - now < self.lifetime / 2
+        if session.modified or stale:
+            self._ensure_index()
+            expires_at = now + self.lifetime
+            self.collection.update_one(
+                {'_id': session.sid},
+                {'$set': {'data': self.serializer.dumps(dict(session)), 'expires_at': expires_at}},
+                upsert=True
+            )
+            session.expires_at = expires_at
+
+        if session.new or session.modified or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+            response.vary.add('Cookie')
@@ -0,0 +1,158 @@
+"""
+Versioned binary snapshot of the recipe catalog.
+
+A snapshot is a directory ``<CATALOG_SNAPSHOT_DIR>/v<version>/`` holding,
+per catalog collection:
+
+* ``<name>.<column>.npy``: the typed numeric columns;
+* ``<name>.tags.*.npy`` and ``<name>.neighbours.*.npy``: the tag index
+  postings/cuisine bitsets and the top-K neighbour index;
+* ``<name>.json``: the string table (remaining frame columns and the display
+  documents);
+
+plus ``manifest.json``, written last. All arrays are memory-mapped on load,
+so a process starts from a few file maps instead of a full collection scan
+and rebuilding DataFrames, tag and neighbour indexes. Mongo stays the source
+of truth: a snapshot is only used when its version matches the catalog's
+version stamp, and a stale one is replaced the next time the catalog is
+loaded from Mongo.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_FORMAT = 1
+CATALOG_SNAPSHOT_DIR = os.environ.get(
+    'CATALOG_SNAPSHOT_DIR',
+    os.path.join(os.path.abspath(os.path.dirname(__file__)), 'data', 'snapshot')
+)
+
+_NEIGHBOUR_ARRAYS = ('ids', 'neighbours', 'scores')
+
+
+def snapshot_path(version, directory=None):
+    return os.path.join(directory or CATALOG_SNAPSHOT_DIR, f"v{version}")
+
+
+def _json_default(value):
+    # ObjectIds, numpy scalars and the like
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def _write_table(path, table):
+    from myproject.catalog import NUMERIC_COLUMNS, _build_tag_index
+    from myproject.neighbours import load_or_build_neighbour_index
+
+    frame = table.frame
+    numeric = [column for column in NUMERIC_COLUMNS if column in frame.columns]
+    for column in numeric:
+        dtype = frame[column].dtype if isinstance(frame[column].dtype, np.dtype) else np.float64
+        np.save(os.path.join(path, f"{table.name}.{column}.npy"), frame[column].to_numpy(dtype=dtype))
+
+    tags = table.derived('tags', _build_tag_index)
+    terms, labels, arrays = tags.to_arrays()
+    for key, array in arrays.items():
+        np.save(os.path.join(path, f"{table.name}.tags.{key}.npy"), array)
+
+    index = table.derived('neighbours', load_or_build_neighbour_index)
+    for key in _NEIGHBOUR_ARRAYS:
+        np.save(os.path.join(path, f"{table.name}.neighbours.{key}.npy"), getattr(index, key))
+
+    strings = [column for column in frame.columns if column not in numeric]
+    documents = [{k: v for k, v in doc.items() if k != '_id'} for doc in table.documents]
+    with open(os.path.join(path, f"{table.name}.json"), 'w') as fh:
+        json.dump({
+            'columns': {column: frame[column].tolist() for column in strings},
+            'documents': documents,
+        }, fh, default=_json_default)
+
+    return {
+        'rows': len(frame),
+        'numeric': numeric,
+        'strings': strings,
+        'order': list(frame.columns),
+        'terms': terms,
+        'cuisines': labels,
+        'neighbour_version': index.version,
+    }
+
+
+def write_snapshot(tables, version, directory=None):
+    """Write a snapshot of loaded catalog tables; return its path"""
+    path = snapshot_path(version, directory)
+    if os.path.exists(os.path.join(path, 'manifest.json')):
+        return path
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    try:
+        manifest = {'format': SNAPSHOT_FORMAT, 'version': version, 'tables': {}}
+        for name, table in tables.items():
+            manifest['tables'][name] = _write_table(tmp_path, table)
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w') as fh:
+            json.dump(manifest, fh)
+        # Another process may have written the same version meanwhile
+        if os.path.exists(path):
+            shutil.rmtree(tmp_path)
+        else:
+            os.rename(tmp_path, path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    _remove_stale(version, directory)
+    return path
+
+
+def _remove_stale(version, directory=None):
+    root = directory or CATALOG_SNAPSHOT_DIR
+    current = os.path.basename(snapshot_path(version, directory))
+    for entry in os.listdir(root):
+        if entry.startswith('v') and entry != current and not entry.endswith('.tmp'):
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+
+
+def _load_table(path, name, meta, version):
+    from myproject.catalog import CatalogTable
+    from myproject.neighbours import NeighbourIndex
+    from myproject.tagindex import TagIndex
+
+    def array(suffix):
+        return np.load(os.path.join(path, f"{name}.{suffix}.npy"), mmap_mode='r')
+
+    with open(os.path.join(path, f"{name}.json")) as fh:
+        strings = json.load(fh)
+    columns = dict(strings['columns'])
+    for column in meta['numeric']:
+        columns[column] = array(column)
+    frame = pd.DataFrame({column: columns[column] for column in meta['order']}, copy=False)
+
+    table = CatalogTable(name, strings['documents'], version, frame=frame)
+    tags = TagIndex.from_arrays(meta['rows'], meta['terms'], meta['cuisines'],
+                                {key: array(f"tags.{key}") for key in ('offsets', 'rows', 'cuisine_bits')})
+    neighbours = NeighbourIndex(*(array(f"neighbours.{key}") for key in _NEIGHBOUR_ARRAYS),
+                                version=meta['neighbour_version'])
+    table.derived('tags', lambda _: tags)
+    table.derived('neighbours', lambda _: neighbours)
+    return table
+
+
+def load_snapshot(version, directory=None):
+    """Catalog tables from the snapshot for ``version``, or None if there is none"""
+    path = snapshot_path(version, directory)
+    try:
+        with open(os.path.join(path, 'manifest.json')) as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != SNAPSHOT_FORMAT or manifest.get('version') != version:
+        return None
+    try:
+        return {name: _load_table(path, name, meta, version) for name, meta in manifest['tables'].items()}
+    except Exception as e:
+        print(f"Error loading catalog snapshot {path}: {e}")
+        return None
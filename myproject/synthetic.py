@@ -0,0 +1,371 @@
+"""
+Seeded synthetic catalogs, users and activity histories for scale testing.
+
+``RecipeModel`` is fitted to one of the bundled CSVs and generates recipes
+with the same columns, tag vocabulary and ``soup`` layout: each one starts
+from a real recipe and resamples some of its tags, half of its name,
+ingredient lines and nutrition (calories are jittered, macro shares drawn
+around the original's), so tag frequencies, cuisine mix and nutrition
+distributions stay close to the source.
+
+Users get a power-law (Pareto) activity level; workout logs, weight entries,
+recipe reviews and meal feedback are shared out in proportion to it, so a
+few users hold most of the history as in real traffic. Every synthetic user
+has the password ``SYNTHETIC_PASSWORD``.
+
+Generators yield lists of documents ``chunk_size`` at a time, ready for
+``insert_many``; the same seed always gives the same data.
+"""
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateOne
+from werkzeug.security import generate_password_hash
+
+from myproject.features import parse_ingredients, parse_steps
+from myproject.importer import read_chunks
+from myproject.tagindex import parse_soup
+from myproject.trend import update_trend
+
+SYNTHETIC_PASSWORD = 'synthetic-pass'
+CHUNK_SIZE = 50000
+
+# Share of tags, name halves and ingredient lines swapped for other recipes'
+TAG_SWAP = 0.25
+NAME_SWAP = 0.5
+INGREDIENT_SWAP = 0.2
+# Concentration of the macro-share Dirichlet around the source recipe's
+MACRO_CONCENTRATION = 50.0
+# Pareto shape of per-user activity; smaller is more skewed
+ACTIVITY_SHAPE = 1.2
+HISTORY_DAYS = 730
+
+EXERCISES = {
+    'Running': 11.4, 'Cycling': 8.5, 'Swimming': 10.0, 'Jump Rope': 12.0, 'Elliptical': 8.0,
+    'Push-ups': 7.0, 'Pull-ups': 8.0, 'Squats': 8.0, 'Lunges': 6.0, 'Planks': 5.0,
+    'Yoga': 4.0, 'Stretching': 2.5, 'Pilates': 5.0,
+}
+INTENSITIES = ['low', 'moderate', 'high']
+
+# Registration form choices with rough population shares
+PROFILE_CHOICES = {
+    'blood': (['A', 'B', 'O', 'AB'], [0.3, 0.25, 0.38, 0.07]),
+    'health_issues': (['none', 'diabetes', 'hypertension', 'heart_disease', 'high_cholesterol', 'obesity',
+                       'underweight', 'digestive_issues', 'food_allergies', 'other'],
+                      [0.55, 0.1, 0.08, 0.04, 0.06, 0.07, 0.03, 0.03, 0.02, 0.02]),
+    'exercise': (['1.2', '1.375', '1.55', '1.725', '1.9'], [0.3, 0.3, 0.25, 0.1, 0.05]),
+    'diet_pref': (['balanced', 'low carbohydrates', 'low fats'], [0.6, 0.25, 0.15]),
+    'plan_period': (['daily', 'weekly'], [0.7, 0.3]),
+    'food_type': (['vegan', 'vegetarian', 'non-vegetarian', 'eggitarian'], [0.1, 0.5, 0.3, 0.1]),
+}
+FEEDBACK_TEXT = [None, None, None, 'Loved it', 'Too spicy', 'Too bland', 'Took too long', 'Would eat again']
+
+
+def _quote_tag(tag):
+    return f'"{tag}"' if "'" in tag else f"'{tag}'"
+
+
+def make_soup(tags, name, carbohydrates, fats, proteins):
+    """Soup string in the catalog's layout: ``['tag' ...] name c f p``"""
+    return f"[{' '.join(_quote_tag(tag) for tag in tags)}] {name.lower()} {carbohydrates} {fats} {proteins}"
+
+
+class RecipeModel:
+    """Recipe generator fitted to one catalog CSV"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.tags = [parse_soup(row.get('soup') or '')[0] for row in rows]
+        self.ingredients = [parse_ingredients(row.get('Ingredients')) for row in rows]
+        self.steps = [parse_steps(row.get('Steps')) for row in rows]
+        self.names = [str(row.get('Name') or '').split() for row in rows]
+
+        counts = {}
+        for tags in self.tags:
+            for tag in tags:
+                counts[tag] = counts.get(tag, 0) + 1
+        self.tag_vocabulary = list(counts)
+        frequencies = np.array([counts[tag] for tag in self.tag_vocabulary], dtype=float)
+        self.tag_cdf = np.cumsum(frequencies) / frequencies.sum()
+        self.ingredient_pool = [line for lines in self.ingredients for line in lines]
+
+        def column(name):
+            return np.array([float(row.get(name) or 0) for row in rows])
+
+        self.calories = column('Calories')
+        self.macros = np.column_stack([column('Proteins'), column('Carbohydrates'), column('Fats')])
+        self.fiber = column('Fiber')
+        self.cholesterol = column('Cholesterol')
+        self.sodium = column('Sodium')
+        self.time = column('Time')
+        self.servings = [row.get('Servings') for row in rows]
+        self.ratings = column('AggregatedRating')
+        self.review_counts = column('ReviewCount')
+
+    @classmethod
+    def from_csv(cls, csv_path):
+        rows = [record for chunk in read_chunks(csv_path) for record in chunk if record.get('ID') is not None]
+        return cls(rows)
+
+    def _tags(self, base, rng):
+        tags = list(self.tags[base])
+        for i in range(len(tags)):
+            if rng.random() < TAG_SWAP:
+                tag = self.tag_vocabulary[min(int(np.searchsorted(self.tag_cdf, rng.random())),
+                                              len(self.tag_vocabulary) - 1)]
+                if tag not in tags:
+                    tags[i] = tag
+        return tags
+
+    def _name(self, base, rng):
+        words = self.names[base]
+        if rng.random() >= NAME_SWAP or len(words) < 2:
+            return ' '.join(words)
+        other = self.names[rng.integers(len(self.names))]
+        if not other:
+            return ' '.join(words)
+        return ' '.join(words[:max(1, len(words) // 2)] + other[len(other) // 2:])
+
+    def _ingredients(self, base, rng):
+        lines = list(self.ingredients[base])
+        for i in range(len(lines)):
+            if rng.random() < INGREDIENT_SWAP:
+                lines[i] = self.ingredient_pool[rng.integers(len(self.ingredient_pool))]
+        return lines
+
+    def generate(self, count, rng, start_id=1):
+        """``count`` recipe records with IDs from ``start_id``; lists for Ingredients/Steps"""
+        n = len(self.rows)
+        bases = rng.integers(n, size=count)
+        calories = np.round(self.calories[bases] * rng.lognormal(0.0, 0.2, size=count), 1)
+        # Same share of energy from macros as the source recipe, redistributed
+        totals = self.macros[bases].sum(axis=1, keepdims=True)
+        shares = self.macros[bases] / np.maximum(totals, 1e-9)
+        macros = np.vstack([rng.dirichlet(share * MACRO_CONCENTRATION + 0.5) for share in shares]) * totals
+        fiber = self.fiber[bases] * rng.lognormal(0.0, 0.2, size=count)
+        cholesterol = np.round(self.cholesterol[bases] * rng.lognormal(0.0, 0.2, size=count), 1)
+        sodium = np.round(self.sodium[bases] * rng.lognormal(0.0, 0.2, size=count), 1)
+        minutes = np.maximum(1, np.round(self.time[bases] * rng.lognormal(0.0, 0.2, size=count))).astype(int)
+        ratings = self.ratings[rng.integers(n, size=count)].astype(int)
+        review_counts = self.review_counts[rng.integers(n, size=count)].astype(int)
+
+        records = []
+        for i, base in enumerate(bases):
+            name = self._name(base, rng)
+            proteins, carbohydrates, fats = (float(value) for value in macros[i])
+            records.append({
+                'ID': start_id + i,
+                'Name': name,
+                'Calories': float(calories[i]),
+                'Proteins': proteins,
+                'Carbohydrates': carbohydrates,
+                'Fiber': float(fiber[i]),
+                'Fats': fats,
+                'Cholesterol': float(cholesterol[i]),
+                'Sodium': float(sodium[i]),
+                'Ingredients': self._ingredients(base, rng),
+                'Steps': list(self.steps[base]),
+                'Time': int(minutes[i]),
+                'Servings': self.servings[base],
+                'AggregatedRating': int(ratings[i]),
+                'ReviewCount': int(review_counts[i]),
+                'soup': make_soup(self._tags(base, rng), name, carbohydrates, fats, proteins),
+            })
+        return records
+
+    def chunks(self, count, seed=0, start_id=1, chunk_size=CHUNK_SIZE):
+        """Yield ``count`` records, IDs from ``start_id``, in lists of ``chunk_size``"""
+        rng = np.random.default_rng(seed)
+        for start in range(0, count, chunk_size):
+            yield self.generate(min(chunk_size, count - start), rng, start_id=start_id + start)
+
+
+def csv_row(record):
+    """A generated record in the CSVs' text layout (for writing a CSV)"""
+    row = dict(record)
+    row['Ingredients'] = str(list(record['Ingredients']))
+    row['Steps'] = f"[{', '.join(record['Steps'])}]"
+    return row
+
+
+def activity_levels(count, rng):
+    """Per-user activity weights from a Pareto distribution, summing to 1"""
+    levels = rng.pareto(ACTIVITY_SHAPE, size=count) + 1.0
+    return levels / levels.sum()
+
+
+def share_out(total, weights, rng):
+    """How many of ``total`` events each user gets, in proportion to ``weights``"""
+    return rng.multinomial(total, weights)
+
+
+class Population:
+    """A seeded set of synthetic users and their activity"""
+
+    def __init__(self, users, seed=0, prefix=None, now=None):
+        self.size = users
+        self.seed = seed
+        self.prefix = prefix or f'synth{seed}'
+        self.now = now or datetime.utcnow().replace(microsecond=0)
+        rng = np.random.default_rng(seed)
+        self.user_ids = [ObjectId() for _ in range(users)]
+        self.activity = activity_levels(users, rng)
+        self.sex = rng.random(users) < 0.5
+        self.height = np.where(self.sex, rng.normal(176, 7, users), rng.normal(162, 6, users)).round()
+        bmi = rng.lognormal(np.log(24.5), 0.15, users)
+        self.weight = (bmi * (self.height / 100) ** 2).round(1)
+        # kg/day drift of each user's weight over the history
+        self.drift = rng.normal(-0.01, 0.02, users)
+
+    def _rng(self, stream):
+        # Independent, reproducible stream per collection
+        return np.random.default_rng([self.seed, stream])
+
+    def _owners(self, total, rng):
+        counts = share_out(total, self.activity, rng)
+        return np.repeat(np.arange(self.size), counts)
+
+    def _dates(self, count, rng):
+        offsets = rng.uniform(0, HISTORY_DAYS * 86400, size=count)
+        start = self.now - timedelta(days=HISTORY_DAYS)
+        return [start + timedelta(seconds=float(offset)) for offset in offsets]
+
+    def users(self, chunk_size=CHUNK_SIZE):
+        rng = self._rng(0)
+        password_hash = generate_password_hash(SYNTHETIC_PASSWORD)
+        ages = rng.integers(18, 71, size=self.size)
+        choices = {field: rng.choice(values, size=self.size, p=weights)
+                   for field, (values, weights) in PROFILE_CHOICES.items()}
+        created = self._dates(self.size, rng)
+        for start in range(0, self.size, chunk_size):
+            users = []
+            for i in range(start, min(start + chunk_size, self.size)):
+                users.append({
+                    '_id': self.user_ids[i],
+                    'email': f'{self.prefix}-{i}@example.com',
+                    'username': f'{self.prefix}-{i}',
+                    'age': str(ages[i]),
+                    'height': str(int(self.height[i])),
+                    # As typed at registration; weight entries later store a float
+                    'weight': str(int(round(self.weight[i]))),
+                    'password_hash': password_hash,
+                    'created_at': created[i],
+                    'weight_trend': None,
+                    **{field: str(values[i]) for field, values in choices.items()},
+                })
+            yield users
+
+    def emails(self):
+        return [f'{self.prefix}-{i}@example.com' for i in range(self.size)]
+
+    def workout_logs(self, total, chunk_size=CHUNK_SIZE):
+        rng = self._rng(1)
+        names = list(EXERCISES)
+        for start in range(0, total, chunk_size):
+            count = min(chunk_size, total - start)
+            owners = self._owners(count, rng)
+            exercises = rng.integers(len(names), size=count)
+            durations = rng.integers(10, 91, size=count)
+            intensities = rng.integers(len(INTENSITIES), size=count)
+            dates = self._dates(count, rng)
+            logs = []
+            for i in range(count):
+                owner = owners[i]
+                name = names[exercises[i]]
+                logs.append({
+                    'user_id': self.user_ids[owner],
+                    'exercise': name,
+                    'duration': int(durations[i]),
+                    'intensity': INTENSITIES[intensities[i]],
+                    'calories_burned': EXERCISES[name] * int(durations[i]) * (self.weight[owner] / 70.0),
+                    'notes': None,
+                    'date': dates[i],
+                })
+            yield logs
+
+    def weight_history(self, total, chunk_size=CHUNK_SIZE):
+        """
+        Weight entries, each user's in date order, following that user's
+        drift plus noise. The users' resulting trend state is kept for
+        ``trend_updates``.
+        """
+        rng = self._rng(2)
+        counts = share_out(total, self.activity, rng)
+        bounds = np.cumsum(counts)
+        start_date = self.now - timedelta(days=HISTORY_DAYS)
+        self.trends = {}
+        first = 0
+        while first < self.size:
+            # Whole users per chunk, so each user's entries stay in order
+            last = max(first + 1, int(np.searchsorted(bounds, bounds[first] - counts[first] + chunk_size)))
+            last = min(last, self.size)
+            owners = np.repeat(np.arange(first, last), counts[first:last])
+            offsets = rng.uniform(0, HISTORY_DAYS * 86400, size=len(owners))
+            order = np.lexsort((offsets, owners))
+            owners, offsets = owners[order], offsets[order]
+            noise = rng.normal(0, 0.4, size=len(owners))
+            entries = []
+            for i, owner in enumerate(owners):
+                days_ago = HISTORY_DAYS - offsets[i] / 86400.0
+                weight = round(float(self.weight[owner] - self.drift[owner] * days_ago + noise[i]), 1)
+                date = start_date + timedelta(seconds=float(offsets[i]))
+                state = self.trends.get(owner, (None,))[0]
+                self.trends[owner] = (update_trend(state, weight, date), weight)
+                entries.append({'user_id': self.user_ids[owner], 'weight': weight, 'date': date})
+            yield entries
+            first = last
+
+    def _ratings(self, total, stream, recipes, chunk_size):
+        rng = self._rng(stream)
+        # Recipe popularity is Zipf-like too
+        popularity = activity_levels(len(recipes), rng)
+        bias = rng.normal(0, 0.7, size=self.size)
+        for start in range(0, total, chunk_size):
+            count = min(chunk_size, total - start)
+            owners = self._owners(count, rng)
+            picks = rng.choice(len(recipes), size=count, p=popularity)
+            ratings = np.clip(np.round(rng.normal(3.6, 0.9, size=count) + bias[owners]), 1, 5).astype(int)
+            dates = self._dates(count, rng)
+            yield owners, picks, ratings, dates, rng
+
+    def recipe_reviews(self, total, recipes, chunk_size=CHUNK_SIZE):
+        """Reviews of ``recipes``, a list of (collection, ID) pairs"""
+        for owners, picks, ratings, dates, rng in self._ratings(total, 3, recipes, chunk_size):
+            votes = rng.poisson(1.0, size=len(owners))
+            # The review route receives recipe IDs from the URL, as strings
+            yield [{'user_id': self.user_ids[owners[i]], 'recipe_id': str(recipes[picks[i]][1]),
+                    'collection': recipes[picks[i]][0], 'rating': int(ratings[i]), 'comment': None,
+                    'helpful_votes': int(votes[i]), 'date': dates[i]} for i in range(len(owners))]
+
+    def meal_feedback(self, total, recipes, chunk_size=CHUNK_SIZE):
+        """Per-meal ratings of ``recipes``, a list of (collection, ID) pairs"""
+        for owners, picks, ratings, dates, rng in self._ratings(total, 4, recipes, chunk_size):
+            texts = rng.integers(len(FEEDBACK_TEXT), size=len(owners))
+            yield [{'user_id': self.user_ids[owners[i]], 'meal_id': int(recipes[picks[i]][1]),
+                    'collection': recipes[picks[i]][0], 'rating': int(ratings[i]),
+                    'feedback': FEEDBACK_TEXT[texts[i]], 'date': dates[i]}
+                   for i in range(len(owners))]
+
+    def trend_updates(self, chunk_size=CHUNK_SIZE):
+        """Bulk updates setting each user's ``weight_trend`` and latest ``weight``"""
+        updates = [UpdateOne({'_id': self.user_ids[owner]},
+                             {'$set': {'weight_trend': state, 'weight': float(weight)}})
+                   for owner, (state, weight) in getattr(self, 'trends', {}).items()]
+        for start in range(0, len(updates), chunk_size):
+            yield updates[start:start + chunk_size]
+
+def load(collection, chunks, report=None):
+    """Insert (or bulk-write) every chunk into ``collection``; return (rows, seconds)"""
+    started = time.perf_counter()
+    rows = 0
+    for documents in chunks:
+        if documents and isinstance(documents[0], UpdateOne):
+            collection.bulk_write(documents, ordered=False)
+        elif documents:
+            collection.insert_many(documents, ordered=False)
+        rows += len(documents)
+        if report is not None:
+            report(collection.name, rows, time.perf_counter() - started)
+    return rows, time.perf_counter() - started
@@ -0,0 +1,210 @@
+"""
+Inverted index over the catalog ``soup`` column.
+
+``soup`` is built as ``"['tag one' 'tag two' ...] recipe name carbs fats proteins"``.
+Each recipe is tokenized once into its tag phrases, its name, the individual
+name tokens and the cuisine labels found in its tags. Every indexed term keeps
+a posting list of rows; query terms are resolved to packed bitsets (one bit per
+row) so "diabetic AND south indian AND NOT high fiber" is a couple of bitwise
+ANDs.
+
+Terms match the way ``str.contains(term, case=False)`` did on the whole soup:
+a recipe matches if the term occurs inside one of its tags or its name. To
+find those substrings without scanning the vocabulary, every indexed term is
+also filed under its character n-grams (up to ``GRAM`` long); a query term
+only checks the indexed terms that contain all of its n-grams.
+"""
+import re
+import threading
+
+import numpy as np
+
+# Cuisine labels recognised inside tags (whole words). Longer labels first so
+# 'south indian' wins over 'indian' when listing a recipe's cuisines.
+CUISINE_LABELS = [
+    'south indian', 'north indian', 'indian', 'punjabi', 'gujarati', 'maharashtrian',
+    'rajasthani', 'bengali', 'kerala', 'mughlai', 'sindhi', 'goan', 'hyderabadi',
+    'udupi', 'tamil', 'konkani', 'karnataka', 'andhra', 'chettinad', 'mangalorean',
+    'malvani', 'kashmiri', 'parsi', 'jain', 'chinese', 'italian', 'mexican', 'thai',
+    'continental', 'american', 'lebanese', 'middle eastern', 'mediterranean',
+    'burmese', 'asian', 'western', 'european', 'french', 'greek', 'spanish',
+]
+
+_SOUP_RE = re.compile(r"^\s*\[(.*?)\]\s*(.*)$", re.S)
+# Tags are quoted with ' (or " when they contain an apostrophe) and separated
+# by whitespace; a few scraped rows have stray quotes inside a tag, so split
+# on the quote-space-quote separators rather than pairing quotes up.
+_TAG_SEP_RE = re.compile(r"['\"]\s+['\"]")
+_MACROS_RE = re.compile(r"(\s+([-+]?\d*\.?\d+(e[-+]?\d+)?|nan)){3}\s*$", re.I)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Longest n-gram filed in the substring map
+GRAM = 3
+
+
+def _grams(text, size):
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def parse_soup(soup):
+    """Split a soup string into (tag phrases, recipe name text)"""
+    soup = (soup or '').lower()
+    match = _SOUP_RE.match(soup)
+    if not match:
+        return [], _MACROS_RE.sub('', soup).strip()
+    tags = []
+    content = match.group(1).strip().strip('\'"')
+    for piece in _TAG_SEP_RE.split(content):
+        tag = ' '.join(piece.split())
+        if tag:
+            tags.append(tag)
+    name = _MACROS_RE.sub('', match.group(2)).strip()
+    return tags, name
+
+
+def cuisine_labels(tags):
+    """Cuisine labels mentioned (as whole words) in a list of tag phrases"""
+    text = ' ' + ' '.join(' '.join(_TOKEN_RE.findall(tag)) for tag in tags) + ' '
+    return [label for label in CUISINE_LABELS if f" {label} " in text]
+
+
+class TagIndex:
+    """Inverted index of soup terms to row bitsets for one catalog table"""
+
+    def __init__(self, soups, cuisines=None):
+        soups = list(soups)
+        self.size = len(soups)
+        postings = {}
+        cuisine_postings = {}
+        for row, soup in enumerate(soups):
+            tags, name = parse_soup(soup)
+            terms = set(tags)
+            if name:
+                terms.add(name)
+                terms.update(_TOKEN_RE.findall(name))
+            for term in terms:
+                postings.setdefault(term, []).append(row)
+            labels = cuisines[row] if cuisines is not None else cuisine_labels(tags)
+            for label in labels:
+                cuisine_postings.setdefault(label, []).append(row)
+
+        self.postings = {term: np.asarray(rows, dtype=np.int32) for term, rows in postings.items()}
+        self.cuisines = {label: self._pack(np.asarray(rows, dtype=np.int32))
+                         for label, rows in cuisine_postings.items()}
+        self._terms = list(self.postings)
+        self._build_grams()
+        self._bits = {}
+        self._lock = threading.Lock()
+
+    def _build_grams(self):
+        """Map each n-gram (1 to GRAM characters) to the indexed terms containing it"""
+        grams = {}
+        for number, term in enumerate(self._terms):
+            for size in range(1, GRAM + 1):
+                for gram in _grams(term, size):
+                    grams.setdefault(gram, []).append(number)
+        self._grams = {gram: np.asarray(numbers, dtype=np.int32) for gram, numbers in grams.items()}
+
+    def _containing(self, term):
+        """Indexed terms that contain ``term`` as a substring"""
+        keys = _grams(term, GRAM) if len(term) > GRAM else {term}
+        candidates = None
+        for gram in sorted(keys, key=lambda gram: len(self._grams.get(gram, ()))):
+            numbers = self._grams.get(gram)
+            if numbers is None:
+                return []
+            candidates = numbers if candidates is None else np.intersect1d(candidates, numbers, assume_unique=True)
+            if not len(candidates):
+                return []
+        if len(term) <= GRAM:
+            return [self._terms[number] for number in candidates]
+        return [self._terms[number] for number in candidates if term in self._terms[number]]
+
+    def to_arrays(self):
+        """Flatten the index to (terms, labels, arrays) for saving in a snapshot"""
+        terms = list(self.postings)
+        lengths = [len(self.postings[term]) for term in terms]
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        rows = (np.concatenate([self.postings[term] for term in terms]) if terms
+                else np.zeros(0, dtype=np.int32))
+        labels = list(self.cuisines)
+        cuisine_bits = (np.stack([self.cuisines[label] for label in labels]) if labels
+                        else np.zeros((0, (self.size + 7) // 8), dtype=np.uint8))
+        arrays = {'offsets': offsets, 'rows': rows.astype(np.int32), 'cuisine_bits': cuisine_bits}
+        return terms, labels, arrays
+
+    @classmethod
+    def from_arrays(cls, size, terms, labels, arrays):
+        """Rebuild an index saved with ``to_arrays`` (arrays may be memory-mapped)"""
+        index = cls.__new__(cls)
+        index.size = size
+        offsets, rows = arrays['offsets'], arrays['rows']
+        index.postings = {term: rows[offsets[i]:offsets[i + 1]] for i, term in enumerate(terms)}
+        index.cuisines = {label: arrays['cuisine_bits'][i] for i, label in enumerate(labels)}
+        index._terms = list(terms)
+        index._build_grams()
+        index._bits = {}
+        index._lock = threading.Lock()
+        return index
+
+    def _pack(self, rows):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
+
+    def empty(self):
+        return np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def full(self):
+        return np.packbits(np.ones(self.size, dtype=bool))
+
+    def bits(self, term):
+        """Bitset of rows whose tags or name contain ``term`` (case-insensitive)"""
+        term = ' '.join(term.lower().split())
+        bits = self._bits.get(term)
+        if bits is None:
+            mask = np.zeros(self.size, dtype=bool)
+            for indexed in self._containing(term):
+                mask[self.postings[indexed]] = True
+            bits = np.packbits(mask)
+            with self._lock:
+                self._bits[term] = bits
+        return bits
+
+    def query(self, all_of=(), any_of=(), none_of=()):
+        """Bitset of rows matching every ``all_of``, some ``any_of`` and no ``none_of`` term"""
+        result = self.full()
+        for term in all_of:
+            result &= self.bits(term)
+        if any_of:
+            either = self.empty()
+            for term in any_of:
+                either |= self.bits(term)
+            result &= either
+        for term in none_of:
+            result &= ~self.bits(term)
+        return result
+
+    def match(self, expression):
+        """Evaluate a query like ``"diabetic AND south indian AND NOT high fiber"``"""
+        all_of, none_of = [], []
+        for part in re.split(r'\s+AND\s+', expression.strip()):
+            if part.startswith('NOT '):
+                none_of.append(part[4:])
+            elif part:
+                all_of.append(part)
+        return self.query(all_of=all_of, none_of=none_of)
+
+    def mask(self, bits):
+        """Unpack a bitset to a boolean row mask"""
+        return np.unpackbits(bits, count=self.size).astype(bool)
+
+    def rows(self, bits):
+        return np.flatnonzero(self.mask(bits))
+
+    def count(self, bits):
+        return int(np.unpackbits(bits, count=self.size).sum())
+
+    def has_cuisine(self, label):
+        return label in self.cuisines
@@ -0,0 +1,83 @@
+"""
+Incremental weight trend for one user.
+
+The state is a small dict stored on the user document and updated in O(1)
+per weight entry: a time-aware EWMA of the weight (the smoothed current
+weight) and exponentially discounted least-squares sums of (day, weight),
+whose slope is the recent rate of change. Reading the trend or projecting
+when a target weight is reached never scans the history.
+"""
+import math
+from datetime import timedelta
+
+# Time constants in days: how quickly the smoothed weight follows new
+# entries, and how far back the rate-of-change fit effectively looks
+SMOOTHING_DAYS = 7.0
+FIT_WINDOW_DAYS = 28.0
+
+# Projections further out than this are not shown
+MAX_ETA_DAYS = 3 * 365
+
+
+def update_trend(state, weight, date):
+    """Return the trend state after a weight entry logged at ``date``"""
+    weight = float(weight)
+    if not state:
+        return {
+            'origin': date, 'last_date': date, 'smoothed': weight,
+            'n': 1.0, 'sum_t': 0.0, 'sum_w': weight, 'sum_tt': 0.0, 'sum_tw': 0.0,
+        }
+    state = dict(state)
+    # Entries logged out of order count as simultaneous with the latest one
+    elapsed = max((date - state['last_date']).total_seconds() / 86400.0, 0.0)
+    if date > state['last_date']:
+        state['last_date'] = date
+
+    alpha = 1.0 - math.exp(-elapsed / SMOOTHING_DAYS) if elapsed else 0.5
+    state['smoothed'] += alpha * (weight - state['smoothed'])
+
+    decay = math.exp(-elapsed / FIT_WINDOW_DAYS)
+    t = (state['last_date'] - state['origin']).total_seconds() / 86400.0
+    state['n'] = state['n'] * decay + 1.0
+    state['sum_t'] = state['sum_t'] * decay + t
+    state['sum_w'] = state['sum_w'] * decay + weight
+    state['sum_tt'] = state['sum_tt'] * decay + t * t
+    state['sum_tw'] = state['sum_tw'] * decay + t * weight
+    return state
+
+
+def rate_per_day(state):
+    """Least-squares slope in kg/day (0 until entries span some time)"""
+    if not state:
+        return 0.0
+    denominator = state['n'] * state['sum_tt'] - state['sum_t'] ** 2
+    if denominator <= 1e-9:
+        return 0.0
+    return (state['n'] * state['sum_tw'] - state['sum_t'] * state['sum_w']) / denominator
+
+
+def projected_date(state, target_weight):
+    """Date the trend reaches ``target_weight``, or None if it is heading away"""
+    if not state or target_weight is None:
+        return None
+    remaining = float(target_weight) - state['smoothed']
+    if abs(remaining) < 0.05:
+        return state['last_date']
+    rate = rate_per_day(state)
+    if rate == 0 or (remaining > 0) != (rate > 0):
+        return None
+    days = remaining / rate
+    if days > MAX_ETA_DAYS:
+        return None
+    return state['last_date'] + timedelta(days=days)
+
+
+def summarize(state, target_weight=None):
+    """{'smoothed_weight', 'rate_per_week', 'eta'} for display, or None"""
+    if not state:
+        return None
+    return {
+        'smoothed_weight': round(state['smoothed'], 2),
+        'rate_per_week': round(7.0 * rate_per_day(state), 2),
+        'eta': projected_date(state, target_weight),
+    }
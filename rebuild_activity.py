@@ -0,0 +1,29 @@
+"""
+Rebuild the daily_activity rollups and workout streaks from workout_logs
+
+    python rebuild_activity.py [--user USER_ID]
+"""
+import argparse
+import time
+
+from myproject.fitness import fitness_tracker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--user', help='only rebuild this user (default: everyone)')
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("Rebuilding Daily Activity Rollups")
+    print("=" * 50)
+
+    started = time.perf_counter()
+    count = fitness_tracker.rebuild_daily_activity(args.user)
+    print(f"\n✓ Wrote {count} daily rollups in {time.perf_counter() - started:.1f}s")
+
+    print("\n" + "=" * 50)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,14 @@
 import os
-import pandas as pd
-from pymongo import MongoClient
+import sys
 
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'myproject', 'data')
+sys.path.insert(0, BASE_DIR)
+
+from pymongo import MongoClient
+
+from myproject.features import recipe_features
+from myproject.importer import import_catalogs
 
 MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017')
 MONGO_DB_NAME = os.environ.get('MONGO_DB_NAME', 'diet_planner')
@@ -12,26 +17,20 @@ client = MongoClient(MONGO_URI)
 db = client[MONGO_DB_NAME]
 
 
-def import_csv(collection_name: str, csv_path: str) -> None:
-    df = pd.read_csv(csv_path)
-    if 'ID' in df.columns:
-        df['ID'] = df['ID'].astype(int)
-    records = df.where(pd.notnull(df), None).to_dict('records')
-    db[collection_name].delete_many({})
-    if records:
-        db[collection_name].insert_many(records)
-    print(f"Imported {len(records)} records into '{collection_name}'.")
-
-
 def main() -> None:
-    breakfast_csv = os.path.join(DATA_DIR, 'Breakfast.csv')
-    lunch_csv = os.path.join(DATA_DIR, 'LunchDinner.csv')
-
-    import_csv('breakfast', breakfast_csv)
-    import_csv('lunchdinner', lunch_csv)
+    sources = {
+        'breakfast': os.path.join(DATA_DIR, 'Breakfast.csv'),
+        'lunchdinner': os.path.join(DATA_DIR, 'LunchDinner.csv'),
+    }
+    # Streams each CSV into a staging collection (parsing ingredients, steps
+    # and derived features), swaps it in and bumps the catalog version so
+    # running app processes reload their cache.
+    results = import_catalogs(db, sources, prepare=recipe_features)
+    for name in sources:
+        result = results[name]
+        print(f"Imported {result['documents']} records into '{name}' "
+              f"({result['rows_per_sec']:.0f} rows/sec).")
 
 
 if __name__ == '__main__':
     main()
-
-
@@ -0,0 +1,13 @@
+"""
+Close fitness goals whose deadline has passed (e.g. from a nightly cron job)
+"""
+from myproject.fitness import fitness_tracker
+
+print("=" * 50)
+print("Closing Expired Fitness Goals")
+print("=" * 50)
+
+closed = fitness_tracker.close_expired_goals()
+print(f"\n✓ Marked {closed} goals as expired")
+
+print("\n" + "=" * 50)
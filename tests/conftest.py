@@ -0,0 +1,28 @@
+"""
+Run the suite against the in-memory store: ``myproject`` picks its backend
+at import time, so the environment is set before anything imports it.
+"""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+os.environ['DB_BACKEND'] = 'memory'
+os.environ.setdefault('CATALOG_SNAPSHOT', '0')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def catalog():
+    """The shared meal catalog, loaded from the bundled CSVs"""
+    from myproject import meal_catalog, mongo_db
+    from myproject.catalog import bump_catalog_version
+
+    for name, filename in [('breakfast', 'Breakfastsql.csv'), ('lunchdinner', 'LunchDinnersql.csv')]:
+        mongo_db[name].delete_many({})
+        mongo_db[name].insert_many(pd.read_csv(os.path.join(ROOT, filename)).to_dict('records'))
+    bump_catalog_version(mongo_db)
+    meal_catalog.invalidate()
+    return meal_catalog
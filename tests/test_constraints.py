@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from myproject.constraints import ConstraintEngine, RELAXATION_TIERS, conditions_from_flags
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module', params=['Breakfastsql.csv', 'LunchDinnersql.csv'])
+def table(request):
+    frame = pd.read_csv(os.path.join(ROOT, request.param))
+    return frame, ConstraintEngine(frame)
+
+
+def legacy_filter(frame, calorie, hascancer, hasdiabetes, cuisine):
+    """The str.contains filter chain meal() ran before the engine (strict tier)"""
+    filtered = frame
+    if hascancer == 'Y':
+        filtered = filtered[(filtered['Fiber'] <= 15) &
+                            (~filtered['soup'].str.contains('high fiber', case=False, na=False))]
+    if hasdiabetes == 'Y':
+        filtered = filtered[filtered['soup'].str.contains('diabet', case=False, na=False)]
+    if hascancer != 'Y' and hasdiabetes != 'Y':
+        filtered = filtered[filtered['soup'].str.contains(cuisine, case=False, na=False)]
+    return filtered[(filtered['Calories'] >= calorie - 200) & (filtered['Calories'] <= calorie + 50)]
+
+
+@pytest.mark.parametrize('hascancer,hasdiabetes', [('N', 'N'), ('Y', 'N'), ('N', 'Y'), ('Y', 'Y')])
+@pytest.mark.parametrize('cuisine', ['indian', 'south indian', 'gujarati', 'punjabi', 'chinese'])
+@pytest.mark.parametrize('calorie', [150, 400, 800])
+def test_strict_tier_matches_legacy_filters(table, hascancer, hasdiabetes, cuisine, calorie):
+    frame, engine = table
+    conditions = conditions_from_flags(hascancer, hasdiabetes)
+    mask = engine.tier_mask(RELAXATION_TIERS[0], calorie, conditions, cuisine)
+    expected = legacy_filter(frame, calorie, hascancer, hasdiabetes, cuisine)
+    assert set(frame['ID'][mask]) == set(expected['ID'])
+
+
+def test_relaxed_tiers_match_legacy_calorie_windows(table):
+    frame, engine = table
+    calorie = 500
+    wide = engine.tier_mask(RELAXATION_TIERS[1], calorie, ['diabetes'], 'indian')
+    expected = (frame['Calories'] >= calorie - 400) & (frame['Calories'] <= calorie + 200)
+    assert np.array_equal(wide, expected.to_numpy())
+    assert engine.tier_mask(RELAXATION_TIERS[2], calorie, ['diabetes'], 'indian').all()
+
+
+def test_tag_mask_matches_str_contains(table):
+    frame, engine = table
+    for tag in ['diabet', 'high fiber', 'Breakfast', 'paneer', 'dal', 'north indian']:
+        expected = frame['soup'].str.contains(tag, case=False, na=False).to_numpy()
+        assert np.array_equal(engine.tag_mask(tag), expected), tag
+
+
+def test_candidates_relax_until_something_matches(table):
+    frame, engine = table
+    rows, tier = engine.candidates(400, [], 'indian')
+    assert tier == 0 and len(rows)
+    # Nothing is that small, so only the last tier (no calorie window) matches
+    rows, tier = engine.candidates(-1000, ['diabetes'], None)
+    assert tier == len(RELAXATION_TIERS) - 1
+    assert len(rows) == len(frame)
+
+
+def test_planning_rows_keep_conditions(table):
+    frame, engine = table
+    diabetic = engine.condition_mask(['diabetes'])
+    rows, tier = engine.planning_rows(['diabetes'], None, minimum=len(frame))
+    assert len(rows) == diabetic.sum()
+    assert diabetic[rows].all()
+
+
+def test_sample_distinct_has_no_repeats(table):
+    frame, engine = table
+    ids = engine.sample_distinct(400, 14, ['cancer'], None)
+    assert len(ids) == 14 and len(set(ids)) == 14
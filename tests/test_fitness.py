@@ -0,0 +1,105 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from myproject.fitness import activity_streaks, fitness_tracker
+
+START = datetime(2024, 1, 1)
+
+
+def streak(user_id):
+    return activity_streaks.find_one({'_id': user_id}, {'_id': 0})
+
+
+def test_streak_counts_consecutive_days():
+    user_id = ObjectId()
+    for day in [0, 1, 2, 4, 5]:
+        fitness_tracker._record_streak(user_id, START + timedelta(days=day))
+    assert streak(user_id) == {'last_day': START + timedelta(days=5), 'current': 2, 'longest': 3}
+    # Days already counted (or earlier) leave it alone
+    fitness_tracker._record_streak(user_id, START + timedelta(days=5))
+    fitness_tracker._record_streak(user_id, START + timedelta(days=3))
+    assert streak(user_id)['current'] == 2
+
+
+def test_concurrent_first_workouts_create_one_streak():
+    user_id = ObjectId()
+    threads = [threading.Thread(target=fitness_tracker._record_streak, args=(user_id, START))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert streak(user_id) == {'last_day': START, 'current': 1, 'longest': 1}
+    assert activity_streaks.count_documents({'_id': user_id}) == 1
+
+
+@pytest.mark.parametrize('name', ['Running', 'Jumping Jacks', 'Dr. Smith 5.5k', '$pecial', '100%', '%2E', None])
+def test_exercise_keys_round_trip(name):
+    from myproject.fitness import _exercise_key, _exercise_name
+
+    key = _exercise_key(name)
+    assert '.' not in key and not key.startswith('$')
+    assert _exercise_name(key) == name
+
+
+def test_analytics_breakdown_uses_logged_names():
+    from myproject import users_collection
+
+    user_id = users_collection.insert_one({'email': 'fit@example.com', 'weight': '70'}).inserted_id
+    for name in ['Yoga.Flow', 'Yoga.Flow', 'Running']:
+        assert fitness_tracker.log_workout(str(user_id), name, 30, 'moderate')
+    analytics = fitness_tracker.get_workout_analytics(str(user_id))
+    assert analytics['exercise_breakdown'] == {'Yoga.Flow': 2, 'Running': 1}
+    assert analytics['total_workouts'] == 3 and analytics['total_duration'] == 90
+    assert analytics['streak'] == 1
+
+
+def test_rebuild_matches_incremental_rollups():
+    from myproject.fitness import daily_activity, workout_logs
+
+    user_id = ObjectId()
+    for day, name, minutes in [(0, 'Running', 20), (0, 'Yoga.Flow', 30), (1, 'Running', 25), (3, None, 10)]:
+        workout = {'user_id': user_id, 'exercise': name, 'duration': minutes,
+                   'calories_burned': 5.0 * minutes, 'date': START + timedelta(days=day, hours=7)}
+        workout_logs.insert_one(dict(workout))
+        fitness_tracker._record_activity(workout)
+    live = sorted(daily_activity.find({'user_id': user_id}, {'_id': 0}), key=lambda doc: doc['day'])
+    before = streak(user_id)
+
+    # A stale day that no longer has workouts is dropped by a per-user rebuild
+    daily_activity.insert_one({'user_id': user_id, 'day': START + timedelta(days=9), 'workouts': 1})
+    assert fitness_tracker.rebuild_daily_activity(str(user_id)) == 3
+    rebuilt = sorted(daily_activity.find({'user_id': user_id}, {'_id': 0}), key=lambda doc: doc['day'])
+    before['backfilled'] = True
+    assert rebuilt == live and streak(user_id) == before
+
+    assert fitness_tracker.rebuild_daily_activity() >= 3
+    rebuilt = sorted(daily_activity.find({'user_id': user_id}, {'_id': 0}), key=lambda doc: doc['day'])
+    assert rebuilt == live and streak(user_id) == before
+    assert 'user_id_1_day_-1' in daily_activity.index_information()
+
+
+def test_logs_from_before_the_rollups_are_backfilled_on_first_read():
+    from myproject import users_collection
+    from myproject.fitness import workout_logs
+
+    user_id = users_collection.insert_one({'email': 'old@example.com', 'weight': '70'}).inserted_id
+    today = datetime.utcnow()
+    for days_ago in [2, 1]:
+        workout_logs.insert_one({'user_id': user_id, 'exercise': 'Running', 'duration': 30,
+                                 'calories_burned': 200.0, 'date': today - timedelta(days=days_ago)})
+    analytics = fitness_tracker.get_workout_analytics(str(user_id))
+    assert analytics['total_workouts'] == 2 and analytics['streak'] == 2
+    # Later workouts keep adding to the backfilled rollups
+    fitness_tracker.log_workout(str(user_id), 'Running', 30, 'moderate')
+    analytics = fitness_tracker.get_workout_analytics(str(user_id))
+    assert analytics['total_workouts'] == 3 and analytics['streak'] == 3
+
+
+def test_backfill_marks_users_without_workouts():
+    user_id = ObjectId()
+    assert fitness_tracker.get_workout_streak(str(user_id)) == 0
+    assert streak(user_id) == {'backfilled': True}
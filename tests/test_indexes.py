@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from myproject.indexes import ensure_indexes, is_timeseries, migrate_to_timeseries, verify_indexes
+from myproject.memorydb import MemoryClient
+
+
+@pytest.fixture
+def db():
+    return MemoryClient()['test']
+
+
+def test_ensure_indexes_covers_the_hot_queries(db):
+    results = ensure_indexes(db)
+    assert not [name for name, result in results.items() if isinstance(result, str)]
+    assert is_timeseries(db, 'weight_history')
+    assert verify_indexes(db) == []
+
+
+def test_migrate_to_timeseries(db):
+    user_id = ObjectId()
+    start = datetime(2024, 1, 1)
+    db['weight_history'].insert_many([{'user_id': user_id, 'weight': 80.0 - day, 'date': start + timedelta(days=day)}
+                                      for day in range(2500)])
+    assert migrate_to_timeseries(db, 'weight_history', batch_size=1000) == 2500
+    assert is_timeseries(db, 'weight_history')
+    assert db['weight_history'].count_documents({'user_id': user_id}) == 2500
+    assert 'user_id_1_date_-1' in db['weight_history'].index_information()
+    assert db['weight_history_legacy'].count_documents({}) == 2500
+    assert 'weight_history_staging' not in db.list_collection_names()
+    # Already migrated: nothing to do
+    assert migrate_to_timeseries(db, 'weight_history') == 0
+
+
+def test_migration_refuses_to_overwrite_a_backup(db):
+    db['weight_history'].insert_one({'user_id': ObjectId(), 'weight': 80.0, 'date': datetime(2024, 1, 1)})
+    db['weight_history_legacy'].insert_one({'kept': True})
+    with pytest.raises(OperationFailure):
+        migrate_to_timeseries(db, 'weight_history')
+    assert db['weight_history_legacy'].find_one({}, {'_id': 0}) == {'kept': True}
+    assert not is_timeseries(db, 'weight_history')
+
+
+def test_migration_keeps_writes_made_around_the_swap(db, monkeypatch):
+    from myproject.memorydb import MemoryCollection
+    start = datetime(2024, 1, 1)
+    db['weight_history'].insert_many([{'user_id': ObjectId(), 'weight': 80.0, 'date': start + timedelta(days=day)}
+                                      for day in range(50)])
+    real_rename = MemoryCollection.rename
+
+    def rename(collection, new_name, **kwargs):
+        if collection.name == 'weight_history' and new_name == 'weight_history_legacy':
+            # Another process's insert with an older ObjectId, then one landing between the renames
+            collection.insert_one({'_id': ObjectId.from_datetime(start), 'weight': 1.0, 'date': start})
+            real_rename(collection, new_name, **kwargs)
+            collection.insert_one({'weight': 2.0, 'date': start})
+            return
+        real_rename(collection, new_name, **kwargs)
+
+    monkeypatch.setattr(MemoryCollection, 'rename', rename)
+    assert migrate_to_timeseries(db, 'weight_history', batch_size=20) == 52
+    assert is_timeseries(db, 'weight_history')
+    assert db['weight_history'].count_documents({}) == 52
+    assert db['weight_history'].count_documents({'weight': {'$in': [1.0, 2.0]}}) == 2
+    assert 'weight_history_gap' not in db.list_collection_names()
@@ -0,0 +1,100 @@
+from datetime import datetime
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from myproject.indexes import explain_stages
+from myproject.memorydb import MemoryClient
+
+
+@pytest.fixture
+def collection():
+    collection = MemoryClient()['test']['logs']
+    collection.insert_many([
+        {'user_id': 1, 'day': 1, 'minutes': 30, 'tags': ['run'], 'meta': {'source': 'app'}},
+        {'user_id': 1, 'day': 2, 'minutes': 45, 'tags': ['bike'], 'meta': {'source': 'app'}},
+        {'user_id': 2, 'day': 1, 'minutes': 20, 'tags': ['run', 'swim'], 'meta': {'source': 'web'}},
+    ])
+    return collection
+
+
+def test_find_filters_sorts_and_projects(collection):
+    docs = list(collection.find({'user_id': 1, 'minutes': {'$gte': 40}}, {'_id': 0, 'day': 1}))
+    assert docs == [{'day': 2}]
+    days = [doc['day'] for doc in collection.find({'user_id': 1}).sort('day', -1)]
+    assert days == [2, 1]
+    assert collection.count_documents({'tags': 'run'}) == 2
+
+
+def test_find_returns_copies(collection):
+    doc = collection.find_one({'user_id': 2})
+    doc['meta']['source'] = 'changed'
+    doc['tags'].append('yoga')
+    stored = collection.find_one({'user_id': 2})
+    assert stored['meta'] == {'source': 'web'}
+    assert stored['tags'] == ['run', 'swim']
+
+
+def test_aggregate_returns_copies(collection):
+    for doc in collection.aggregate([{'$match': {'user_id': 1}}, {'$sort': {'day': 1}}]):
+        doc['meta']['source'] = 'changed'
+        doc['tags'].clear()
+    assert collection.count_documents({'meta.source': 'changed'}) == 0
+    assert collection.find_one({'day': 1, 'user_id': 1})['tags'] == ['run']
+
+
+def test_aggregate_group(collection):
+    result = list(collection.aggregate([
+        {'$group': {'_id': '$user_id', 'total': {'$sum': '$minutes'}, 'sessions': {'$sum': 1}}},
+        {'$sort': {'_id': 1}},
+    ]))
+    assert result == [{'_id': 1, 'total': 75, 'sessions': 2}, {'_id': 2, 'total': 20, 'sessions': 1}]
+
+
+def test_aggregate_leading_match_uses_index(collection, monkeypatch):
+    from myproject import memorydb
+    collection.create_index([('user_id', 1), ('day', 1)])
+    examined = []
+    real_matches = memorydb.matches
+    monkeypatch.setattr(memorydb, 'matches', lambda doc, query: examined.append(doc) or real_matches(doc, query))
+    result = list(collection.aggregate([
+        {'$match': {'user_id': 2}},
+        {'$group': {'_id': '$user_id', 'total': {'$sum': '$minutes'}}},
+    ]))
+    assert result == [{'_id': 2, 'total': 20}]
+    assert len(examined) == 1
+
+
+def test_updates_and_upsert(collection):
+    collection.update_one({'user_id': 2}, {'$inc': {'minutes': 5}, '$push': {'tags': 'yoga'}})
+    doc = collection.find_one({'user_id': 2})
+    assert doc['minutes'] == 25 and doc['tags'] == ['run', 'swim', 'yoga']
+    result = collection.update_one({'user_id': 3, 'day': 1}, {'$setOnInsert': {'minutes': 0}}, upsert=True)
+    assert result.upserted_id is not None
+    assert collection.find_one({'user_id': 3}, {'_id': 0}) == {'user_id': 3, 'day': 1, 'minutes': 0}
+
+
+def test_unique_index(collection):
+    collection.create_index([('user_id', 1), ('day', 1)], unique=True)
+    with pytest.raises(DuplicateKeyError):
+        collection.insert_one({'user_id': 1, 'day': 2})
+    # The index narrows lookups without changing their results
+    assert collection.count_documents({'user_id': 1, 'day': 2}) == 1
+
+
+def test_explain_reports_the_plan_actually_used(collection):
+    assert explain_stages(collection, {'user_id': 1}) == ['COLLSCAN']
+    collection.create_index([('user_id', 1), ('day', -1)])
+    assert 'IXSCAN' in explain_stages(collection, {'user_id': 1, 'day': {'$gte': 1}})
+    # Only equalities are hashed, so a range on the leading field is a scan
+    assert explain_stages(collection, {'user_id': {'$gte': 1}}) == ['COLLSCAN']
+    assert explain_stages(collection, {'day': 1}) == ['COLLSCAN']
+    assert explain_stages(collection, {'_id': 'x'}) == ['IDHACK']
+
+
+def test_rename_replaces_target(collection):
+    database = collection.database
+    database['staging'].insert_one({'user_id': 9, 'date': datetime(2024, 1, 1)})
+    database['staging'].rename('logs', dropTarget=True)
+    assert [doc['user_id'] for doc in database['logs'].find()] == [9]
+    assert 'staging' not in database.list_collection_names()
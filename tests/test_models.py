@@ -0,0 +1,98 @@
+import pytest
+
+from myproject import users_collection
+from myproject.models import PROJECTIONS, User
+from myproject.profiles import profile_cache
+
+
+def new_user(email='dirty@example.com'):
+    users_collection.delete_many({'email': email})
+    return User(email=email, username=email.split('@')[0], age='30', height='170', weight='80',
+                blood='A', health_issues='none', exercise='1.2', diet_pref='balanced',
+                plan_period='daily', food_type='vegetarian', password='secret1').save()
+
+
+@pytest.fixture
+def updates(monkeypatch):
+    """Record the update documents User.save() sends"""
+    calls = []
+    update_one = users_collection.update_one
+
+    def spy(filter, update, *args, **kwargs):
+        calls.append(update)
+        return update_one(filter, update, *args, **kwargs)
+
+    monkeypatch.setattr(users_collection, 'update_one', spy)
+    return calls
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    profile_cache.clear()
+
+
+def test_new_user_is_inserted_whole():
+    user = new_user()
+    doc = users_collection.find_one({'_id': user._id})
+    assert doc['username'] == 'dirty' and doc['weight'] == '80'
+    assert user.check_password('secret1')
+
+
+def test_save_sets_only_changed_fields(updates):
+    user = User.find_by_id(new_user()._id)
+    user.weight = '78'
+    user.plan_period = 'weekly'
+    user.save()
+    assert updates == [{'$set': {'weight': '78', 'plan_period': 'weekly'}}]
+    doc = users_collection.find_one({'_id': user._id})
+    assert doc['weight'] == '78' and doc['plan_period'] == 'weekly' and doc['age'] == '30'
+
+
+def test_unchanged_user_is_not_written(updates):
+    user = User.find_by_id(new_user()._id)
+    user.save()
+    assert updates == []
+
+
+def test_session_projection_loads_password_on_demand():
+    user = User.find_by_id(new_user()._id)
+    assert 'password_hash' not in PROJECTIONS['session']
+    assert user.check_password('secret1')
+
+
+def test_lazy_load_keeps_unsaved_changes(updates):
+    created = new_user()
+    user = User.from_dict(users_collection.find_one({'_id': created._id}, {'email': 1}))
+    user.weight = '75'
+    # Reading a field outside the projection must not overwrite the pending change
+    assert user.username == 'dirty'
+    assert user.weight == '75'
+    user.save()
+    assert updates == [{'$set': {'weight': '75'}}]
+
+
+def test_users_have_no_instance_dict():
+    user = new_user()
+    assert not hasattr(user, '__dict__')
+    with pytest.raises(AttributeError):
+        user.nickname = 'x'
+
+
+def test_weight_history_is_downsampled_from_the_first_entry():
+    from datetime import datetime, timedelta
+
+    from myproject.models import weight_history
+
+    user = new_user('weights@example.com')
+    first = datetime.utcnow() - timedelta(days=199)
+    weight_history.insert_many([{'user_id': user._id, 'weight': 100.0 - 0.1 * day,
+                                 'date': first + timedelta(days=day)} for day in range(200)])
+    history = user.get_weight_history(max_points=90)
+    # 200 days in buckets of 3 days
+    assert len(history) == 67
+    dates = [entry['date'] for entry in history]
+    assert dates == sorted(dates, reverse=True)
+    # Neither end of the range is dropped
+    assert dates[0] == first + timedelta(days=199)
+    assert history[-1]['weight'] == pytest.approx(100.0 - 0.1)
+    assert len(user.get_weight_history(max_points=500)) == 200
@@ -0,0 +1,16 @@
+import subprocess
+import sys
+
+
+def test_tools_import_without_creating_the_app():
+    code = ("import myproject, myproject.importer, myproject.features, myproject.indexes; "
+            "assert 'app' not in vars(myproject) and 'mongo_client' not in vars(myproject)")
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_shared_objects_are_created_once():
+    import myproject
+    from myproject import app, mongo_db
+    assert myproject.app is app
+    assert myproject.mongo_db is mongo_db
+    assert myproject.meal_catalog.db is mongo_db
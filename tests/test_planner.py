@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from myproject.constraints import ConstraintEngine
+from myproject.planner import (MACRO_TARGETS, PLANNED_SHARE, SHORT_SHARE, _day_scores,
+                               best_days, best_plans)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def rules():
+    return tuple(ConstraintEngine(pd.read_csv(os.path.join(ROOT, name)))
+                 for name in ('Breakfastsql.csv', 'LunchDinnersql.csv'))
+
+
+@pytest.fixture(autouse=True)
+def seed():
+    np.random.seed(7)
+
+
+def allowed(engine, conditions):
+    return set(engine.ids[engine.condition_mask(conditions)])
+
+
+def test_day_score_is_zero_on_target():
+    targets = MACRO_TARGETS['default']
+    energy = {column: np.array(2000.0 * share / 100) for column, share in targets.items()}
+    assert _day_scores(np.array(2000.0), energy, 2000.0, targets) == pytest.approx(0.0)
+    off = _day_scores(np.array(1500.0), energy, 2000.0, targets)
+    assert off > 0
+
+
+def test_best_plans_are_sorted_and_respect_exclude(rules):
+    breakfast, lunch = rules
+    excluded = set(lunch.ids[:200])
+    plans = best_plans(breakfast, lunch, 2200, count=3, exclude=excluded)
+    assert len(plans) == 3
+    assert [plan['score'] for plan in plans] == sorted(plan['score'] for plan in plans)
+    for plan in plans:
+        assert len(plan['ids']) == 3 and plan['ids'][1] != plan['ids'][2]
+        assert not excluded & set(plan['ids'][1:])
+        assert plan['target_calories'] == pytest.approx(2200 * PLANNED_SHARE)
+
+
+@pytest.mark.parametrize('conditions', [[], ['cancer'], ['diabetes']])
+def test_best_days_never_repeat_a_recipe(rules, conditions):
+    breakfast, lunch = rules
+    plans = best_days(breakfast, lunch, 2200, 7, conditions, 'indian')
+    assert len(plans) == 7
+    breakfasts = [plan['ids'][0] for plan in plans]
+    mains = [recipe_id for plan in plans for recipe_id in plan['ids'][1:]]
+    assert len(set(breakfasts)) == 7
+    assert len(set(mains)) == 14
+    # Health conditions are never relaxed away
+    assert set(breakfasts) <= allowed(breakfast, conditions)
+    assert set(mains) <= allowed(lunch, conditions)
+
+
+def test_best_days_are_balanced(rules):
+    breakfast, lunch = rules
+    plans = best_days(breakfast, lunch, 2200, 7)
+    target = 2200 * PLANNED_SHARE
+    calories = [plan['calories'] for plan in plans]
+    assert not any(plan['short'] for plan in plans)
+    assert max(calories) - min(calories) < 0.25 * target
+
+
+def test_unreachable_days_are_flagged_short(rules):
+    breakfast, lunch = rules
+    # Diabetic-safe recipes are too small to reach this target
+    plans = best_days(breakfast, lunch, 4000, 7, ['diabetes'])
+    assert plans and all(plan['short'] == (plan['calories'] < SHORT_SHARE * plan['target_calories'])
+                         for plan in plans)
+    assert any(plan['short'] for plan in plans)
+
+
+def test_planrecords_keep_positions_for_unknown_ids(catalog):
+    from myproject.feed import feedbackmeal
+    from myproject.firstmeal import planrecords
+
+    breakfast = int(catalog.table('breakfast').frame['ID'].iloc[0])
+    lunch = int(catalog.table('lunchdinner').frame['ID'].iloc[0])
+    records = planrecords([breakfast, -1, lunch])
+    assert [record['ID'] for record in records] == [breakfast, -1, lunch]
+    assert records[1].get('missing') and not records[0].get('missing')
+    assert feedbackmeal([breakfast, -1, lunch]) == records
+
+
+def test_cuisine_preference_resolves_against_catalog_labels(catalog):
+    from myproject.firstmeal import cuisine
+    assert cuisine(' South  Indian ') == 'south indian'
+    assert cuisine('martian') == 'indian'
+    assert cuisine() == 'indian'
@@ -0,0 +1,55 @@
+import pytest
+
+from myproject import app, users_collection
+from myproject.models import User
+from myproject.profiles import ProfileCache, profile_cache
+
+
+@pytest.fixture
+def user():
+    profile_cache.clear()
+    users_collection.delete_many({'email': 'cached@example.com'})
+    return User(email='cached@example.com', username='cached', age='30', height='170', weight='80',
+                blood='A', health_issues='none', exercise='1.2', diet_pref='balanced',
+                plan_period='daily', food_type='vegetarian', password='secret1').save()
+
+
+def test_cache_is_bounded_lru():
+    cache = ProfileCache(maxsize=2)
+    cache.put('a', {'n': 1})
+    cache.put('b', {'n': 2})
+    cache.get('a')
+    cache.put('c', {'n': 3})
+    assert cache.get('b') is None
+    assert cache.get('a') == {'n': 1} and cache.get('c') == {'n': 3}
+
+
+def test_cache_entries_expire():
+    cache = ProfileCache(ttl=0)
+    cache.put('a', {'n': 1})
+    assert cache.get('a') is None
+
+
+def test_cache_hands_out_copies():
+    cache = ProfileCache()
+    cache.put('a', {'n': 1})
+    cache.get('a')['n'] = 2
+    assert cache.get('a') == {'n': 1}
+
+
+def test_profile_is_read_once_across_requests(user, monkeypatch):
+    User.find_by_id(user._id)
+    monkeypatch.setattr(users_collection, 'find_one', lambda *args, **kwargs: pytest.fail('cache miss'))
+    assert User.find_by_id(user._id).username == 'cached'
+
+
+def test_request_shares_one_user_object(user):
+    with app.test_request_context():
+        assert User.find_by_id(user._id) is User.find_by_id(str(user._id))
+
+
+def test_save_invalidates_the_cached_profile(user):
+    loaded = User.find_by_id(user._id)
+    loaded.weight = '70'
+    loaded.save()
+    assert User.find_by_id(user._id).weight == '70'
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask, session
+
+from myproject.memorydb import MemoryClient
+from myproject.sessions import MongoSessionInterface, rotate_session
+
+
+@pytest.fixture
+def store():
+    return MemoryClient()['test']['sessions']
+
+
+@pytest.fixture
+def client(store):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.session_interface = MongoSessionInterface(store)
+
+    @app.route('/set/<value>')
+    def set_value(value):
+        session['value'] = value
+        return ''
+
+    @app.route('/get')
+    def get_value():
+        return session.get('value', '')
+
+    @app.route('/rotate')
+    def rotate():
+        rotate_session(session)
+        session['user'] = 'someone'
+        return ''
+
+    @app.route('/clear')
+    def clear():
+        session.clear()
+        rotate_session(session)
+        return ''
+
+    return app.test_client()
+
+
+def sid(client):
+    cookie = client.get_cookie('session')
+    return cookie.value if cookie else None
+
+
+def test_cookie_holds_only_the_id(client, store):
+    client.get('/set/secret')
+    doc = store.find_one({'_id': sid(client)})
+    assert doc is not None and 'secret' in doc['data']
+    assert 'secret' not in sid(client)
+    assert client.get('/get').get_data(as_text=True) == 'secret'
+
+
+def test_unchanged_session_is_not_written(client, store):
+    client.get('/set/a')
+    before = store.find_one({'_id': sid(client)})['expires_at']
+    client.get('/get')
+    assert store.find_one({'_id': sid(client)})['expires_at'] == before
+
+
+def test_nothing_stored_for_empty_sessions(client, store):
+    client.get('/get')
+    assert store.count_documents({}) == 0
+    assert sid(client) is None
+
+
+def test_expired_sessions_are_ignored(client, store):
+    client.get('/set/old')
+    store.update_one({'_id': sid(client)}, {'$set': {'expires_at': datetime.utcnow() - timedelta(seconds=1)}})
+    assert client.get('/get').get_data(as_text=True) == ''
+
+
+def test_rotation_moves_data_to_a_new_id(client, store):
+    client.get('/set/kept')
+    old = sid(client)
+    client.get('/rotate')
+    new = sid(client)
+    assert new != old
+    assert store.find_one({'_id': old}) is None
+    assert client.get('/get').get_data(as_text=True) == 'kept'
+
+
+def test_planted_id_is_not_adopted(client, store):
+    client.set_cookie('session', 'planted')
+    client.get('/set/x')
+    assert sid(client) != 'planted'
+    assert store.find_one({'_id': 'planted'}) is None
+
+
+def test_logout_removes_the_session(client, store):
+    client.get('/set/x')
+    old = sid(client)
+    client.get('/clear')
+    assert store.count_documents({}) == 0
+    assert sid(client) is None
+    assert old is not None
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from myproject.tagindex import TagIndex, cuisine_labels, parse_soup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SOUPS = [
+    "['diabetic recipes' 'south indian breakfast'] ragi dosa 30.0 5.0 4.0",
+    "['high fiber' 'punjabi dinner'] rajma chawal 60.0 8.0 12.0",
+    "['indian curries' 'paneer'] paneer butter masala 20.0 25.0 14.0",
+    "plain rice 45.0 1.0 3.0",
+]
+
+
+@pytest.fixture
+def index():
+    return TagIndex(SOUPS)
+
+
+def test_parse_soup():
+    assert parse_soup(SOUPS[0]) == (['diabetic recipes', 'south indian breakfast'], 'ragi dosa')
+    assert parse_soup(SOUPS[3]) == ([], 'plain rice')
+    assert cuisine_labels(['south indian breakfast']) == ['south indian', 'indian']
+
+
+def test_bits_match_substrings_of_tags_and_names(index):
+    assert list(index.rows(index.bits('diabet'))) == [0]
+    assert list(index.rows(index.bits('INDIAN'))) == [0, 2]
+    assert list(index.rows(index.bits('paneer'))) == [2]
+    assert list(index.rows(index.bits('ri'))) == [2, 3]
+    assert list(index.rows(index.bits('dosa'))) == [0]
+    assert index.count(index.bits('not there')) == 0
+
+
+def test_bitset_is_packed_one_bit_per_row(index):
+    bits = index.bits('indian')
+    assert bits.dtype == np.uint8 and len(bits) == 1
+    assert list(index.mask(bits)) == [True, False, True, False]
+
+
+def test_query_and_match(index):
+    assert list(index.rows(index.match('indian AND NOT paneer'))) == [0]
+    assert list(index.rows(index.query(any_of=['rajma', 'rice']))) == [1, 3]
+    assert list(index.rows(index.query(all_of=['dinner'], none_of=['high fiber']))) == []
+
+
+def test_cuisines(index):
+    assert index.has_cuisine('south indian') and index.has_cuisine('punjabi')
+    assert not index.has_cuisine('paneer')
+
+
+def test_snapshot_round_trip(index):
+    terms, labels, arrays = index.to_arrays()
+    loaded = TagIndex.from_arrays(index.size, terms, labels, arrays)
+    for term in ['diabet', 'indian', 'ri', 'high fiber', 'masala']:
+        assert np.array_equal(loaded.bits(term), index.bits(term)), term
+
+
+@pytest.mark.parametrize('filename', ['Breakfastsql.csv', 'LunchDinnersql.csv'])
+def test_matches_str_contains_on_catalog(filename):
+    soups = pd.read_csv(os.path.join(ROOT, filename))['soup'].fillna('')
+    index = TagIndex(soups)
+    for term in ['diabet', 'high fiber', 'south indian', 'gujarati', 'a', 'dal', 'oats']:
+        expected = soups.str.contains(term, case=False).to_numpy()
+        assert np.array_equal(index.mask(index.bits(term)), expected), term
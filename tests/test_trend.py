@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from myproject.trend import projected_date, rate_per_day, summarize, update_trend
+
+START = datetime(2024, 1, 1)
+
+
+def replay(entries):
+    state = None
+    for day, weight in entries:
+        state = update_trend(state, weight, START + timedelta(days=day))
+    return state
+
+
+def test_first_entry():
+    state = update_trend(None, 80, START)
+    assert state['smoothed'] == 80.0
+    assert rate_per_day(state) == 0.0
+    assert summarize(None) is None
+
+
+def test_steady_loss_rate():
+    # Half a kilo a week for ten weeks, logged daily
+    state = replay((day, 90 - 0.5 * day / 7) for day in range(70))
+    assert 7 * rate_per_day(state) == pytest.approx(-0.5, abs=0.01)
+    assert state['smoothed'] == pytest.approx(90 - 0.5 * 69 / 7, abs=0.6)
+
+
+def test_smoothing_damps_a_single_outlier():
+    entries = [(day, 80.0) for day in range(30)]
+    state = replay(entries + [(30, 85.0)])
+    assert state['smoothed'] < 81.0
+
+
+def test_projection_follows_the_trend():
+    state = replay((day, 90 - 0.1 * day) for day in range(30))
+    eta = projected_date(state, 85)
+    days = 85 - state['smoothed']
+    expected = state['last_date'] + timedelta(days=days / rate_per_day(state))
+    assert eta == expected
+    assert eta > state['last_date']
+    # Heading away from the target, or more than MAX_ETA_DAYS out, gives no date
+    assert projected_date(state, 95) is None
+    slow = replay((day, 90 - 0.001 * day) for day in range(30))
+    assert projected_date(slow, 50) is None
+
+
+def test_out_of_order_entries_do_not_move_time_backwards():
+    state = replay([(0, 80), (10, 79)])
+    late = update_trend(state, 81, START + timedelta(days=5))
+    assert late['last_date'] == state['last_date']
+
+
+def test_user_keeps_trend_up_to_date():
+    from myproject import users_collection
+    from myproject.models import User
+
+    users_collection.delete_many({'email': 'trend@example.com'})
+    user = User(email='trend@example.com', username='trend', age='30', height='170', weight='80',
+                blood='A', health_issues='none', exercise='1.2', diet_pref='balanced',
+                plan_period='daily', food_type='vegetarian', password='secret1').save()
+    for day in range(14):
+        user.add_weight_entry(80 - 0.1 * day, START + timedelta(days=day))
+    stored = users_collection.find_one({'_id': user._id})['weight_trend']
+    summary = user.get_weight_trend(target_weight=78)
+    assert stored['n'] > 1
+    assert summary['rate_per_week'] == pytest.approx(-0.7, abs=0.05)
+    assert summary['eta'] > START + timedelta(days=13)